@@ -15,6 +15,8 @@ import os
 import sys
 
 from AccessControl.class_init import InitializeClass
+from AccessControl.Permissions import view_management_screens
+from AccessControl.SecurityInfo import ClassSecurityInfo
 from AccessControl.requestmethod import requestmethod
 from Acquisition import Implicit
 from six.moves.urllib import parse
@@ -27,6 +29,9 @@ from App.version_txt import version_txt
 from OFS.Traversable import Traversable
 from Persistence import Persistent
 from Products.PageTemplates.PageTemplateFile import PageTemplateFile
+from ZPublisher import conflicts
+from ZPublisher import pagecache
+from ZPublisher import timing
 
 
 class FakeConnection(object):
@@ -81,6 +86,90 @@ class DatabaseChooser(Tabs, Traversable, Implicit):
 InitializeClass(DatabaseChooser)
 
 
+class PublisherTiming(Tabs, Traversable, Implicit):
+    """ Show the time spent in the phases of publishing
+    """
+
+    id = 'PublisherTiming'
+    name = title = 'Publisher Timing'
+    meta_type = 'Publisher Timing'
+
+    security = ClassSecurityInfo()
+    security.declareObjectProtected(view_management_screens)
+
+    security.declareProtected(view_management_screens, 'manage_main')
+    manage_main = PageTemplateFile('www/publisherTiming.pt', globals())
+    manage_options = (
+        {'label': 'Control Panel', 'action': '../manage_main'},
+        {'label': 'Publisher Timing', 'action': 'manage_main'},
+    )
+    MANAGE_TABS_NO_BANNER = True
+
+    @security.protected(view_management_screens)
+    def enabled(self):
+        return timing.enabled
+
+    @security.protected(view_management_screens)
+    def getTimings(self):
+        result = []
+        timings = timing.timings
+        for prefix in timings.prefixes():
+            for outcome in timings.outcomes(prefix):
+                for phase, histogram in timings.histograms(prefix, outcome):
+                    result.append({
+                        'prefix': prefix,
+                        'outcome': outcome,
+                        'phase': phase,
+                        'count': histogram.count,
+                        'mean': _ms(histogram.sum / histogram.count),
+                        'p50': _ms(histogram.quantile(0.5)),
+                        'p90': _ms(histogram.quantile(0.9)),
+                        'p99': _ms(histogram.quantile(0.99)),
+                    })
+        return result
+
+    @security.protected(view_management_screens)
+    def getConflicts(self):
+        stats = conflicts.stats
+        return {
+            'conflicts': stats.conflicts,
+            'retries': stats.retries,
+            'paths': stats.top(stats.paths),
+            'classes': stats.top(stats.classes),
+        }
+
+    @security.protected(view_management_screens)
+    def metrics(self, REQUEST=None):
+        """Return the timings in the Prometheus text format."""
+        if REQUEST is not None:
+            REQUEST.RESPONSE.setHeader(
+                'Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        result = timing.timings.render() + conflicts.stats.render()
+        if pagecache.cache is not None:
+            result += pagecache.cache.render()
+        return result
+
+    @security.protected(view_management_screens)
+    @requestmethod('POST')
+    def manage_reset(self, REQUEST=None):
+        """Discard the recorded timings and reset the counters."""
+        timing.timings.reset()
+        conflicts.stats.reset()
+        if pagecache.cache is not None:
+            pagecache.cache.reset()
+        if REQUEST is not None:
+            REQUEST.RESPONSE.redirect(REQUEST['URL1'] + '/manage_main')
+
+
+def _ms(seconds):
+    if seconds is None:
+        return '-'
+    return '%.1f' % (seconds * 1000.0)
+
+
+InitializeClass(PublisherTiming)
+
+
 class ApplicationManager(Persistent, Tabs, Traversable, Implicit):
     """System management
     """
@@ -93,12 +182,15 @@ class ApplicationManager(Persistent, Tabs, Traversable, Implicit):
     zmi_icon = 'fa fa-cog'
 
     Database = DatabaseChooser()
+    PublisherTiming = PublisherTiming()
 
     manage = manage_main = DTMLFile('dtml/cpContents', globals())
     manage_main._setName('manage_main')
     manage_options = (
         {'label': 'Control Panel', 'action': 'manage_main'},
         {'label': 'Databases', 'action': 'Database/manage_main'},
+        {'label': 'Publisher Timing',
+         'action': 'PublisherTiming/manage_main'},
     )
     MANAGE_TABS_NO_BANNER = True
 
@@ -68,6 +68,22 @@ def rfc1123_date(ts=None):
         hh, mm, ss)
 
 
+def etag_matches(header, etag):
+    # Return true if the value of an If-None-Match header matches etag,
+    # using the weak comparison required for that header.
+    for match in header.split(','):
+        match = match.strip()
+        if match == '*':
+            return True
+        if match.startswith('W/'):
+            match = match[2:]
+        if len(match) > 1 and match[0] == match[-1] == '"':
+            match = match[1:-1]
+        if match == etag:
+            return True
+    return False
+
+
 def absattr(attr, callable=callable):
     # Return the absolute value of an attribute,
     # calling the attr if it is callable.
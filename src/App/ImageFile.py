@@ -21,6 +21,7 @@ from AccessControl.class_init import InitializeClass
 from AccessControl.SecurityInfo import ClassSecurityInfo
 from Acquisition import Explicit
 from App import bbb
+from App.Common import etag_matches
 from App.Common import package_home
 from App.Common import rfc1123_date
 from App.config import getConfiguration
@@ -85,6 +86,7 @@ class ImageFile(Explicit):
         self.size = stat_info[stat.ST_SIZE]
         self.lmt = float(stat_info[stat.ST_MTIME]) or time.time()
         self.lmh = rfc1123_date(self.lmt)
+        self.etag = '%x-%x' % (int(self.lmt), self.size)
 
     def index_html(self, REQUEST, RESPONSE):
         """Default document"""
@@ -95,6 +97,14 @@ class ImageFile(Explicit):
         RESPONSE.setHeader('Last-Modified', self.lmh)
         RESPONSE.setHeader('Cache-Control', self.cch)
         RESPONSE.setHeader('Content-Length', str(self.size).replace('L', ''))
+        RESPONSE.setHeader('ETag', '"%s"' % self.etag)
+        header = REQUEST.get_header('If-None-Match', None)
+        if header is not None:
+            # If-None-Match takes precedence over If-Modified-Since.
+            if etag_matches(header, self.etag):
+                RESPONSE.setStatus(304)
+                return ''
+            return filestream_iterator(self.path, mode='rb')
         header = REQUEST.get_header('If-Modified-Since', None)
         if header is not None:
             header = header.split(';')[0]
@@ -68,3 +68,28 @@ class TestImageFileFunctional(unittest.TestCase):
         self.assertTrue(b''.join(result).startswith(b'\x89PNG\r\n'))
         self.assertEqual(len(result), image.size)
         result.close()
+
+    def test_index_html_if_none_match(self):
+        env = {
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REQUEST_METHOD': 'GET',
+        }
+        path = os.path.join(os.path.dirname(App.__file__),
+                            'www', 'zopelogo.png')
+        image = App.ImageFile.ImageFile(path)
+        response = WSGIResponse(BytesIO())
+        env['HTTP_IF_NONE_MATCH'] = '"%s"' % image.etag
+        request = WSGIRequest(BytesIO(), env, response)
+        self.assertEqual(image.index_html(request, response), '')
+        self.assertEqual(response.getStatus(), 304)
+        self.assertEqual(response.getHeader('ETag'), '"%s"' % image.etag)
+
+        response = WSGIResponse(BytesIO())
+        env['HTTP_IF_NONE_MATCH'] = '"other"'
+        request = WSGIRequest(BytesIO(), env, response)
+        result = image.index_html(request, response)
+        self.assertEqual(response.getStatus(), 200)
+        self.assertIsInstance(result, io.FileIO)
+        result.close()
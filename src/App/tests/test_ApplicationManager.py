@@ -173,6 +173,68 @@ class DatabaseChooserTests(ConfigTestBase, unittest.TestCase):
         self.assertTrue(found is spam)
 
 
+class PublisherTimingTests(unittest.TestCase):
+
+    def setUp(self):
+        from ZPublisher import conflicts
+        from ZPublisher import timing
+        timing.timings.reset()
+        conflicts.stats.reset()
+
+    def tearDown(self):
+        from ZPublisher import conflicts
+        from ZPublisher import timing
+        timing.timings.reset()
+        conflicts.stats.reset()
+
+    def _makeOne(self):
+        from App.ApplicationManager import PublisherTiming
+        return PublisherTiming()
+
+    def test_getTimings(self):
+        from ZPublisher import timing
+        timing.timings.observe('/a', {'traverse': 0.004, 'total': 0.02})
+        timing.timings.observe('/a', {'total': 0.2}, timing.ERROR)
+        rows = self._makeOne().getTimings()
+        self.assertEqual([(row['outcome'], row['phase']) for row in rows],
+                         [('error', 'total'), ('ok', 'traverse'),
+                          ('ok', 'total')])
+        rows = rows[1:]
+        self.assertEqual(rows[0]['prefix'], '/a')
+        self.assertEqual(rows[0]['count'], 1)
+        self.assertEqual(rows[0]['mean'], '4.0')
+        self.assertEqual(rows[0]['p99'], '5.0')
+
+    def test_getConflicts(self):
+        from ZODB.POSException import ConflictError
+        from ZPublisher import conflicts
+        conflicts.stats.record('/a', ConflictError(), True)
+        info = self._makeOne().getConflicts()
+        self.assertEqual(info['conflicts'], 1)
+        self.assertEqual(info['retries'], 1)
+        self.assertEqual(info['paths'], [('/a', 1)])
+
+    def test_metrics(self):
+        from ZPublisher import timing
+        timing.timings.observe('/a', {'total': 0.02})
+
+        class Response(object):
+            headers = {}
+
+            def setHeader(self, name, value):
+                self.headers[name] = value
+
+        class Request(object):
+            RESPONSE = Response()
+
+        request = Request()
+        text = self._makeOne().metrics(request)
+        self.assertIn(timing.timings.render(), text)
+        self.assertIn('zope_conflicts_total 0', text)
+        self.assertTrue(
+            request.RESPONSE.headers['Content-Type'].startswith('text/plain'))
+
+
 class ApplicationManagerTests(ConfigTestBase, unittest.TestCase):
 
     def setUp(self):
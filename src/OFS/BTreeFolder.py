@@ -0,0 +1,117 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+""" 'Folder' for very large numbers of objects.
+"""
+
+from AccessControl.class_init import InitializeClass
+from Acquisition import aq_base
+from Acquisition import aq_inner
+from Acquisition import aq_parent
+from App.special_dtml import DTMLFile
+from OFS.BTreeObjectManager import BTreeObjectManager
+from OFS.BTreeObjectManager import OrderedBTreeObjectManager
+from OFS.Folder import Folder
+from OFS.interfaces import IOrderedFolder
+from OFS.OrderSupport import OrderSupport
+from zope.interface import implementer
+
+
+manage_addBTreeFolderForm = DTMLFile('dtml/addBTreeFolder', globals())
+manage_addOrderedBTreeFolderForm = DTMLFile(
+    'dtml/addOrderedBTreeFolder', globals())
+
+
+def manage_addBTreeFolder(self, id, title='', REQUEST=None):
+    """Add a new BTree Folder object with id *id*.
+    """
+    ob = BTreeFolder(id)
+    ob.title = title
+    self._setObject(id, ob)
+    ob = self._getOb(id)
+    if REQUEST is not None:
+        return self.manage_main(self, REQUEST)
+
+
+def manage_addOrderedBTreeFolder(self, id, title='', REQUEST=None):
+    """Add a new ordered BTree Folder object with id *id*.
+    """
+    ob = OrderedBTreeFolder(id)
+    ob.title = title
+    self._setObject(id, ob)
+    ob = self._getOb(id)
+    if REQUEST is not None:
+        return self.manage_main(self, REQUEST)
+
+
+class BTreeFolder(BTreeObjectManager, Folder):
+
+    """ A Folder storing its objects in BTrees.
+    """
+    meta_type = 'Folder (BTree)'
+    zmi_icon = 'far fa-folder'
+
+    def __init__(self, id=None):
+        Folder.__init__(self, id)
+        self._initBTrees()
+
+
+InitializeClass(BTreeFolder)
+
+
+@implementer(IOrderedFolder)
+class OrderedBTreeFolder(OrderedBTreeObjectManager, Folder):
+
+    """ A BTree Folder with order support.
+    """
+    meta_type = 'Folder (Ordered BTree)'
+    zmi_icon = 'far fa-folder zmi-icon-folder-ordered'
+
+    manage_options = (
+        OrderSupport.manage_options +
+        Folder.manage_options[1:]
+    )
+
+    def __init__(self, id=None):
+        Folder.__init__(self, id)
+        self._initBTrees()
+
+
+InitializeClass(OrderedBTreeFolder)
+
+
+def migrateToBTreeFolder(folder):
+    """Replace ``folder`` by a BTreeFolder with the same contents.
+
+    Ordered folders are replaced by an OrderedBTreeFolder. The new folder
+    gets all attributes of ``folder`` and takes its place in the
+    container, without sending any events. The (wrapped) new folder is
+    returned.
+    """
+    if getattr(aq_base(folder), 'has_order_support', False):
+        klass = OrderedBTreeFolder
+    else:
+        klass = BTreeFolder
+    container = aq_parent(aq_inner(folder))
+    old = aq_base(folder)
+    id = old.getId()
+    old._p_activate()
+    new = klass.__new__(klass)
+    new.__dict__.update(old.__dict__)
+    new._migrateObjects()
+    container._setOb(id, new)
+    objects = getattr(aq_base(container), '_objects', ())
+    if objects:
+        container._objects = tuple(
+            dict(info, meta_type=new.meta_type) if info['id'] == id else info
+            for info in objects)
+    return container._getOb(id)
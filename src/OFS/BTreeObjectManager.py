@@ -0,0 +1,299 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""ObjectManager storing its subobjects in BTrees.
+
+A regular ObjectManager keeps its subobjects as attributes and lists them
+in the ``_objects`` tuple, so the whole tuple is rewritten whenever an
+object is added or removed. ``BTreeObjectManager`` keeps them in an
+``OOBTree`` of id to object instead, together with id to meta_type and
+meta_type to ids indexes and a ``Length`` counter. Adding, removing and
+looking up objects only touches a few buckets, which makes very large
+folders feasible.
+
+``objectIds``, ``objectValues`` and ``objectItems`` return lazy sequences
+instead of lists, they cannot be changed in place. The objects are sorted
+by id, unless ``OrderedBTreeObjectManager`` keeps them in an ``Ordering``.
+"""
+
+from AccessControl import ClassSecurityInfo
+from AccessControl.class_init import InitializeClass
+from AccessControl.Permissions import access_contents_information
+from AccessControl.Permissions import manage_properties
+from BTrees.Length import Length
+from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOTreeSet
+from OFS.ObjectManager import ObjectManager
+from OFS.ordering import Ordering
+from OFS.OrderSupport import OrderSupport
+from six import string_types
+from zope.container.contained import notifyContainerModified
+from ZTUtils.Lazy import LazyMap
+
+
+_marker = []
+
+
+class BTreeObjectManager(ObjectManager):
+    """An ObjectManager storing its subobjects in BTrees."""
+
+    security = ClassSecurityInfo()
+
+    _tree = None  # id -> object
+    _meta_types = None  # id -> meta_type
+    _mt_index = None  # meta_type -> ids
+    _count = None  # the number of subobjects
+
+    def _initBTrees(self):
+        self._tree = OOBTree()
+        self._meta_types = OOBTree()
+        self._mt_index = OOBTree()
+        self._count = Length()
+
+    def _metaTypeIndex(self):
+        # Return the OOBTree of meta_type to an OOTreeSet of ids.
+        # Objects without a meta_type are not indexed.
+        index = self._mt_index
+        if index is None:
+            index = self._mt_index = OOBTree()
+            for id, meta_type in self._meta_types.items():
+                self._indexMetaType(index, id, meta_type)
+        return index
+
+    def _indexMetaType(self, index, id, meta_type):
+        if meta_type is None:
+            return
+        ids = index.get(meta_type)
+        if ids is None:
+            ids = index[meta_type] = OOTreeSet()
+        ids.insert(id)
+
+    def _unindexMetaType(self, index, id, meta_type):
+        ids = index.get(meta_type) if meta_type is not None else None
+        if ids is not None:
+            ids.remove(id)
+            if not ids:
+                del index[meta_type]
+
+    def __getattr__(self, name):
+        # Subobjects are available as attributes like in a regular
+        # ObjectManager, which makes them available to acquisition.
+        # Their ids cannot start with an underscore.
+        if not name.startswith('_'):
+            tree = self._tree
+            if tree is not None:
+                ob = tree.get(name, _marker)
+                if ob is not _marker:
+                    return ob
+        raise AttributeError(name)
+
+    def _setOb(self, id, object):
+        if self._tree is None:
+            self._initBTrees()
+        tree = self._tree
+        index = self._metaTypeIndex()
+        if id in tree:
+            self._unindexMetaType(index, id, self._meta_types[id])
+        else:
+            self._count.change(1)
+        meta_type = getattr(object, 'meta_type', None)
+        tree[id] = object
+        self._meta_types[id] = meta_type
+        self._indexMetaType(index, id, meta_type)
+
+    def _delOb(self, id):
+        tree = self._tree
+        if tree is None or id not in tree:
+            raise AttributeError(id)
+        self._unindexMetaType(
+            self._metaTypeIndex(), id, self._meta_types[id])
+        del tree[id]
+        del self._meta_types[id]
+        self._count.change(-1)
+
+    def _getOb(self, id, default=_marker):
+        tree = self._tree
+        if tree is not None:
+            ob = tree.get(id, _marker)
+            if ob is not _marker:
+                if hasattr(ob, '__of__'):
+                    ob = ob.__of__(self)
+                return ob
+        if default is _marker:
+            raise AttributeError(id)
+        return default
+
+    def _addObjectInfo(self, id, meta_type):
+        # The index is maintained by _setOb.
+        pass
+
+    def _removeObjectInfo(self, id):
+        # The index is maintained by _delOb.
+        pass
+
+    def _migrateObjects(self):
+        """Move the subobjects of a regular ObjectManager into the BTrees.
+
+        This converts instances created while their class was not yet
+        based on BTreeObjectManager.
+        """
+        self._p_activate()
+        if self._tree is None:
+            self._initBTrees()
+        state = self.__dict__
+        for info in state.get('_objects', ()):
+            id = info['id']
+            if id in state:
+                ob = state[id]
+                delattr(self, id)
+                self._setOb(id, ob)
+        if '_objects' in state:
+            del self._objects
+
+    @security.protected(access_contents_information)
+    def objectCount(self):
+        """Return the number of subobjects."""
+        count = self._count
+        return count() if count is not None else 0
+
+    @security.protected(access_contents_information)
+    def objectIds(self, spec=None):
+        # Returns a lazy sequence of subobject ids of the current object.
+        # If 'spec' is specified, returns objects whose meta_type
+        # matches 'spec'.
+        if self._tree is None:
+            return []
+        if spec is None:
+            return self._tree.keys()
+        if isinstance(spec, string_types):
+            spec = [spec]
+        if None in spec:
+            return [id for id, meta_type in self._meta_types.items()
+                    if meta_type in spec]
+        index = self._metaTypeIndex()
+        ids = [index.get(meta_type) for meta_type in set(spec)]
+        ids = [i for i in ids if i is not None]
+        if len(ids) == 1:
+            return list(ids[0])
+        return sorted(id for i in ids for id in i)
+
+    @security.protected(access_contents_information)
+    def objectValues(self, spec=None):
+        return LazyMap(self._getOb, self.objectIds(spec))
+
+    @security.protected(access_contents_information)
+    def objectItems(self, spec=None):
+        return LazyMap(lambda id: (id, self._getOb(id)),
+                       self.objectIds(spec))
+
+    def objectMap(self):
+        # Return a tuple of mappings containing subobject meta-data
+        if self._meta_types is None:
+            return ()
+        return tuple({'id': id, 'meta_type': meta_type}
+                     for id, meta_type in self._meta_types.items())
+
+    @security.protected(access_contents_information)
+    def objectMap_d(self, t=None):
+        n = getattr(self, '_reserved_names', ())
+        return [d for d in self.objectMap() if d['id'] not in n]
+
+    def __contains__(self, name):
+        tree = self._tree
+        if tree is None:
+            return False
+        try:
+            return name in tree
+        except TypeError:
+            # Not comparable to the ids, e.g. None.
+            return False
+
+    def __len__(self):
+        return self.objectCount()
+
+
+InitializeClass(BTreeObjectManager)
+
+
+class OrderedBTreeObjectManager(OrderSupport, BTreeObjectManager):
+    """A BTreeObjectManager keeping its subobjects in a given order."""
+
+    security = ClassSecurityInfo()
+
+    _order = None
+
+    def _initBTrees(self):
+        BTreeObjectManager._initBTrees(self)
+        self._order = Ordering()
+
+    def _ordering(self):
+        order = self._order
+        if order is None:
+            order = self._order = Ordering(self._tree.keys())
+        return order
+
+    def _setOb(self, id, object):
+        added = self._tree is None or id not in self._tree
+        BTreeObjectManager._setOb(self, id, object)
+        if added:
+            self._ordering().append(id)
+
+    def _delOb(self, id):
+        BTreeObjectManager._delOb(self, id)
+        self._ordering().remove(id)
+
+    @security.protected(access_contents_information)
+    def objectIds(self, spec=None):
+        if self._tree is None:
+            return []
+        if spec is None:
+            return list(self._ordering())
+        ids = BTreeObjectManager.objectIds(self, spec)
+        return sorted(ids, key=self._ordering().index)
+
+    def objectMap(self):
+        # Return a tuple of mappings containing subobject meta-data
+        if self._tree is None:
+            return ()
+        meta_types = self._meta_types
+        return tuple({'id': id, 'meta_type': meta_types[id]}
+                     for id in self._ordering())
+
+    def _getOrderedIds(self):
+        return self.objectIds()
+
+    def _setOrderedIds(self, ids):
+        self._ordering().reorder(ids)
+
+    @security.protected(access_contents_information)
+    def getObjectPosition(self, id):
+        # Get the position of an object by its id.
+        try:
+            return self._ordering().index(id)
+        except ValueError:
+            raise ValueError(
+                'The object with the id "%s" does not exist.' % id)
+
+    @security.protected(manage_properties)
+    def moveObjectToPosition(self, id, position, suppress_events=False):
+        # Move specified object to absolute position.
+        order = self._ordering()
+        old_position = self.getObjectPosition(id)
+        position = max(min(position, len(order) - 1), 0)
+        if position != old_position:
+            order.move(id, position)
+        if not suppress_events:
+            notifyContainerModified(self)
+        return int(position != old_position)
+
+
+InitializeClass(OrderedBTreeObjectManager)
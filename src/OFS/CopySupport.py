@@ -63,6 +63,11 @@ copy_re = re.compile('^copy([0-9]*)_of_(.*)')
 logger = logging.getLogger('OFS')
 _marker = []
 
+# Exports of copied objects up to this size are kept in memory, larger
+# ones are spooled to a temporary file. The ZConfig machinery may set this
+# attribute on initialization.
+copy_memory_limit = 1 << 22
+
 
 @implementer(ICopyContainer)
 class CopyContainer(Base):
@@ -208,7 +213,6 @@ class CopyContainer(Base):
         if op == 0:
             # Copy operation
             for ob in oblist:
-                orig_id = ob.getId()
                 if not ob.cb_isCopyable():
                     raise CopyError('Not Supported')
 
@@ -219,11 +223,15 @@ class CopyContainer(Base):
                 except Exception:
                     raise CopyError('Copy Error')
 
+            # Copy all objects together, which saves a savepoint and a
+            # temporary file per object.
+            copies = _getCopies(oblist, self)
+
+            for orig_ob, ob in zip(oblist, copies):
+                orig_id = orig_ob.getId()
                 id = self._get_id(orig_id)
                 result.append({'id': orig_id, 'new_id': id})
 
-                orig_ob = ob
-                ob = ob._getCopy(self)
                 ob._setId(id)
                 notify(ObjectCopiedEvent(ob, orig_ob))
 
@@ -543,25 +551,11 @@ class CopySource(Base):
         pass
 
     def _getCopy(self, container):
-        # Commit a subtransaction to:
-        # 1) Make sure the data about to be exported is current
-        # 2) Ensure self._p_jar and container._p_jar are set even if
-        #    either one is a new object
-        transaction.savepoint(optimistic=True)
-
-        if self._p_jar is None:
-            raise CopyError(
-                'Object "%r" needs to be in the database to be copied' % self)
-        if container._p_jar is None:
-            raise CopyError(
-                'Container "%r" needs to be in the database' % container)
-
         # Ask an object for a new copy of itself.
-        with tempfile.TemporaryFile() as f:
-            self._p_jar.exportFile(self._p_oid, f)
-            f.seek(0)
-            ob = container._p_jar.importFile(f)
+        ob, = _exportCopies([self], container)
+        return self._checkCopy(ob, container)
 
+    def _checkCopy(self, cp, container):
         # Cleanup the copy.  It may contain private objects that the current
         # user is not allowed to see.
         sm = getSecurityManager()
@@ -569,8 +563,8 @@ class CopySource(Base):
             # The user is not allowed to view the object that is currently
             # being copied, so it makes no sense to check any of its sub
             # objects.  It probably means we are in a test.
-            return ob
-        return self._cleanupCopy(ob, container)
+            return cp
+        return self._cleanupCopy(cp, container)
 
     def _cleanupCopy(self, cp, container):
         sm = getSecurityManager()
@@ -640,6 +634,54 @@ class CopySource(Base):
 InitializeClass(CopySource)
 
 
+def _getCopies(obs, container):
+    # Return copies of obs for container. The objects which copy
+    # themselves like CopySource are exported after a single savepoint
+    # into a shared buffer, and imported from it.
+    default = six.get_unbound_function(CopySource._getCopy)
+    copies = [None] * len(obs)
+    batch = []
+    for i, ob in enumerate(obs):
+        method = getattr(aq_base(ob).__class__, '_getCopy', None)
+        if method is not None and \
+                six.get_unbound_function(method) is default:
+            batch.append(i)
+        else:
+            copies[i] = ob._getCopy(container)
+    if batch:
+        exported = _exportCopies([obs[i] for i in batch], container)
+        for i, cp in zip(batch, exported):
+            copies[i] = obs[i]._checkCopy(cp, container)
+    return copies
+
+
+def _exportCopies(obs, container):
+    # Commit a subtransaction to:
+    # 1) Make sure the data about to be exported is current
+    # 2) Ensure the _p_jar of the objects and container._p_jar are set
+    #    even if either one is a new object
+    transaction.savepoint(optimistic=True)
+
+    for ob in obs:
+        if ob._p_jar is None:
+            raise CopyError(
+                'Object "%r" needs to be in the database to be copied' % ob)
+    if container._p_jar is None:
+        raise CopyError(
+            'Container "%r" needs to be in the database' % container)
+
+    # Export the objects one after the other into the same buffer, in
+    # memory unless it gets larger than copy_memory_limit. Each import
+    # reads one export, so every copy gets its own copies of the objects
+    # it references.
+    max_size = max(copy_memory_limit, 1)  # 0 would not limit the size
+    with tempfile.SpooledTemporaryFile(max_size=max_size) as f:
+        for ob in obs:
+            ob._p_jar.exportFile(ob._p_oid, f)
+        f.seek(0)
+        return [container._p_jar.importFile(f) for ob in obs]
+
+
 def sanity_check(c, ob):
     # This is called on cut/paste operations to make sure that
     # an object is not cut and pasted into itself or one of its
@@ -28,6 +28,8 @@ from ExtensionClass import Base
 from OFS.interfaces import IFindSupport
 from zope.interface import implementer
 
+import time
+
 
 @implementer(IFindSupport)
 class FindSupport(Base):
@@ -56,8 +58,15 @@ class FindSupport(Base):
                  obj_mtime=None, obj_mspec=None,
                  obj_permission=None, obj_roles=None,
                  search_sub=0,
-                 REQUEST=None, result=None, pre=''):
+                 REQUEST=None, result=None, pre='',
+                 limit=None, timeout=None):
         """Zope Find interface."""
+        if limit is not None or timeout is not None:
+            criteria = _prepareCriteria(
+                obj_ids, obj_metatypes, obj_searchterm, obj_expr,
+                obj_mtime, obj_mspec, obj_permission, obj_roles)
+            return list(_findIter(obj, criteria, search_sub, pre,
+                                  limit, timeout, ghost=False))
         return self.ZopeFindAndApply(
             obj, obj_ids=obj_ids,
             obj_metatypes=obj_metatypes, obj_searchterm=obj_searchterm,
@@ -67,6 +76,26 @@ class FindSupport(Base):
             pre=pre, apply_func=None, apply_path=''
         )
 
+    @security.protected(view_management_screens)
+    def ZopeFindIter(self, obj, obj_ids=None, obj_metatypes=None,
+                     obj_searchterm=None, obj_expr=None,
+                     obj_mtime=None, obj_mspec=None,
+                     obj_permission=None, obj_roles=None,
+                     search_sub=0,
+                     REQUEST=None, pre='',
+                     limit=None, timeout=None):
+        """Iterate over the (path, object) pairs found by Zope Find.
+
+        The objects are searched as the iteration proceeds, until
+        ``limit`` pairs are found or ``timeout`` seconds passed. Objects
+        loaded from the database for the search are turned into ghosts
+        again once the iteration moves on from them.
+        """
+        criteria = _prepareCriteria(
+            obj_ids, obj_metatypes, obj_searchterm, obj_expr,
+            obj_mtime, obj_mspec, obj_permission, obj_roles)
+        return _findIter(obj, criteria, search_sub, pre, limit, timeout)
+
     @security.protected(view_management_screens)
     def ZopeFindAndApply(self, obj, obj_ids=None, obj_metatypes=None,
                          obj_searchterm=None, obj_expr=None,
@@ -79,41 +108,124 @@ class FindSupport(Base):
 
         if result is None:
             result = []
+            criteria = _prepareCriteria(
+                obj_ids, obj_metatypes, obj_searchterm, obj_expr,
+                obj_mtime, obj_mspec, obj_permission, obj_roles)
+        else:
+            criteria = (obj_ids, obj_metatypes, obj_searchterm, obj_expr,
+                        obj_mtime, obj_mspec, obj_permission, obj_roles)
 
-            if obj_metatypes and 'all' in obj_metatypes:
-                obj_metatypes = None
+        try:
+            add_result = result.append
+        except Exception:
+            raise AttributeError(repr(result))
 
-            if obj_mtime and isinstance(obj_mtime, str):
-                obj_mtime = DateTime(obj_mtime).timeTime()
+        # Objects found are kept in memory if they are returned.
+        found = _findIter(obj, criteria, search_sub, pre,
+                          ghost=apply_func is not None)
+        for p, ob in found:
+            if apply_func:
+                apply_func(ob, (apply_path + '/' + p))
+            else:
+                add_result((p, ob))
 
-            if obj_permission:
-                obj_permission = getPermissionIdentifier(obj_permission)
+        return result
 
-            if obj_roles and isinstance(obj_roles, str):
-                obj_roles = [obj_roles]
 
-            if obj_expr:
-                # Setup expr machinations
-                md = td()
-                obj_expr = (Eval(obj_expr), md, md._push, md._pop)
+InitializeClass(FindSupport)
 
-        base = aq_base(obj)
 
-        if not hasattr(base, 'objectItems'):
-            return result
-        try:
-            items = obj.objectItems()
-        except Exception:
-            return result
+class td(RestrictedDTML, TemplateDict):
+    pass
 
-        try:
-            add_result = result.append
-        except Exception:
-            raise AttributeError(repr(result))
 
-        for id, ob in items:
-            if pre:
-                p = "%s/%s" % (pre, id)
+def _prepareCriteria(obj_ids, obj_metatypes, obj_searchterm, obj_expr,
+                     obj_mtime, obj_mspec, obj_permission, obj_roles):
+    # Return the search criteria converted for matching objects.
+    if obj_metatypes and 'all' in obj_metatypes:
+        obj_metatypes = None
+
+    if obj_mtime and isinstance(obj_mtime, str):
+        obj_mtime = DateTime(obj_mtime).timeTime()
+
+    if obj_permission:
+        obj_permission = getPermissionIdentifier(obj_permission)
+
+    if obj_roles and isinstance(obj_roles, str):
+        obj_roles = [obj_roles]
+
+    if obj_expr:
+        # Setup expr machinations
+        md = td()
+        obj_expr = (Eval(obj_expr), md, md._push, md._pop)
+
+    return (obj_ids, obj_metatypes, obj_searchterm, obj_expr,
+            obj_mtime, obj_mspec, obj_permission, obj_roles)
+
+
+def _matches(ob, criteria):
+    (obj_ids, obj_metatypes, obj_searchterm, obj_expr,
+     obj_mtime, obj_mspec, obj_permission, obj_roles) = criteria
+    bs = aq_base(ob)
+    return ((not obj_ids or absattr(bs.getId()) in obj_ids) and
+            (not obj_metatypes or (hasattr(bs, 'meta_type') and
+             bs.meta_type in obj_metatypes)) and
+            (not obj_searchterm or
+             (hasattr(ob, 'PrincipiaSearchSource') and
+              obj_searchterm in ob.PrincipiaSearchSource()) or
+             (hasattr(ob, 'SearchableText') and
+              obj_searchterm in ob.SearchableText())
+             ) and
+            (not obj_expr or expr_match(ob, obj_expr)) and
+            (not obj_mtime or mtime_match(ob, obj_mtime, obj_mspec)) and
+            ((not obj_permission or not obj_roles) or
+             role_match(ob, obj_permission, obj_roles)))
+
+
+def _objectItems(obj):
+    # Return the subobjects of obj to search, or None.
+    if not hasattr(aq_base(obj), 'objectItems'):
+        return None
+    try:
+        return obj.objectItems()
+    except Exception:
+        return None
+
+
+def _findIter(obj, criteria, search_sub, pre='', limit=None, timeout=None,
+              ghost=True):
+    # Walk the tree below obj depth first, without recursion, and yield
+    # the (path, object) pairs matching criteria. Objects which were
+    # ghosts are deactivated again when the walk is done with them, the
+    # ones yielded only if ghost is true.
+    if limit is not None and limit <= 0:
+        return
+    if timeout is not None:
+        deadline = time.time() + timeout
+    else:
+        deadline = None
+    items = _objectItems(obj)
+    if items is None:
+        return
+    # Each entry holds the path of a container, the iterator over its
+    # subobjects and the container if it has to be deactivated.
+    stack = [(pre, iter(items), None)]
+    found = 0
+    try:
+        while stack:
+            prefix, items, container = stack[-1]
+            item = next(items, None)
+            if item is None:
+                stack.pop()
+                if container is not None:
+                    container._p_deactivate()
+                continue
+            if deadline is not None and time.time() > deadline:
+                return
+
+            id, ob = item
+            if prefix:
+                p = "%s/%s" % (prefix, id)
             else:
                 p = id
 
@@ -121,46 +233,33 @@ class FindSupport(Base):
             if hasattr(ob, '_p_changed') and (ob._p_changed is None):
                 dflag = 1
 
-            bs = aq_base(ob)
-            if ((not obj_ids or absattr(bs.getId()) in obj_ids) and
-                (not obj_metatypes or (hasattr(bs, 'meta_type') and
-                 bs.meta_type in obj_metatypes)) and
-                (not obj_searchterm or
-                 (hasattr(ob, 'PrincipiaSearchSource') and
-                  obj_searchterm in ob.PrincipiaSearchSource()) or
-                 (hasattr(ob, 'SearchableText') and
-                  obj_searchterm in ob.SearchableText())
-                 ) and
-                (not obj_expr or expr_match(ob, obj_expr)) and
-                (not obj_mtime or mtime_match(ob, obj_mtime, obj_mspec)) and
-                ((not obj_permission or not obj_roles) or
-                 role_match(ob, obj_permission, obj_roles))):
-
-                if apply_func:
-                    apply_func(ob, (apply_path + '/' + p))
-                else:
-                    add_result((p, ob))
+            if _matches(ob, criteria):
+                if not ghost:
                     dflag = 0
-
-            if search_sub and hasattr(bs, 'objectItems'):
-                self.ZopeFindAndApply(ob, obj_ids, obj_metatypes,
-                                      obj_searchterm, obj_expr,
-                                      obj_mtime, obj_mspec,
-                                      obj_permission, obj_roles,
-                                      search_sub,
-                                      REQUEST, result, p,
-                                      apply_func, apply_path)
+                try:
+                    yield p, ob
+                except GeneratorExit:
+                    if dflag:
+                        ob._p_deactivate()
+                    raise
+                found += 1
+                if limit is not None and found >= limit:
+                    if dflag:
+                        ob._p_deactivate()
+                    return
+
+            if search_sub:
+                items = _objectItems(ob)
+                if items is not None:
+                    stack.append((p, iter(items), ob if dflag else None))
+                    continue
             if dflag:
                 ob._p_deactivate()
-
-        return result
-
-
-InitializeClass(FindSupport)
-
-
-class td(RestrictedDTML, TemplateDict):
-    pass
+    finally:
+        # Also when the caller stops iterating early.
+        for prefix, items, container in stack:
+            if container is not None:
+                container._p_deactivate()
 
 
 def expr_match(ob, ed, c=InstanceDict, r=0):
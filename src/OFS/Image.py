@@ -19,14 +19,18 @@ from AccessControl.Permissions import ftp_access
 from AccessControl.Permissions import view as View  # NOQA
 from AccessControl.Permissions import view_management_screens
 from AccessControl.SecurityInfo import ClassSecurityInfo
+from Acquisition import aq_base
 from Acquisition import Implicit
+from App.Common import etag_matches
 from App.Common import rfc1123_date
 from App.special_dtml import DTMLFile
+from bisect import bisect_right
 from DateTime.DateTime import DateTime
 from email.generator import _make_boundary
 from io import BytesIO
 from OFS import bbb
 from OFS.Cache import Cacheable
+from OFS.EtagSupport import EtagSupport
 from OFS.interfaces import IWriteLock
 from OFS.PropertyManager import PropertyManager
 from OFS.role import RoleManager
@@ -37,6 +41,10 @@ from six import PY2
 from six import text_type
 from zExceptions import Redirect
 from zExceptions import ResourceLockedError
+from ZODB.blob import Blob
+from ZODB.interfaces import BlobError
+from ZODB.utils import u64
+from ZODB.utils import z64
 from zope.contenttype import guess_content_type
 from zope.event import notify
 from zope.interface import implementer
@@ -44,8 +52,11 @@ from zope.lifecycleevent import ObjectCreatedEvent
 from zope.lifecycleevent import ObjectModifiedEvent
 from ZPublisher import HTTPRangeSupport
 from ZPublisher.HTTPRequest import FileUpload
+from ZPublisher.Iterators import filestream_iterator
 
+import shutil
 import struct
+import zlib
 import ZPublisher.HTTPRequest
 
 
@@ -55,6 +66,19 @@ except ImportError:  # PY2
     from cgi import escape
 
 
+# Uploaded data of at least this size is stored in a ZODB blob instead of
+# Pdata records if set, the database then has to support blobs. The ZConfig
+# machinery may set this attribute on initialization.
+blob_threshold = 0
+
+# The size of the Pdata records large uploads are split into, and the
+# number of bytes of them kept in memory until they are saved in a
+# savepoint. The ZConfig machinery may set these attributes on
+# initialization.
+pdata_size = 1 << 16
+savepoint_size = 1 << 22
+
+
 manage_addFileForm = DTMLFile(
     'dtml/imageAdd',
     globals(),
@@ -122,6 +146,8 @@ class File(
 
     precondition = ''
     size = None
+    # The PdataIndex of a Pdata chain in data.
+    _pdata_index = None
 
     manage_editForm = DTMLFile('dtml/fileEdit', globals(),
                                Kind='File', kind='file')
@@ -157,9 +183,38 @@ class File(
         content_type = self._get_content_type(file, data, id, content_type)
         self.update_data(data, content_type, size)
 
+    def http__etag(self, readonly=0):
+        # The ETag is derived from the serial of the stored state and the
+        # content type, so reading it never writes. Objects which are new
+        # or changed in the current transaction have no serial of their
+        # state yet and use the stored timestamp ETag instead.
+        self._p_activate()
+        serial = self._p_serial
+        if serial == z64 or self._p_changed:
+            return EtagSupport.http__etag(self, readonly)
+        content_type = getattr(self, 'content_type', '')
+        if isinstance(content_type, text_type):
+            content_type = content_type.encode('utf-8')
+        return 'ts%016x%08x' % (
+            u64(serial), zlib.crc32(content_type) & 0xffffffff)
+
     def _if_modified_since_request_handler(self, REQUEST, RESPONSE):
-        # HTTP If-Modified-Since header handling: return True if
-        # we can handle this request by returning a 304 response
+        # HTTP If-None-Match and If-Modified-Since header handling: return
+        # True if we can handle this request by returning a 304 response
+        header = REQUEST.get_header('If-None-Match', None)
+        if header is not None:
+            # If-None-Match takes precedence over If-Modified-Since.
+            etag = self.http__etag(readonly=1)
+            if etag is not None and etag_matches(header, etag):
+                RESPONSE.setHeader(
+                    'Last-Modified', rfc1123_date(self._p_mtime)
+                )
+                RESPONSE.setHeader('Content-Type', self.content_type)
+                RESPONSE.setHeader('Accept-Ranges', 'bytes')
+                RESPONSE.setStatus(304)
+                return True
+            return False
+
         header = REQUEST.get_header('If-Modified-Since', None)
         if header is not None:
             header = header.split(';')[0]
@@ -205,9 +260,11 @@ class File(
             if if_range is not None:
                 # Only send ranges if the data isn't modified, otherwise send
                 # the whole object. Support both ETags and Last-Modified dates!
+                if len(if_range) > 2 and if_range[0] == if_range[-1] == '"':
+                    if_range = if_range[1:-1]
                 if len(if_range) > 1 and if_range[:2] == 'ts':
                     # ETag:
-                    if if_range != self.http__etag():
+                    if if_range != self.http__etag(readonly=1):
                         # Modified, so send a normal response. We delete
                         # the ranges, which causes us to skip to the 200
                         # response.
@@ -270,35 +327,8 @@ class File(
                     )
                     RESPONSE.setStatus(206)  # Partial content
 
-                    data = self.data
-                    if isinstance(data, binary_type):
-                        RESPONSE.write(data[start:end])
-                        return True
-
-                    # Linked Pdata objects. Urgh.
-                    pos = 0
-                    while data is not None:
-                        length = len(data.data)
-                        pos = pos + length
-                        if pos > start:
-                            # We are within the range
-                            lstart = length - (pos - start)
-
-                            if lstart < 0:
-                                lstart = 0
-
-                            # find the endpoint
-                            if end <= pos:
-                                lend = length - (pos - end)
-
-                                # Send and end transmission
-                                RESPONSE.write(data[lstart:lend])
-                                break
-
-                            # Not yet at the end, transmit what we have.
-                            RESPONSE.write(data[lstart:])
-
-                        data = data.next
+                    for chunk in self._data_range(start, end):
+                        RESPONSE.write(chunk)
 
                     return True
 
@@ -333,12 +363,6 @@ class File(
                     )
                     RESPONSE.setStatus(206)  # Partial content
 
-                    data = self.data
-                    # The Pdata map allows us to jump into the Pdata chain
-                    # arbitrarily during out-of-order range searching.
-                    pdata_map = {}
-                    pdata_map[0] = data
-
                     for start, end in ranges:
                         RESPONSE.write(
                             b'\r\n--'
@@ -360,60 +384,71 @@ class File(
                             + b'\r\n\r\n'
                         )
 
-                        if isinstance(data, binary_type):
-                            RESPONSE.write(data[start:end])
-
-                        else:
-                            # Yippee. Linked Pdata objects. The following
-                            # calculations allow us to fast-forward through the
-                            # Pdata chain without a lot of dereferencing if we
-                            # did the work already.
-                            first_size = len(pdata_map[0].data)
-                            if start < first_size:
-                                closest_pos = 0
-                            else:
-                                closest_pos = (
-                                    ((start - first_size) >> 16 << 16)
-                                    + first_size
-                                )
-                            pos = min(closest_pos, max(pdata_map.keys()))
-                            data = pdata_map[pos]
-
-                            while data is not None:
-                                length = len(data.data)
-                                pos = pos + length
-                                if pos > start:
-                                    # We are within the range
-                                    lstart = length - (pos - start)
-
-                                    if lstart < 0:
-                                        lstart = 0
-
-                                    # find the endpoint
-                                    if end <= pos:
-                                        lend = length - (pos - end)
-
-                                        # Send and loop to next range
-                                        RESPONSE.write(data[lstart:lend])
-                                        break
-
-                                    # Not yet at the end,
-                                    # transmit what we have.
-                                    RESPONSE.write(data[lstart:])
-
-                                data = data.next
-                                # Store a reference to a Pdata chain link
-                                # so we don't have to deref during
-                                # this request again.
-                                pdata_map[pos] = data
-
-                    # Do not keep the link references around.
-                    del pdata_map
+                        for chunk in self._data_range(start, end):
+                            RESPONSE.write(chunk)
 
                     RESPONSE.write(
                         b'\r\n--' + boundary.encode('ascii') + b'--\r\n')
                     return True
 
+    def _data_index(self):
+        # Return the start offsets and the links of the Pdata chain.
+        data = aq_base(self.data)
+        index = self._pdata_index
+        if index is not None and index.links and index.links[0] is data:
+            return index.offsets, index.links
+        # Not indexed yet, or data was replaced without update_data.
+        cached = aq_base(self).__dict__.get('_v_pdata_index')
+        if cached is None or cached[1][0] is not data:
+            cached = self._v_pdata_index = _index_pdata(data)
+        return cached
+
+    def _data_range(self, start, end):
+        # Iterate over the data from start up to end, loading only the
+        # Pdata links holding it.
+        data = self.data
+        if isinstance(data, binary_type):
+            yield data[start:end]
+            return
+        if isinstance(data, Blob):
+            with data.open('r') as fp:
+                fp.seek(start)
+                while start < end:
+                    chunk = fp.read(min(end - start, 1 << 16))
+                    if not chunk:
+                        break
+                    start += len(chunk)
+                    yield chunk
+            return
+        offsets, links = self._data_index()
+        i = max(bisect_right(offsets, start) - 1, 0)
+        while i < len(links) and offsets[i] < end:
+            offset = offsets[i]
+            yield links[i].data[max(start - offset, 0):end - offset]
+            i += 1
+
+    def _update_data_index(self, data):
+        # Index the Pdata chain of new data at the time it is set. The
+        # first link references the index too, for its len().
+        if isinstance(data, Pdata):
+            data = aq_base(data)
+            index = data._index
+            if index is None:
+                cached = aq_base(self).__dict__.get('_v_pdata_index')
+                if cached is None or cached[1][0] is not data:
+                    cached = _index_pdata(data)
+                index = data._index = PdataIndex(*cached)
+            self._pdata_index = index
+        elif self._pdata_index is not None:
+            self._pdata_index = None
+
+    def _data_size(self):
+        # Return the size of data, from the index of a Pdata chain.
+        index = self._pdata_index
+        if index is not None:
+            return index.get_size()
+        return len(self.data)
+
     @security.protected(View)
     def index_html(self, REQUEST, RESPONSE):
         """
@@ -423,6 +458,10 @@ class File(
         Content-Type HTTP header to the objects content type.
         """
 
+        etag = self.http__etag(readonly=1)
+        if etag is not None:
+            RESPONSE.setHeader('ETag', '"%s"' % etag)
+
         if self._if_modified_since_request_handler(REQUEST, RESPONSE):
             # we were able to handle this by returning a 304
             # unfortunately, because the HTTP cache manager uses the cache
@@ -468,6 +507,9 @@ class File(
             RESPONSE.setBase(None)
             return data
 
+        if isinstance(data, Blob):
+            return self._blob_body(data, RESPONSE)
+
         while data is not None:
             RESPONSE.write(data.data)
             data = data.next
@@ -483,7 +525,7 @@ class File(
     def PrincipiaSearchSource(self):
         """Allow file objects to be searched."""
         if self.content_type.startswith('text/'):
-            return bytes(self.data)
+            return _data_bytes(self.data)
         return b''
 
     @security.private
@@ -494,10 +536,11 @@ class File(
 
         if content_type is not None:
             self.content_type = content_type
+        self.data = data
+        self._update_data_index(data)
         if size is None:
-            size = len(data)
+            size = self._data_size()
         self.size = size
-        self.data = data
         self.ZCacheable_invalidate()
         self.ZCacheable_set(None)
         self.http__refreshEtag()
@@ -572,7 +615,10 @@ class File(
         if headers and 'content-type' in headers:
             content_type = headers['content-type']
         else:
-            if not isinstance(body, bytes):
+            if isinstance(body, Blob):
+                with body.open('r') as fp:
+                    body = fp.read(1 << 16)
+            elif not isinstance(body, bytes):
                 body = body.data
             content_type, enc = guess_content_type(
                 getattr(file, 'filename', id), body, content_type)
@@ -588,7 +634,7 @@ class File(
 
         if isinstance(file, bytes):
             size = len(file)
-            if size < n:
+            if size < n and not _use_blob(size):
                 return (file, size)
             # Big string: cut it into smaller chunks
             file = BytesIO(file)
@@ -604,7 +650,15 @@ class File(
         read = file.read
 
         seek(0, 2)
-        size = end = file.tell()
+        size = file.tell()
+
+        if _use_blob(size):
+            # Stream the data into a blob file instead of Pdata records.
+            seek(0)
+            blob = Blob()
+            with blob.open('w') as fp:
+                shutil.copyfileobj(file, fp, n)
+            return blob, size
 
         if size <= 2 * n:
             seek(0)
@@ -621,35 +675,46 @@ class File(
             seek(0)
             return Pdata(read(size)), size
 
-        # Now we're going to build a linked list from back
-        # to front to minimize the number of database updates
-        # and to allow us to get things out of memory as soon as
-        # possible.
-        _next = None
-        while end > 0:
-            pos = end - n
-            if pos < n:
-                pos = 0  # we always want at least n bytes
-            seek(pos)
-
-            # Create the object and assign it a next pointer
-            # in the same transaction, so that there is only
-            # a single database update for it.
-            data = Pdata(read(end - pos))
-            self._p_jar.add(data)
-            data.next = _next
-
-            # Save the object so that we can release its memory.
-            transaction.savepoint(optimistic=True)
-            data._p_deactivate()
-            # The object should be assigned an oid and be a ghost.
-            assert data._p_oid is not None
-            assert data._p_state == -1
-
-            _next = data
-            end = pos
-
-        return (_next, size)
+        # Now we're going to build a linked list from front to back,
+        # reading the file sequentially. The links are saved in a
+        # savepoint whenever savepoint_size bytes are pending, which gets
+        # them out of memory. Only the last link of each batch is saved
+        # twice, as the next link is assigned to it afterwards.
+        seek(0)
+        first = last = None
+        pos = 0
+        pending = 0
+        unsaved = []
+        offsets = []
+        links = []
+        while pos < size:
+            data = read(min(pdata_size, size - pos))
+            if not data:
+                break
+            link = Pdata(data)
+            self._p_jar.add(link)
+            if last is None:
+                first = link
+            else:
+                last.next = link
+            offsets.append(pos)
+            links.append(link)
+            unsaved.append(link)
+            last = link
+            pos += len(data)
+            pending += len(data)
+            if pending >= savepoint_size:
+                transaction.savepoint(optimistic=True)
+                # The last link is changed again by assigning its next.
+                for saved in unsaved[:-1]:
+                    saved._p_deactivate()
+                unsaved = unsaved[-1:]
+                pending = 0
+
+        # Keep the index of the chain for update_data.
+        self._v_pdata_index = (tuple(offsets), tuple(links))
+
+        return (first, pos)
 
     @security.protected(View)
     def get_size(self):
@@ -670,13 +735,13 @@ class File(
         return self.content_type
 
     def __bytes__(self):
-        return bytes(self.data)
+        return _data_bytes(self.data)
 
     def __str__(self):
         if PY2:
-            return str(self.data)
+            return _data_bytes(self.data)
         else:
-            return self.data.decode(self._get_encoding())
+            return _data_bytes(self.data).decode(self._get_encoding())
 
     def __bool__(self):
         return True
@@ -684,8 +749,7 @@ class File(
     __nonzero__ = __bool__
 
     def __len__(self):
-        data = bytes(self.data)
-        return len(data)
+        return self.get_size()
 
     if bbb.HAS_ZSERVER:
         @security.protected(change_images_and_files)
@@ -729,12 +793,28 @@ class File(
                 RESPONSE.setBase(None)
                 return data
 
+            if isinstance(data, Blob):
+                return self._blob_body(data, RESPONSE)
+
             while data is not None:
                 RESPONSE.write(data.data)
                 data = data.next
 
             return b''
 
+    def _blob_body(self, blob, RESPONSE):
+        # Return the committed blob file as a stream iterator, which the
+        # publisher can hand to the WSGI server to send it with sendfile.
+        # Data uploaded in the current transaction is not committed yet.
+        blob._p_activate()
+        try:
+            name = blob.committed()
+        except BlobError:
+            for chunk in self._data_range(0, self.size):
+                RESPONSE.write(chunk)
+            return b''
+        return filestream_iterator(name, 'rb')
+
 
 InitializeClass(File)
 
@@ -794,7 +874,7 @@ def manage_addImage(
 
 
 def getImageInfo(data):
-    data = bytes(data)
+    data = _data_bytes(data)
     size = len(data)
     height = -1
     width = -1
@@ -928,11 +1008,11 @@ class Image(File):
             raise TypeError('Data can only be bytes or file-like.  '
                             'Unicode objects are expressly forbidden.')
 
+        self.data = data
+        self._update_data_index(data)
         if size is None:
-            size = len(data)
-
+            size = self._data_size()
         self.size = size
-        self.data = data
 
         ct, width, height = getImageInfo(data)
         if ct:
@@ -1038,10 +1118,69 @@ def cookId(id, title, file):
     return id, title
 
 
+def _use_blob(size):
+    return bool(blob_threshold) and size >= blob_threshold
+
+
+def _data_bytes(data):
+    # Return the data of a File as bytes.
+    if isinstance(data, Blob):
+        with data.open('r') as fp:
+            return fp.read()
+    return bytes(data)
+
+
+def migrateToBlob(file):
+    """Move the data of ``file`` from Pdata records into a blob.
+
+    The database of ``file`` has to support blobs. Returns whether the
+    data was moved, which it is not if it already is in a blob.
+    """
+    if isinstance(file.data, Blob):
+        return False
+    blob = Blob()
+    with blob.open('w') as fp:
+        for chunk in file._data_range(0, file.get_size()):
+            fp.write(chunk)
+    file.data = blob
+    file._update_data_index(blob)
+    file.ZCacheable_invalidate()
+    return True
+
+
+def _pdata_links(data):
+    # Iterate over the links of a Pdata chain and their sizes. Links
+    # which were ghosts are made ghosts again, so walking the chain of a
+    # large file does not load all its data into the object cache.
+    while data is not None:
+        data = aq_base(data)
+        ghost = data._p_changed is None
+        size = len(data.data)
+        link = data.next
+        if ghost:
+            data._p_deactivate()
+        yield data, size
+        data = link
+
+
+def _index_pdata(data):
+    # Return the start offsets and the links of a Pdata chain.
+    offsets = []
+    links = []
+    pos = 0
+    for link, size in _pdata_links(data):
+        offsets.append(pos)
+        links.append(link)
+        pos += size
+    return tuple(offsets), tuple(links)
+
+
 class Pdata(Persistent, Implicit):
     # Wrapper for possibly large data
 
     next = None
+    # The PdataIndex of the chain starting with this link, if indexed.
+    _index = None
 
     def __init__(self, data):
         self.data = data
@@ -1054,8 +1193,17 @@ class Pdata(Persistent, Implicit):
         return self.data[key]
 
     def __len__(self):
-        data = bytes(self)
-        return len(data)
+        # Take the size from the index, which only loads the last link.
+        # Add up the sizes of the links of chains without an index.
+        ghost = self._p_changed is None
+        if self._index is not None:
+            return self._index.get_size()
+        size = len(self.data)
+        if self.next is not None:
+            size += sum(length for link, length in _pdata_links(self.next))
+        if ghost:
+            self._p_deactivate()
+        return size
 
     def __bytes__(self):
         _next = self.next
@@ -1072,3 +1220,17 @@ class Pdata(Persistent, Implicit):
 
     if PY2:
         __str__ = __bytes__
+
+
+class PdataIndex(Persistent):
+    # The start offsets and the links of the Pdata chain of a File. It is
+    # a record of its own, so loading the File does not load a reference
+    # to every link.
+
+    def __init__(self, offsets, links):
+        self.offsets = offsets
+        self.links = links
+
+    def get_size(self):
+        # The offset of the last link plus its size.
+        return self.offsets[-1] + len(self.links[-1].data)
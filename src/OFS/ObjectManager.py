@@ -58,6 +58,7 @@ from zope.interface import implementer
 from zope.interface.interfaces import ComponentLookupError
 from zope.lifecycleevent import ObjectAddedEvent
 from zope.lifecycleevent import ObjectRemovedEvent
+from ZPublisher.Iterators import filestream_iterator
 
 import copy
 import fnmatch
@@ -65,6 +66,7 @@ import marshal
 import os
 import re
 import sys
+import tempfile
 import time
 import zope.sequencesort
 
@@ -327,6 +329,31 @@ class ObjectManager(
             return False
         return getattr(aq_base(self), id, None) is not None
 
+    def _metaTypeIndex(self):
+        # Return a mapping of meta_type to the positions of the subobjects
+        # of that type in _objects. It is rebuilt if _objects was replaced.
+        objects = self._objects
+        cached = aq_base(self).__dict__.get('_v_meta_type_index')
+        if cached is None or cached[0] is not objects:
+            index = {}
+            for position, info in enumerate(objects):
+                index.setdefault(info['meta_type'], []).append(position)
+            cached = self._v_meta_type_index = (objects, index)
+        return cached[1]
+
+    def _addObjectInfo(self, id, meta_type):
+        # Record a new subobject in the folder contents.
+        index = self._metaTypeIndex()
+        objects = self._objects + ({'id': id, 'meta_type': meta_type},)
+        index.setdefault(meta_type, []).append(len(objects) - 1)
+        self._objects = objects
+        self._v_meta_type_index = (objects, index)
+
+    def _removeObjectInfo(self, id):
+        # Remove a subobject from the folder contents.
+        self._objects = tuple([i for i in self._objects
+                               if i['id'] != id])
+
     def _setObject(self, id, object, roles=None, user=None, set_owner=1,
                    suppress_events=False):
         """Set an object into this container.
@@ -340,15 +367,13 @@ class ObjectManager(
         t = getattr(ob, 'meta_type', None)
 
         # If an object by the given id already exists, remove it.
-        for object_info in self._objects:
-            if object_info['id'] == id:
-                self._delObject(id)
-                break
+        if id in self:
+            self._delObject(id)
 
         if not suppress_events:
             notify(ObjectWillBeAddedEvent(ob, self, id))
 
-        self._objects = self._objects + ({'id': id, 'meta_type': t},)
+        self._addObjectInfo(id, t)
         self._setOb(id, ob)
         ob = self._getOb(id)
 
@@ -401,8 +426,7 @@ class ObjectManager(
         if not suppress_events:
             notify(ObjectWillBeRemovedEvent(ob, self, id))
 
-        self._objects = tuple([i for i in self._objects
-                               if i['id'] != id])
+        self._removeObjectInfo(id)
         self._delOb(id)
 
         # Indicate to the object that it has been deleted. This is
@@ -425,13 +449,15 @@ class ObjectManager(
         # If 'spec' is specified, returns objects whose meta_type
         # matches 'spec'.
         if spec is not None:
-            if isinstance(spec, str):
+            if isinstance(spec, string_types):
                 spec = [spec]
-            set = []
-            for ob in self._objects:
-                if ob['meta_type'] in spec:
-                    set.append(ob['id'])
-            return set
+            index = self._metaTypeIndex()
+            positions = []
+            for meta_type in set(spec):
+                positions.extend(index.get(meta_type, ()))
+            positions.sort()
+            objects = self._objects
+            return [objects[position]['id'] for position in positions]
         return [o['id'] for o in self._objects]
 
     @security.protected(access_contents_information)
@@ -507,12 +533,10 @@ class ObjectManager(
                 break
             get = obj._getOb
             if hasattr(obj, '_objects'):
-                for i in obj._objects:
+                for id in obj.objectIds(t):
                     try:
-                        id = i['id']
                         physicalPath = relativePhysicalPath + (id,)
-                        if ((physicalPath not in seen) and
-                                (i['meta_type'] in t)):
+                        if physicalPath not in seen:
                             vals.append(get(id))
                             seen[physicalPath] = 1
                     except Exception:
@@ -579,9 +603,7 @@ class ObjectManager(
                 if hasattr(self, id):
                     r.append(self._getOb(id))
         else:
-            obj_ids = self.objectIds()
-            obj_ids.sort()
-            for id in obj_ids:
+            for id in sorted(self.objectIds()):
                 o = self._getOb(id)
                 if hasattr(aq_base(o), 'isPrincipiaFolderish') and \
                    o.isPrincipiaFolderish:
@@ -608,15 +630,26 @@ class ObjectManager(
 
         suffix = 'zexp'
 
-        if download:
+        if download and RESPONSE is None:
             with BytesIO() as f:
                 ob._p_jar.exportFile(ob._p_oid, f)
-                result = f.getvalue()
+                return f.getvalue()
 
-            if RESPONSE is not None:
-                RESPONSE.setHeader('Content-type', 'application/data')
-                RESPONSE.setHeader('Content-Disposition',
-                                   'inline;filename=%s.%s' % (id, suffix))
+        if download:
+            # Spool the export to a temporary file and stream it from
+            # there, which keeps large exports out of memory. The file
+            # is removed when the stream iterator is closed.
+            with tempfile.TemporaryFile() as f:
+                ob._p_jar.exportFile(ob._p_oid, f)
+                f.flush()
+                size = f.tell()
+                result = filestream_iterator(os.dup(f.fileno()), 'rb')
+            result.seek(0)
+
+            RESPONSE.setHeader('Content-type', 'application/data')
+            RESPONSE.setHeader('Content-Disposition',
+                               'inline;filename=%s.%s' % (id, suffix))
+            RESPONSE.setHeader('Content-Length', size)
             return result
 
         cfg = getConfiguration()
@@ -141,9 +141,9 @@ class OrderSupport(object):
         if isinstance(ids, basestring):
             ids = (ids,)
         min_position = 0
-        objects = list(self._objects)
+        all_ids = self._getOrderedIds()
         if subset_ids is None:
-            subset_ids = self.getIdsSubset(objects)
+            subset_ids = self.getIdsSubset(self.objectMap())
         else:
             subset_ids = list(subset_ids)
         # unify moving direction
@@ -166,19 +166,17 @@ class OrderSupport(object):
         if counter > 0:
             if delta > 0:
                 subset_ids.reverse()
-            obj_dict = {}
-            for obj in objects:
-                obj_dict[obj['id']] = obj
+            known_ids = set(all_ids)
+            subset = set(subset_ids)
             pos = 0
-            for i in range(len(objects)):
-                if objects[i]['id'] in subset_ids:
-                    try:
-                        objects[i] = obj_dict[subset_ids[pos]]
-                        pos += 1
-                    except KeyError:
+            for i in range(len(all_ids)):
+                if all_ids[i] in subset:
+                    if subset_ids[pos] not in known_ids:
                         raise ValueError('The object with the id "%s" does '
                                          'not exist.' % subset_ids[pos])
-            self._objects = tuple(objects)
+                    all_ids[i] = subset_ids[pos]
+                    pos += 1
+            self._setOrderedIds(all_ids)
 
         if not suppress_events:
             notifyContainerModified(self)
@@ -198,12 +196,12 @@ class OrderSupport(object):
     @security.protected(manage_properties)
     def moveObjectsToTop(self, ids, subset_ids=None):
         # Move specified sub-objects to top of container.
-        return self.moveObjectsByDelta(ids, -len(self._objects), subset_ids)
+        return self.moveObjectsByDelta(ids, -len(self), subset_ids)
 
     @security.protected(manage_properties)
     def moveObjectsToBottom(self, ids, subset_ids=None):
         # Move specified sub-objects to bottom of container.
-        return self.moveObjectsByDelta(ids, len(self._objects), subset_ids)
+        return self.moveObjectsByDelta(ids, len(self), subset_ids)
 
     @security.protected(manage_properties)
     def orderObjects(self, key, reverse=None):
@@ -212,7 +210,7 @@ class OrderSupport(object):
             self.objectItems(), ((key, 'cmp', 'asc'), ))]
         if reverse:
             ids.reverse()
-        return self.moveObjectsByDelta(ids, -len(self._objects))
+        return self.moveObjectsByDelta(ids, -len(self))
 
     @security.protected(access_contents_information)
     def getObjectPosition(self, id):
@@ -282,5 +280,14 @@ class OrderSupport(object):
     def getIdsSubset(self, objects):
         return [obj['id'] for obj in objects]
 
+    def _getOrderedIds(self):
+        # Return a list of the ids of all subobjects in their order.
+        return [obj['id'] for obj in self._objects]
+
+    def _setOrderedIds(self, ids):
+        # Change the order of the subobjects to the list of their ids.
+        obj_dict = dict((obj['id'], obj) for obj in self._objects)
+        self._objects = tuple(obj_dict[id] for id in ids)
+
 
 InitializeClass(OrderSupport)
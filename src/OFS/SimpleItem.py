@@ -48,6 +48,7 @@ from OFS.interfaces import ISimpleItem
 from OFS.Lockable import LockableItem
 from OFS.owner import Owned
 from OFS.role import RoleManager
+from OFS.Traversable import _physicalPathNames
 from OFS.Traversable import Traversable
 from Persistence import Persistent
 from six import reraise
@@ -444,6 +445,10 @@ class Item_w__name__(Item):
         return path
 
 
+_physicalPathNames[Item_w__name__.__dict__['getPhysicalPath']] = (
+    lambda ob: ob.__name__)
+
+
 def pretty_tb(t, v, tb, as_html=1):
     tb = format_exception(t, v, tb, as_html=as_html)
     tb = '\n'.join(tb)
@@ -38,9 +38,19 @@ from zope.traversing.namespace import namespaceLookup
 from zope.traversing.namespace import nsParse
 from ZPublisher.interfaces import UseTraversalDefault
 
+import transaction
+
 
 _marker = object()
 
+# The number of paths unrestrictedTraverse remembers per transaction, 0
+# disables the cache. The ZConfig machinery may set this attribute on
+# initialization.
+traversal_cache_size = 1000
+
+# The key of the traversal cache in the transaction data.
+_traversal_cache = object()
+
 
 @implementer(ITraversable)
 class Traversable(object):
@@ -67,13 +77,12 @@ class Traversable(object):
         if relative:
             return self.virtual_url_path()
 
-        spp = self.getPhysicalPath()
-
         try:
-            toUrl = aq_acquire(self, 'REQUEST').physicalPathToURL
+            request = aq_acquire(self, 'REQUEST')
+            toUrl = request.physicalPathToURL
         except AttributeError:
-            return path2url(spp[1:])
-        return toUrl(spp)
+            return path2url(self.getPhysicalPath()[1:])
+        return toUrl(_physicalPath(self, request))
 
     @security.public
     def absolute_url_path(self):
@@ -82,12 +91,12 @@ class Traversable(object):
         This includes the leading slash, and can be used as an
         'absolute-path reference' as defined in RFC 2396.
         """
-        spp = self.getPhysicalPath()
         try:
-            toUrl = aq_acquire(self, 'REQUEST').physicalPathToURL
+            request = aq_acquire(self, 'REQUEST')
+            toUrl = request.physicalPathToURL
         except AttributeError:
-            return path2url(spp) or '/'
-        return toUrl(spp, relative=1) or '/'
+            return path2url(self.getPhysicalPath()) or '/'
+        return toUrl(_physicalPath(self, request), relative=1) or '/'
 
     @security.public
     def virtual_url_path(self):
@@ -97,12 +106,12 @@ class Traversable(object):
         the virtual host's root object.  Otherwise, it is the physical
         path.  In either case, the URL does not begin with a slash.
         """
-        spp = self.getPhysicalPath()
         try:
-            toVirt = aq_acquire(self, 'REQUEST').physicalPathToVirtualPath
+            request = aq_acquire(self, 'REQUEST')
+            toVirt = request.physicalPathToVirtualPath
         except AttributeError:
-            return path2url(spp[1:])
-        return path2url(toVirt(spp))
+            return path2url(self.getPhysicalPath()[1:])
+        return path2url(toVirt(_physicalPath(self, request)))
 
     # decorators did not work on variables
     security.declarePrivate('getPhysicalRoot')  # NOQA: D001
@@ -197,6 +206,15 @@ class Traversable(object):
         else:
             obj = self
 
+        # Paths leading through subobjects kept in the database are
+        # remembered, see _cachedTraversal.
+        cache = chain = None
+        if path and traversal_cache_size > 0:
+            cache = _traversalCache(obj)
+            if cache is not None:
+                key = (aq_base(obj)._p_oid, tuple(path), restricted)
+                chain = cache.get(key)
+
         # import time ordering problem
         if bbb.HAS_ZSERVER:
             from webdav.NullResource import NullResource
@@ -205,6 +223,13 @@ class Traversable(object):
 
         resource = _marker
         try:
+            if chain is not None:
+                next = _cachedTraversal(obj, chain, restricted and validate)
+                if next is not None:
+                    return next
+            if cache is not None:
+                chain = []
+
             while path:
                 name = path_pop()
                 __traceback_info__ = path, name
@@ -219,6 +244,7 @@ class Traversable(object):
                         if restricted and not validate(obj, obj, name, next):
                             raise Unauthorized(name)
                         obj = next
+                        chain = None
                         continue
 
                 bobo_traverse = getattr(obj, '__bobo_traverse__', None)
@@ -348,8 +374,20 @@ class Traversable(object):
                                 # Nothing found re-raise error
                                 raise e
 
+                if chain is not None:
+                    base = aq_base(next)
+                    oid = getattr(base, '_p_oid', None)
+                    if (oid is not None and aq_parent(next) is obj and
+                            aq_base(getattr(aq_base(obj), name, None)) is
+                            base):
+                        chain.append((name, oid))
+                    else:
+                        chain = None
+
                 obj = next
 
+            if chain and len(cache) < traversal_cache_size:
+                cache[key] = tuple(chain)
             return obj
 
         except ConflictError:
@@ -369,5 +407,88 @@ class Traversable(object):
 InitializeClass(Traversable)
 
 
+def _traversalCache(obj):
+    # Return the traversal cache of the current transaction of the
+    # connection obj was loaded from, or None.
+    base = aq_base(obj)
+    jar = getattr(base, '_p_jar', None)
+    tm = getattr(jar, 'transaction_manager', None)
+    if tm is None or getattr(base, '_p_oid', None) is None:
+        return None
+    txn = tm.get()
+    try:
+        caches = txn.data(_traversal_cache)
+    except KeyError:
+        caches = {}
+        txn.set_data(_traversal_cache, caches)
+    cache = caches.get(id(jar))
+    if cache is None:
+        cache = caches[id(jar)] = {}
+    return cache
+
+
+def _cachedTraversal(obj, chain, validate):
+    # Traverse the (name, oid) pairs of chain from obj and return the
+    # object found, or None if the names do not lead to these objects
+    # anymore. Only subobjects kept as attributes are remembered, their
+    # access is validated again if validate is given.
+    for name, oid in chain:
+        base = aq_base(getattr(aq_base(obj), name, None))
+        if getattr(base, '_p_oid', None) != oid:
+            return None
+        next = base.__of__(obj)
+        if validate and not validate(obj, obj, name, next):
+            raise Unauthorized(name)
+        obj = next
+    return obj
+
+
+def resetTraversalCache(txn=None):
+    """Forget the paths remembered by unrestrictedTraverse.
+
+    This concerns the given transaction or the current one.
+    """
+    if txn is None:
+        txn = transaction.get()
+    try:
+        txn.data(_traversal_cache).clear()
+    except KeyError:
+        pass
+
+
 def path2url(path):
     return '/'.join(map(quote, path))
+
+
+def _getId(ob):
+    try:
+        return ob.id or ob.getId()
+    except AttributeError:
+        return ob.getId()
+
+
+# The getPhysicalPath implementations which append a name to the path of
+# the acquisition parent, mapped to a function returning that name.
+_physicalPathNames = {Traversable.__dict__['getPhysicalPath']: _getId}
+
+
+def _physicalPath(ob, request):
+    # Return the physical path of ob. The request remembers the path of
+    # the acquisition parent, so the paths of the other objects in the
+    # same container are not computed by walking up to the root again.
+    paths = getattr(request, '_physical_paths', None)
+    if paths is None:
+        return ob.getPhysicalPath()
+    getPhysicalPath = ob.getPhysicalPath
+    getName = _physicalPathNames.get(
+        getattr(getPhysicalPath, '__func__', None))
+    parent = aq_parent(aq_inner(ob))
+    if getName is None or parent is None:
+        return getPhysicalPath()
+    # The parent is kept to make sure its id is not reused.
+    entry = paths.get(id(parent))
+    if entry is None or entry[0] is not parent:
+        path = getPhysicalPath()
+        paths[id(parent)] = (parent, path[:-1])
+        return path
+    return entry[1] + (getName(ob), )
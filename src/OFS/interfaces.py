@@ -759,9 +759,22 @@ class IFindSupport(Interface):
                  obj_mtime=None, obj_mspec=None,
                  obj_permission=None, obj_roles=None,
                  search_sub=0,
-                 REQUEST=None, result=None, pre=''):
+                 REQUEST=None, result=None, pre='',
+                 limit=None, timeout=None):
         """Zope Find interface"""
 
+    def ZopeFindIter(obj, obj_ids=None, obj_metatypes=None,
+                     obj_searchterm=None, obj_expr=None,
+                     obj_mtime=None, obj_mspec=None,
+                     obj_permission=None, obj_roles=None,
+                     search_sub=0,
+                     REQUEST=None, pre='',
+                     limit=None, timeout=None):
+        """Iterate lazily over the (path, object) pairs Zope Find finds
+
+        The search stops after ``limit`` pairs or ``timeout`` seconds.
+        """
+
     def ZopeFindAndApply(obj, obj_ids=None, obj_metatypes=None,
                          obj_searchterm=None, obj_expr=None,
                          obj_mtime=None, obj_mspec=None,
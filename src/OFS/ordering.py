@@ -0,0 +1,277 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Persistent order of the ids in a large ordered container.
+
+The ids are kept in chunks of at most ``CHUNK_SIZE`` ids, each chunk a
+persistent object of its own. The sizes of the chunks are summed up in a
+Fenwick tree and an ``OOBTree`` maps each id to its chunk, so finding the
+position of an id or the id at a position does not scan the whole order.
+
+Adding an id only changes one chunk, the tree of sizes and a bucket of the
+map. Transactions adding and removing different ids concurrently do not
+conflict, as both the chunks and the order merge such changes.
+"""
+
+from BTrees.OOBTree import OOBTree
+from Persistence import Persistent
+from ZODB.POSException import ConflictError
+
+
+# Chunks are split in halves when they get larger than this.
+CHUNK_SIZE = 128
+
+
+def _buildSums(sizes):
+    # Return the Fenwick tree of the chunk sizes.
+    sums = list(sizes)
+    for i in range(len(sums)):
+        j = i | (i + 1)
+        if j < len(sums):
+            sums[j] += sums[i]
+    return sums
+
+
+def _addSize(sums, i, delta):
+    while i < len(sums):
+        sums[i] += delta
+        i |= i + 1
+
+
+def _sumSizes(sums, i):
+    # Return the sum of the sizes of the first i chunks.
+    result = 0
+    i -= 1
+    while i >= 0:
+        result += sums[i]
+        i = (i & (i + 1)) - 1
+    return result
+
+
+class OrderChunk(Persistent):
+    """A part of the ids of an Ordering."""
+
+    def __init__(self, ids=()):
+        self.ids = list(ids)
+
+    def _p_resolveConflict(self, old, committed, new):
+        # Merge ids added and removed concurrently. Added ids follow the
+        # id they were added after, the ids added by the committed
+        # transaction first. Moving ids within the chunk conflicts.
+        old_ids = old['ids']
+        old_set = set(old_ids)
+        committed_ids = committed['ids']
+        new_ids = new['ids']
+        added_committed = set(committed_ids) - old_set
+        added_new = set(new_ids) - old_set
+        if added_committed & added_new:
+            raise ConflictError
+        removed = (old_set - set(committed_ids)) | (old_set - set(new_ids))
+        kept = [id for id in old_ids if id not in removed]
+        for ids in (committed_ids, new_ids):
+            if [id for id in ids if id in old_set and id not in removed] \
+                    != kept:
+                raise ConflictError
+        result = list(kept)
+        for ids, added in ((committed_ids, added_committed),
+                           (new_ids, added_new)):
+            anchor = None
+            for id in ids:
+                if id in added:
+                    if anchor is None:
+                        position = 0
+                    else:
+                        position = result.index(anchor) + 1
+                    if ids is new_ids:
+                        while (position < len(result) and
+                               result[position] in added_committed):
+                            position += 1
+                    result.insert(position, id)
+                    anchor = id
+                elif id not in removed:
+                    anchor = id
+        state = dict(committed)
+        state['ids'] = result
+        return state
+
+
+class Ordering(Persistent):
+    """The order of the ids of a container."""
+
+    def __init__(self, ids=()):
+        self._chunks = ()
+        self._sums = []
+        self._chunk_of = OOBTree()
+        for id in ids:
+            self.append(id)
+
+    def _p_resolveConflict(self, old, committed, new):
+        # Concurrent changes within chunks only change the sizes, which
+        # are added up. Splitting or removing chunks conflicts.
+        if not (set(old) == set(committed) == set(new)):
+            raise ConflictError
+        for key in old:
+            if key == '_sums':
+                continue
+            if not (old[key] == committed[key] == new[key]):
+                raise ConflictError
+        old_sums = old['_sums']
+        committed_sums = committed['_sums']
+        new_sums = new['_sums']
+        if not (len(old_sums) == len(committed_sums) == len(new_sums)):
+            raise ConflictError
+        state = dict(committed)
+        state['_sums'] = [c + n - o for o, c, n in
+                          zip(old_sums, committed_sums, new_sums)]
+        return state
+
+    def __len__(self):
+        return _sumSizes(self._sums, len(self._sums))
+
+    def __contains__(self, id):
+        return id in self._chunk_of
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            for id in chunk.ids:
+                yield id
+
+    def __getitem__(self, position):
+        length = len(self)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError(position)
+        i = self._findChunk(position)
+        return self._chunks[i].ids[position - _sumSizes(self._sums, i)]
+
+    def index(self, id):
+        """Return the position of ``id``."""
+        chunk = self._chunk_of.get(id)
+        if chunk is None:
+            raise ValueError(id)
+        i = self._chunkIndex(chunk)
+        return _sumSizes(self._sums, i) + chunk.ids.index(id)
+
+    def append(self, id):
+        """Add ``id`` at the end."""
+        if not self._chunks:
+            self._setChunks((OrderChunk(), ), [0])
+        self._insert(len(self._chunks) - 1, None, id)
+
+    def insert(self, position, id):
+        """Add ``id`` at ``position``, or at the end if it is larger."""
+        if position < 0:
+            position = max(position + len(self), 0)
+        if position >= len(self):
+            return self.append(id)
+        i = self._findChunk(position)
+        self._insert(i, position - _sumSizes(self._sums, i), id)
+
+    def remove(self, id):
+        """Remove ``id``."""
+        chunk = self._chunk_of.get(id)
+        if chunk is None:
+            raise ValueError(id)
+        i = self._chunkIndex(chunk)
+        del self._chunk_of[id]
+        ids = chunk.ids
+        ids.remove(id)
+        chunk.ids = ids
+        if ids or len(self._chunks) == 1:
+            _addSize(self._sums, i, -1)
+            self._p_changed = True
+        else:
+            sizes = self._sizes()
+            del sizes[i]
+            self._setChunks(self._chunks[:i] + self._chunks[i + 1:], sizes)
+
+    def move(self, id, position):
+        """Move ``id`` to ``position``."""
+        self.remove(id)
+        self.insert(position, id)
+
+    def reorder(self, ids):
+        """Change the order to ``ids``, which are the same ids.
+
+        Only the chunks whose ids change are written.
+        """
+        ids = list(ids)
+        if len(ids) != len(self) or set(ids) != set(self._chunk_of.keys()):
+            raise ValueError('The ids differ from the ordered ids.')
+        start = 0
+        chunk_of = self._chunk_of
+        for chunk in self._chunks:
+            end = start + len(chunk.ids)
+            part = ids[start:end]
+            if part != chunk.ids:
+                chunk.ids = part
+                for id in part:
+                    if chunk_of[id] is not chunk:
+                        chunk_of[id] = chunk
+            start = end
+
+    def _insert(self, i, offset, id):
+        if id in self._chunk_of:
+            raise ValueError('Duplicate id %r.' % (id, ))
+        chunk = self._chunks[i]
+        ids = chunk.ids
+        if offset is None:
+            ids.append(id)
+        else:
+            ids.insert(offset, id)
+        chunk.ids = ids
+        self._chunk_of[id] = chunk
+        if len(ids) > CHUNK_SIZE:
+            half = len(ids) // 2
+            split = OrderChunk(ids[half:])
+            chunk.ids = ids[:half]
+            for moved in split.ids:
+                self._chunk_of[moved] = split
+            sizes = self._sizes()
+            sizes[i:i + 1] = [len(chunk.ids), len(split.ids)]
+            self._setChunks(
+                self._chunks[:i + 1] + (split, ) + self._chunks[i + 1:],
+                sizes)
+        else:
+            _addSize(self._sums, i, 1)
+            self._p_changed = True
+
+    def _sizes(self):
+        # Return the sizes of the chunks, without loading them.
+        sums = self._sums
+        return [_sumSizes(sums, i + 1) - _sumSizes(sums, i)
+                for i in range(len(sums))]
+
+    def _setChunks(self, chunks, sizes):
+        self._chunks = chunks
+        self._sums = _buildSums(sizes)
+
+    def _chunkIndex(self, chunk):
+        chunks = self._chunks
+        cached = self.__dict__.get('_v_chunk_index')
+        if cached is None or cached[0] is not chunks:
+            index = dict((id(c), i) for i, c in enumerate(chunks))
+            cached = self._v_chunk_index = (chunks, index)
+        return cached[1][id(chunk)]
+
+    def _findChunk(self, position):
+        # Return the index of the chunk holding the id at position.
+        low, high = 0, len(self._chunks) - 1
+        sums = self._sums
+        while low < high:
+            middle = (low + high) // 2
+            if _sumSizes(sums, middle + 1) > position:
+                high = middle
+            else:
+                low = middle + 1
+        return low
@@ -21,10 +21,12 @@ from App.config import getConfiguration
 from logging import getLogger
 from ZODB.POSException import ConflictError
 from zope.container.contained import dispatchToSublocations
+from zope.container.interfaces import IContainerModifiedEvent
 from zope.lifecycleevent.interfaces import IObjectCopiedEvent
 from zope.lifecycleevent.interfaces import IObjectMovedEvent
 
 import OFS.interfaces
+import OFS.Traversable
 import zope.component
 import zope.interface
 import zope.location.interfaces
@@ -137,6 +139,31 @@ def dispatchObjectCopiedEvent(ob, event):
         dispatchToSublocations(ob, event)
 
 
+@zope.component.adapter(IObjectMovedEvent)
+def resetPhysicalPaths(event):
+    """Subscriber for IObjectMovedEvent.
+
+    The request remembers the physical paths of containers, which may have
+    changed when an object was moved, added or removed.
+    """
+    request = getattr(event.object, 'REQUEST', None)
+    paths = getattr(request, '_physical_paths', None)
+    if paths:
+        paths.clear()
+
+
+@zope.component.adapter(IContainerModifiedEvent)
+def resetTraversalCache(event):
+    """Subscriber for IContainerModifiedEvent.
+
+    Forget the paths unrestrictedTraverse remembered in the current
+    transaction, objects may have been added to or removed from them.
+    """
+    jar = getattr(aq_base(event.object), '_p_jar', None)
+    tm = getattr(jar, 'transaction_manager', None)
+    OFS.Traversable.resetTraversalCache(tm.get() if tm is not None else None)
+
+
 def callManageAfterAdd(ob, item, container):
     """Compatibility subscriber for manage_afterAdd.
     """
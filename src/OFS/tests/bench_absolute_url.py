@@ -0,0 +1,61 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Measure absolute_url in a listing of a folder's contents.
+
+The ``uncached`` run disables the container paths and URL prefixes the
+request remembers. Run with ``python -m OFS.tests.bench_absolute_url``.
+"""
+
+import timeit
+
+from OFS.Application import Application
+from OFS.Folder import Folder
+from OFS.Image import File
+from Testing.makerequest import makerequest
+
+DEPTH = 6
+ITEMS = 500
+
+
+def make_listing(depth=DEPTH, items=ITEMS):
+    folder = makerequest(Application())
+    for i in range(depth):
+        id = 'level %d' % i
+        folder._setObject(id, Folder(id))
+        folder = folder._getOb(id)
+    for i in range(items):
+        id = 'file%03d.txt' % i
+        folder._setObject(id, File(id, '', b''))
+    return folder
+
+
+def render(folder):
+    return [ob.absolute_url() for ob in folder.objectValues()]
+
+
+def main(number=50):
+    folder = make_listing()
+    request = folder.REQUEST
+    for label in ('uncached', 'cached'):
+        if label == 'uncached':
+            request._url_prefixes = request._physical_paths = None
+        else:
+            request._resetURLS()
+        seconds = min(timeit.repeat(
+            lambda: render(folder), number=number, repeat=3))
+        print('%-8s %8.3f ms per listing' % (
+            label, seconds * 1000.0 / number))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Measure the upload throughput of File._read_data.
+
+The ``per chunk`` run saves every 64KB record in a savepoint of its own,
+as uploads were ingested before ``pdata_size`` and ``savepoint_size``
+existed. Run with ``python -m OFS.tests.bench_readData``.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import transaction
+from OFS import Image
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+
+SIZE = 64 << 20
+
+SETTINGS = (
+    ('per chunk', 1 << 16, 1 << 16),
+    ('default', Image.pdata_size, Image.savepoint_size),
+    ('1MB/16MB', 1 << 20, 16 << 20),
+)
+
+
+def upload(path, size):
+    db = DB(FileStorage(os.path.join(path, 'Data.fs')))
+    try:
+        conn = db.open()
+        conn.root()['file'] = Image.File('file', '', b'')
+        transaction.commit()
+        with tempfile.TemporaryFile(dir=path) as upload:
+            upload.write(os.urandom(1 << 20) * (size >> 20))
+            start = time.time()
+            conn.root()['file'].manage_upload(upload)
+            transaction.commit()
+            return time.time() - start
+    finally:
+        transaction.abort()
+        db.close()
+
+
+def main(size=SIZE):
+    old = Image.pdata_size, Image.savepoint_size
+    try:
+        for label, pdata_size, savepoint_size in SETTINGS:
+            Image.pdata_size = pdata_size
+            Image.savepoint_size = savepoint_size
+            path = tempfile.mkdtemp()
+            try:
+                seconds = upload(path, size)
+            finally:
+                shutil.rmtree(path)
+            print('%-10s %8.1f MB/s' % (label, size / seconds / (1 << 20)))
+    finally:
+        Image.pdata_size, Image.savepoint_size = old
+
+
+if __name__ == '__main__':
+    main()
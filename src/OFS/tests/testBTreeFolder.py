@@ -0,0 +1,255 @@
+from OFS.SimpleItem import SimpleItem
+from zExceptions import BadRequest
+
+import unittest
+
+
+class DummyItem(SimpleItem):
+
+    def __init__(self, id, meta_type='Dummy'):
+        self.id = id
+        self.meta_type = meta_type
+
+
+class TestBTreeFolder(unittest.TestCase):
+
+    def _makeOne(self, id='folder'):
+        from OFS.BTreeFolder import BTreeFolder
+        return BTreeFolder(id)
+
+    def _makeFilled(self):
+        folder = self._makeOne()
+        folder._setObject('b', DummyItem('b'))
+        folder._setObject('a', DummyItem('a', 'Other'))
+        folder._setObject('c', DummyItem('c'))
+        return folder
+
+    def test_interfaces(self):
+        from OFS.BTreeFolder import BTreeFolder
+        from OFS.interfaces import IFolder
+        from zope.interface.verify import verifyClass
+
+        verifyClass(IFolder, BTreeFolder)
+
+    def test_setObject(self):
+        folder = self._makeOne()
+        self.assertEqual(folder._setObject('a', DummyItem('a')), 'a')
+        self.assertIn('a', folder)
+        self.assertEqual(folder._getOb('a').getId(), 'a')
+        self.assertTrue(folder.hasObject('a'))
+        self.assertEqual(len(folder), 1)
+        self.assertEqual(folder.objectCount(), 1)
+        self.assertNotIn('a', folder.__dict__)
+        self.assertEqual(folder._objects, ())
+
+    def test_setObject_duplicate(self):
+        folder = self._makeFilled()
+        self.assertRaises(BadRequest, folder._setObject, 'a', DummyItem('a'))
+        self.assertEqual(len(folder), 3)
+
+    def test_getOb_missing(self):
+        folder = self._makeOne()
+        self.assertRaises(AttributeError, folder._getOb, 'a')
+        self.assertEqual(folder._getOb('a', None), None)
+        self.assertEqual(folder.get('a'), None)
+        self.assertRaises(KeyError, folder.__getitem__, 'a')
+        self.assertNotIn(None, folder)
+
+    def test_getOb_is_wrapped(self):
+        folder = self._makeFilled()
+        ob = folder._getOb('a')
+        self.assertTrue(ob.aq_parent is folder)
+        self.assertTrue(folder['a'].aq_parent is folder)
+
+    def test_attribute_access(self):
+        folder = self._makeFilled()
+        self.assertEqual(folder.a.getId(), 'a')
+        self.assertRaises(AttributeError, getattr, folder, 'd')
+        self.assertRaises(AttributeError, getattr, folder, '_a')
+
+    def test_delObject(self):
+        folder = self._makeFilled()
+        folder._delObject('b')
+        self.assertNotIn('b', folder)
+        self.assertEqual(list(folder.objectIds()), ['a', 'c'])
+        self.assertEqual(folder.objectIds('Dummy'), ['c'])
+        self.assertEqual(len(folder), 2)
+        self.assertRaises(AttributeError, folder._delOb, 'b')
+
+    def test_objectIds_sorted(self):
+        folder = self._makeFilled()
+        self.assertEqual(list(folder.objectIds()), ['a', 'b', 'c'])
+        self.assertEqual(list(folder.keys()), ['a', 'b', 'c'])
+        self.assertEqual(list(folder), ['a', 'b', 'c'])
+
+    def test_objectIds_spec(self):
+        folder = self._makeFilled()
+        self.assertEqual(folder.objectIds('Dummy'), ['b', 'c'])
+        self.assertEqual(folder.objectIds(['Other']), ['a'])
+        self.assertEqual(folder.objectIds('Missing'), [])
+        self.assertEqual(folder.objectIds(u'Dummy'), ['b', 'c'])
+
+    def test_objectIds_spec_after_changes(self):
+        folder = self._makeFilled()
+        self.assertEqual(folder.objectIds(['Other', 'Dummy']),
+                         ['a', 'b', 'c'])
+        folder._delObject('a')
+        self.assertEqual(folder.objectIds('Other'), [])
+        self.assertEqual(list(folder._mt_index.keys()), ['Dummy'])
+        folder._setOb('b', DummyItem('b', 'Other'))
+        self.assertEqual(folder.objectIds('Dummy'), ['c'])
+        self.assertEqual(folder.objectIds('Other'), ['b'])
+
+    def test_objectIds_spec_rebuilds_missing_index(self):
+        folder = self._makeFilled()
+        del folder._mt_index
+        self.assertEqual(folder.objectIds('Dummy'), ['b', 'c'])
+
+    def test_objectValues_and_Items_are_lazy(self):
+        folder = self._makeFilled()
+        loaded = []
+        getOb = folder._getOb
+        folder._getOb = lambda id: loaded.append(id) or getOb(id)
+        values = folder.objectValues()
+        items = folder.objectItems('Dummy')
+        self.assertEqual(loaded, [])
+        self.assertEqual(len(values), 3)
+        self.assertEqual(values[1].getId(), 'b')
+        self.assertEqual(loaded, ['b'])
+        self.assertEqual([id for id, ob in items], ['b', 'c'])
+        self.assertEqual(items[1][1].getId(), 'c')
+
+    def test_objectMap(self):
+        folder = self._makeFilled()
+        self.assertEqual(folder.objectMap(), (
+            {'id': 'a', 'meta_type': 'Other'},
+            {'id': 'b', 'meta_type': 'Dummy'},
+            {'id': 'c', 'meta_type': 'Dummy'},
+        ))
+        folder._reserved_names = ('b', )
+        self.assertEqual([d['id'] for d in folder.objectMap_d()], ['a', 'c'])
+
+    def test_superValues(self):
+        from OFS.Folder import Folder
+        root = Folder('root')
+        root._setObject('folder', self._makeFilled())
+        folder = root.folder
+        folder._setObject('sub', Folder('sub'))
+        sub = folder.sub
+        self.assertEqual([ob.getId() for ob in sub.superValues('Other')],
+                         ['a'])
+
+    def test_empty_without_BTrees(self):
+        from OFS.BTreeObjectManager import BTreeObjectManager
+        om = BTreeObjectManager()
+        self.assertEqual(list(om.objectIds()), [])
+        self.assertEqual(om.objectMap(), ())
+        self.assertEqual(len(om), 0)
+        self.assertNotIn('a', om)
+        om._setObject('a', DummyItem('a'))
+        self.assertEqual(len(om), 1)
+
+
+class TestOrderedBTreeFolder(unittest.TestCase):
+
+    def _makeOne(self):
+        from OFS.BTreeFolder import OrderedBTreeFolder
+        folder = OrderedBTreeFolder('folder')
+        folder._setObject('b', DummyItem('b'))
+        folder._setObject('a', DummyItem('a', 'Other'))
+        folder._setObject('c', DummyItem('c'))
+        return folder
+
+    def test_interfaces(self):
+        from OFS.BTreeFolder import OrderedBTreeFolder
+        from OFS.interfaces import IOrderedContainer
+        from OFS.interfaces import IOrderedFolder
+        from zope.interface.verify import verifyClass
+
+        verifyClass(IOrderedContainer, OrderedBTreeFolder)
+        verifyClass(IOrderedFolder, OrderedBTreeFolder)
+
+    def test_order(self):
+        folder = self._makeOne()
+        self.assertEqual(folder.objectIds(), ['b', 'a', 'c'])
+        self.assertEqual(folder.objectIds('Dummy'), ['b', 'c'])
+        self.assertEqual([d['id'] for d in folder.objectMap()],
+                         ['b', 'a', 'c'])
+        self.assertEqual([ob.getId() for ob in folder.objectValues()],
+                         ['b', 'a', 'c'])
+        self.assertEqual(folder.getObjectPosition('c'), 2)
+        self.assertRaises(ValueError, folder.getObjectPosition, 'd')
+
+    def test_moveObjectToPosition(self):
+        folder = self._makeOne()
+        self.assertEqual(folder.moveObjectToPosition('c', 0), 1)
+        self.assertEqual(folder.objectIds(), ['c', 'b', 'a'])
+        self.assertEqual(folder.moveObjectToPosition('c', -5), 0)
+        self.assertEqual(folder.moveObjectToPosition('c', 10), 1)
+        self.assertEqual(folder.objectIds(), ['b', 'a', 'c'])
+
+    def test_moveObjectsByDelta(self):
+        folder = self._makeOne()
+        self.assertEqual(folder.moveObjectsDown(['b']), 1)
+        self.assertEqual(folder.objectIds(), ['a', 'b', 'c'])
+        self.assertEqual(folder.moveObjectsToTop(['c']), 1)
+        self.assertEqual(folder.objectIds(), ['c', 'a', 'b'])
+        self.assertEqual(folder.objectIds('Dummy'), ['c', 'b'])
+
+    def test_delObject(self):
+        folder = self._makeOne()
+        folder._delObject('a')
+        self.assertEqual(folder.objectIds(), ['b', 'c'])
+        self.assertEqual(folder.getObjectPosition('c'), 1)
+        folder._setObject('a', DummyItem('a'))
+        self.assertEqual(folder.objectIds(), ['b', 'c', 'a'])
+
+
+class TestMigration(unittest.TestCase):
+
+    def _makeFolder(self):
+        from OFS.Folder import Folder
+        root = Folder('root')
+        root._setObject('before', DummyItem('before'))
+        folder = Folder('folder')
+        folder.title = 'Title'
+        root._setObject('folder', folder)
+        root._setObject('after', DummyItem('after'))
+        folder = root.folder
+        folder._setObject('b', DummyItem('b'))
+        folder._setObject('a', DummyItem('a', 'Other'))
+        return root, folder
+
+    def test_migrateToBTreeFolder(self):
+        from OFS.BTreeFolder import BTreeFolder
+        from OFS.BTreeFolder import migrateToBTreeFolder
+        root, folder = self._makeFolder()
+        new = migrateToBTreeFolder(folder)
+        self.assertTrue(isinstance(new.aq_base, BTreeFolder))
+        self.assertTrue(root._getOb('folder').aq_base is new.aq_base)
+        self.assertEqual(new.getId(), 'folder')
+        self.assertEqual(new.title, 'Title')
+        self.assertEqual(list(new.objectIds()), ['a', 'b'])
+        self.assertEqual(new.objectIds('Other'), ['a'])
+        self.assertEqual(len(new), 2)
+        self.assertNotIn('a', new.__dict__)
+        self.assertNotIn('_objects', new.__dict__)
+        self.assertEqual(root.objectMap(), (
+            {'id': 'before', 'meta_type': 'Dummy'},
+            {'id': 'folder', 'meta_type': 'Folder (BTree)'},
+            {'id': 'after', 'meta_type': 'Dummy'},
+        ))
+
+    def test_migrateToBTreeFolder_ordered(self):
+        from OFS.BTreeFolder import migrateToBTreeFolder
+        from OFS.BTreeFolder import OrderedBTreeFolder
+        from OFS.OrderedFolder import OrderedFolder
+        root, folder = self._makeFolder()
+        root._setObject('ordered', OrderedFolder('ordered'))
+        ordered = root.ordered
+        ordered._setObject('b', DummyItem('b'))
+        ordered._setObject('a', DummyItem('a'))
+        new = migrateToBTreeFolder(ordered)
+        self.assertTrue(isinstance(new.aq_base, OrderedBTreeFolder))
+        self.assertEqual(new.objectIds(), ['b', 'a'])
+        self.assertEqual(new.getObjectPosition('a'), 1)
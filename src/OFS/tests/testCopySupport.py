@@ -5,6 +5,7 @@ from Acquisition import aq_base
 from Acquisition import Implicit
 from OFS.Application import Application
 from OFS.Folder import manage_addFolder
+from OFS.Image import File
 from OFS.Image import manage_addFile
 from Testing.makerequest import makerequest
 
@@ -56,6 +57,16 @@ class UnitTestUser(Implicit):
         return 1
 
 
+class CopiedFile(File):
+
+    copied = False
+
+    def _getCopy(self, container):
+        ob = File._getCopy(self, container)
+        ob.copied = True
+        return ob
+
+
 def makeConnection():
     import ZODB
     from ZODB.DemoStorage import DemoStorage
@@ -287,6 +298,81 @@ class TestCopySupport(CopySupportTestBase):
             {'id': 'file2', 'new_id': 'copy_of_file2'},
         ])
 
+    def _countExports(self):
+        jar = self.folder1._p_jar
+        exports = []
+        exportFile = jar.exportFile
+
+        def countingExportFile(oid, f):
+            exports.append(f)
+            return exportFile(oid, f)
+
+        jar.exportFile = countingExportFile
+        return exports
+
+    def _countSavepoints(self):
+        txn = transaction.get()
+        savepoints = []
+        savepoint = txn.savepoint
+
+        def countingSavepoint(optimistic=False):
+            savepoints.append(optimistic)
+            return savepoint(optimistic)
+
+        txn.savepoint = countingSavepoint
+        return savepoints
+
+    def testPasteMultiSavepoints(self):
+        manage_addFile(self.folder1, 'file1',
+                       file=b'data', content_type='text/plain')
+        manage_addFile(self.folder1, 'file2',
+                       file=b'data', content_type='text/plain')
+        cookie = self.folder1.manage_copyObjects(
+            ids=('file', 'file1', 'file2'))
+        savepoints = self._countSavepoints()
+        self.folder2.manage_pasteObjects(cookie)
+        # One before exporting and one per import, instead of two per
+        # object.
+        self.assertEqual(len(savepoints), 4)
+        copy = self.folder2._getOb('file1')
+        self.assertFalse(aq_base(copy) is aq_base(self.folder1.file1))
+        self.assertEqual(copy.getId(), 'file1')
+        self.assertEqual(bytes(copy), b'data')
+
+    def testPasteMultiCopiesReferencesPerObject(self):
+        from persistent.mapping import PersistentMapping
+        manage_addFile(self.folder1, 'file1',
+                       file=b'data', content_type='text/plain')
+        shared = PersistentMapping()
+        self.folder1.file.shared = self.folder1.file1.shared = shared
+        cookie = self.folder1.manage_copyObjects(ids=('file', 'file1'))
+        self.folder2.manage_pasteObjects(cookie)
+        copies = self.folder2.file.shared, self.folder2.file1.shared
+        self.assertFalse(copies[0] is copies[1])
+        self.assertFalse(copies[0] is shared)
+
+    def testPasteMultiSpooled(self):
+        from OFS import CopySupport
+        manage_addFile(self.folder1, 'file1',
+                       file=b'data', content_type='text/plain')
+        old = CopySupport.copy_memory_limit
+        CopySupport.copy_memory_limit = 0
+        try:
+            cookie = self.folder1.manage_copyObjects(ids=('file', 'file1'))
+            self.folder2.manage_pasteObjects(cookie)
+        finally:
+            CopySupport.copy_memory_limit = old
+        self.assertEqual(bytes(self.folder2.file1), b'data')
+
+    def testPasteMultiOverriddenGetCopy(self):
+        self.folder1._setObject('special', CopiedFile('special', '', b''))
+        exports = self._countExports()
+        cookie = self.folder1.manage_copyObjects(ids=('file', 'special'))
+        self.folder2.manage_pasteObjects(cookie)
+        self.assertEqual(len(exports), 2)
+        self.assertTrue(self.folder2.special.copied)
+        self.assertFalse(self.folder1.special.copied)
+
     def testPasteNoData(self):
         from OFS.CopySupport import CopyError
         with self.assertRaises(CopyError):
@@ -204,6 +204,118 @@ class FileTests(unittest.TestCase):
         data, size = self.file._read_data(s)
         self.assertNotEqual(data.next, None)
 
+    def testReadDataSizes(self):
+        s = b''.join(bytes(bytearray([i])) * 50000 for i in range(10))
+        old = OFS.Image.pdata_size, OFS.Image.savepoint_size
+        OFS.Image.pdata_size, OFS.Image.savepoint_size = 200000, 400000
+        try:
+            data, size = self.file._read_data(BytesIO(s))
+        finally:
+            OFS.Image.pdata_size, OFS.Image.savepoint_size = old
+        self.assertEqual(size, len(s))
+        self.assertEqual(bytes(data), s)
+        offsets, links = self.file._v_pdata_index
+        self.assertEqual(offsets, (0, 200000, 400000))
+        self.assertTrue(links[0] is data)
+        self.assertEqual([len(link.data) for link in links],
+                         [200000, 200000, 100000])
+
+    def testReadDataBatchesSavepoints(self):
+        s = b'a' * (10 << 16)
+        old = OFS.Image.savepoint_size
+        OFS.Image.savepoint_size = 4 << 16
+        try:
+            data, size = self.file._read_data(BytesIO(s))
+        finally:
+            OFS.Image.savepoint_size = old
+        offsets, links = self.file._v_pdata_index
+        self.assertEqual(len(links), 10)
+        # The saved batches are ghosts, the last one is pending.
+        self.assertEqual([link._p_changed is None for link in links],
+                         [True] * 7 + [False] * 3)
+        self.assertEqual(bytes(data), s)
+
+    def _uploadChunks(self, count=5):
+        # Upload data of count links, each filled with its number.
+        data = b''.join(bytes(bytearray([i])) * (1 << 16)
+                        for i in range(count))
+        self.file.manage_upload(BytesIO(data))
+        transaction.savepoint(optimistic=True)
+        return data
+
+    def testPdataLen(self):
+        data = self._uploadChunks()
+        self.assertEqual(len(self.file.data), len(data))
+        self.assertEqual(len(self.file), len(data))
+
+    def testPdataLenFromIndex(self):
+        data = self._uploadChunks()
+        links = self.file._pdata_index.links
+        self.assertTrue(links[0]._index is self.file._pdata_index)
+        for link in links:
+            link._p_deactivate()
+        self.assertEqual(len(links[0]), len(data))
+        # Only the first link holding the index and the last are loaded.
+        self.assertEqual([link._p_changed for link in links],
+                         [False, None, None, None, False])
+
+    def testPdataLenWithoutIndexKeepsGhosts(self):
+        self._uploadChunks()
+        links = self.file._pdata_index.links
+        for link in links:
+            link._p_deactivate()
+        self.assertEqual(len(links[1]), 4 << 16)
+        self.assertEqual([link._p_changed for link in links], [None] * 5)
+
+    def testDataSizeFromIndex(self):
+        data = self._uploadChunks()
+        links = self.file._pdata_index.links
+        for link in links:
+            link._p_deactivate()
+        self.assertEqual(self.file._data_size(), len(data))
+        self.assertEqual([link._p_changed is None for link in links],
+                         [True, True, True, True, False])
+        self.file.size = None
+        self.file.update_data(self.file.data)
+        self.assertEqual(self.file.size, len(data))
+
+    def testPdataIndex(self):
+        from OFS.Image import PdataIndex
+        self._uploadChunks()
+        index = self.file._pdata_index
+        self.assertTrue(isinstance(index, PdataIndex))
+        self.assertEqual(index.offsets,
+                         (0, 1 << 16, 2 << 16, 3 << 16, 4 << 16))
+        self.assertTrue(index.links[0] is aq_base(self.file.data))
+        self.assertTrue(index.links[1] is aq_base(self.file.data.next))
+
+    def testPdataIndexIsSeparateRecord(self):
+        self._uploadChunks()
+        transaction.commit()
+        index = self.file._pdata_index
+        self.assertNotEqual(index._p_oid, None)
+        self.assertNotEqual(index._p_oid, self.file._p_oid)
+
+    def testDataRangeLoadsOnlyNeededLinks(self):
+        data = self._uploadChunks()
+        links = self.file._pdata_index.links
+        for link in links:
+            link._p_deactivate()
+        start, end = (3 << 16) - 10, (3 << 16) + 10
+        self.assertEqual(b''.join(self.file._data_range(start, end)),
+                         data[start:end])
+        self.assertEqual([link._p_changed is None for link in links],
+                         [True, True, False, False, True])
+
+    def testDataRangeWithoutIndex(self):
+        data = self._uploadChunks()
+        self.file._pdata_index = None
+        self.assertEqual(b''.join(self.file._data_range(100, 1 << 18)),
+                         data[100:1 << 18])
+        self.file.update_data(b'abc')
+        self.assertEqual(self.file._pdata_index, None)
+        self.assertEqual(b''.join(self.file._data_range(1, 2)), b'b')
+
     def testManageEditWithFileData(self):
         self.file.manage_edit('foobar', 'text/plain', filedata=b'ASD')
         self.assertEqual(self.file.title, 'foobar')
@@ -255,6 +367,51 @@ class FileTests(unittest.TestCase):
         self.assertEqual(resp.getStatus(), 200)
         self.assertEqual(data, bytes(self.file.data))
 
+    def _getWithHeaders(self, **headers):
+        environ = {'SERVER_NAME': 'foo',
+                   'SERVER_PORT': '80',
+                   'REQUEST_METHOD': 'GET'}
+        for name, value in headers.items():
+            environ['HTTP_' + name.upper()] = value
+        resp = HTTPResponse(stdout=BytesIO())
+        req = HTTPRequest(sys.stdin, environ, resp)
+        return resp, self.file.index_html(req, resp)
+
+    def testEtagFromSerial(self):
+        etag = self.file.http__etag()
+        self.assertTrue(etag.startswith('ts'))
+        self.assertFalse(self.file._p_changed)
+        self.assertEqual(self.file.http__etag(readonly=1), etag)
+        self.file.manage_edit('foo', 'text/plain')
+        self.assertNotEqual(self.file.http__etag(), etag)
+        transaction.commit()
+        changed = self.file.http__etag()
+        self.assertNotEqual(changed, etag)
+        self.file.content_type = 'text/html'
+        transaction.commit()
+        self.assertNotEqual(self.file.http__etag(), changed)
+
+    def testIfNoneMatch(self):
+        self._uploadChunks()
+        transaction.commit()
+        etag = self.file.http__etag()
+        resp, data = self._getWithHeaders()
+        self.assertEqual(resp.getStatus(), 200)
+        self.assertEqual(resp.getHeader('ETag'), '"%s"' % etag)
+
+        self.file.data._p_deactivate()
+        for header in ('"%s"' % etag, 'W/"%s", "other"' % etag, '*'):
+            resp, data = self._getWithHeaders(if_none_match=header)
+            self.assertEqual(resp.getStatus(), 304)
+            self.assertEqual(data, b'')
+            self.assertEqual(self.file.data._p_changed, None)
+
+        # If-None-Match takes precedence over If-Modified-Since.
+        resp, data = self._getWithHeaders(
+            if_none_match='"other"',
+            if_modified_since=rfc1123_date(time.time()))
+        self.assertEqual(resp.getStatus(), 200)
+
     def testIndexHtmlWithPdata(self):
         self.file.manage_upload(b'a' * (2 << 16))  # 128K
         self.file.index_html(self.app.REQUEST, self.app.REQUEST.RESPONSE)
@@ -336,6 +493,96 @@ class ImageTests(FileTests):
                          ' alt="" title="" height="16" width="16" />')
 
 
+class BlobFileTests(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        import ZODB
+        from ZODB.blob import BlobStorage
+        from ZODB.MappingStorage import MappingStorage
+        self.blob_dir = tempfile.mkdtemp()
+        self.db = ZODB.DB(BlobStorage(self.blob_dir, MappingStorage()))
+        self.connection = self.db.open()
+        self.connection.root()['Application'] = self.root = Application()
+        self.app = makerequest(self.root, stdout=BytesIO())
+        self.data = b''.join(bytes(bytearray([i])) * 1000
+                             for i in range(200))
+        self._old_threshold = OFS.Image.blob_threshold
+        OFS.Image.blob_threshold = 1 << 16
+        self.app.manage_addFile('file', file=BytesIO(self.data))
+        transaction.commit()
+        self.file = self.app.file
+
+    def tearDown(self):
+        import shutil
+        OFS.Image.blob_threshold = self._old_threshold
+        transaction.abort()
+        self.connection.close()
+        self.db.close()
+        shutil.rmtree(self.blob_dir)
+
+    def testUploadIsStoredInBlob(self):
+        from ZODB.blob import Blob
+        self.assertTrue(isinstance(self.file.data, Blob))
+        self.assertEqual(self.file.get_size(), len(self.data))
+        self.assertEqual(bytes(self.file), self.data)
+
+    def testSmallUploadIsNotStoredInBlob(self):
+        from ZODB.blob import Blob
+        self.file.manage_upload(BytesIO(b'small'))
+        self.assertEqual(self.file.data, b'small')
+        self.file.manage_upload(b'a' * (1 << 17))
+        self.assertTrue(isinstance(self.file.data, Blob))
+        self.assertEqual(bytes(self.file), b'a' * (1 << 17))
+
+    def testIndexHtmlReturnsFileIterator(self):
+        from ZPublisher.Iterators import filestream_iterator
+        result = self.file.index_html(
+            self.app.REQUEST, self.app.REQUEST.RESPONSE)
+        self.assertTrue(isinstance(result, filestream_iterator))
+        try:
+            self.assertEqual(b''.join(result), self.data)
+        finally:
+            result.close()
+
+    def testIndexHtmlWithUncommittedBlob(self):
+        self.file.manage_upload(BytesIO(self.data[::-1]))
+        response = self.app.REQUEST.RESPONSE
+        self.assertEqual(self.file.index_html(self.app.REQUEST, response),
+                         b'')
+        self.assertTrue(response._wrote)
+
+    def testDataRange(self):
+        self.assertEqual(b''.join(self.file._data_range(500, 123456)),
+                         self.data[500:123456])
+        self.assertEqual(b''.join(self.file._data_range(199990, 300000)),
+                         self.data[199990:])
+
+    def testMigrateToBlob(self):
+        from ZODB.blob import Blob
+        OFS.Image.blob_threshold = 0
+        self.file.manage_upload(BytesIO(self.data))
+        transaction.commit()
+        self.assertTrue(isinstance(self.file.data, Pdata))
+        self.assertTrue(OFS.Image.migrateToBlob(self.file))
+        transaction.commit()
+        self.assertTrue(isinstance(self.file.data, Blob))
+        self.assertEqual(self.file._pdata_index, None)
+        self.assertEqual(bytes(self.file), self.data)
+        self.assertFalse(OFS.Image.migrateToBlob(self.file))
+
+    def testImageInBlob(self):
+        with open(filedata, 'rb') as fd:
+            data = fd.read()
+        OFS.Image.blob_threshold = 1
+        self.app.manage_addImage('image', BytesIO(data))
+        image = self.app.image
+        self.assertEqual(image.content_type, 'image/gif')
+        self.assertEqual((image.width, image.height), (16, 16))
+        transaction.commit()
+        self.assertEqual(OFS.Image._data_bytes(image.data), data)
+
+
 class FileEditTests(Testing.ZopeTestCase.FunctionalTestCase):
     """Browser testing ..Image.File"""
 
@@ -48,3 +48,82 @@ class TestFindSupport(unittest.TestCase):
         self.assertEqual(self.base['1'].id, '1')
         self.assertEqual(self.base['2'].id, 'foo2')
         self.assertEqual(self.base['3'].id, '3')
+
+    def test_find_limit(self):
+        self.assertEqual(len(self.base.ZopeFind(self.base, limit=2)), 2)
+        self.assertEqual(self.base.ZopeFind(self.base, limit=0), [])
+
+    def test_find_iter(self):
+        listed = []
+        objectItems = self.base.objectItems
+        self.base.objectItems = lambda: listed.append(1) or objectItems()
+        found = self.base.ZopeFindIter(self.base, obj_ids=['1', '3'])
+        self.assertEqual(listed, [])
+        self.assertEqual([p for p, ob in found], ['1', '3'])
+        self.assertEqual(listed, [1])
+
+    def test_find_iter_search_sub(self):
+        sub = self.base['sub'] = DummyFolder('sub')
+        sub['4'] = DummyItem('4')
+        found = self.base.ZopeFindIter(self.base, obj_ids=['4', 'sub'])
+        self.assertEqual([p for p, ob in found], ['sub'])
+        found = self.base.ZopeFindIter(
+            self.base, obj_ids=['4', 'sub'], search_sub=1)
+        self.assertEqual([p for p, ob in found], ['sub', 'sub/4'])
+        found = self.base.ZopeFindIter(
+            self.base, obj_ids=['4', 'sub'], search_sub=1, limit=1)
+        self.assertEqual([p for p, ob in found], ['sub'])
+
+    def test_find_iter_timeout(self):
+        self.assertEqual(
+            list(self.base.ZopeFindIter(self.base, timeout=-1)), [])
+        self.assertEqual(
+            len(list(self.base.ZopeFindIter(self.base, timeout=60))), 3)
+
+
+class TestFindSupportGhosts(unittest.TestCase):
+
+    def setUp(self):
+        from OFS.Folder import Folder
+        from ZODB.DB import DB
+        from ZODB.DemoStorage import DemoStorage
+        import transaction
+        self.db = DB(DemoStorage())
+        conn = self.db.open()
+        base = Folder('base')
+        for id in ('a', 'b'):
+            base._setObject(id, Folder(id))
+            base._getOb(id)._setObject('c', Folder('c'))
+        conn.root()['base'] = base
+        transaction.commit()
+        conn.cacheMinimize()
+        self.base = conn.root()['base']
+
+    def tearDown(self):
+        import transaction
+        transaction.abort()
+        self.db.close()
+
+    def _ghosts(self):
+        base = self.base
+        return [base.a._p_changed is None, base.b._p_changed is None,
+                base.a.c._p_changed is None]
+
+    def test_iter_deactivates(self):
+        found = self.base.ZopeFindIter(self.base, obj_ids=['c'],
+                                       search_sub=1)
+        self.assertEqual([p for p, ob in found], ['a/c', 'b/c'])
+        self.assertEqual(self._ghosts(), [True, True, True])
+
+    def test_iter_deactivates_when_stopped(self):
+        found = self.base.ZopeFindIter(self.base, obj_ids=['c'],
+                                       search_sub=1)
+        self.assertEqual(next(found)[0], 'a/c')
+        found.close()
+        self.assertEqual(self._ghosts(), [True, True, True])
+
+    def test_find_keeps_results(self):
+        found = self.base.ZopeFind(self.base, obj_ids=['c'], search_sub=1,
+                                   limit=1)
+        self.assertEqual([p for p, ob in found], ['a/c'])
+        self.assertEqual(self._ghosts(), [True, True, False])
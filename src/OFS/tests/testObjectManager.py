@@ -491,6 +491,46 @@ class ObjectManagerTests(PlacelessSetup, unittest.TestCase):
         om['1'] = si1
         self.assertTrue(si1 in list(om.values()))
 
+    def _makeTyped(self):
+        om = self._makeOne()
+        for id, meta_type in (('a', 'mt1'), ('b', 'mt2'), ('c', 'mt1'),
+                              ('d', 'mt3')):
+            item = SimpleItem()
+            item.id = id
+            item.meta_type = meta_type
+            om._setObject(id, item)
+        return om
+
+    def test_objectIds_spec(self):
+        om = self._makeTyped()
+        self.assertEqual(om.objectIds('mt1'), ['a', 'c'])
+        self.assertEqual(om.objectIds(['mt3', 'mt1']), ['a', 'c', 'd'])
+        self.assertEqual(om.objectIds(['mt1', 'mt1']), ['a', 'c'])
+        self.assertEqual(om.objectIds('missing'), [])
+        self.assertEqual(om.objectIds(u'mt1'), ['a', 'c'])
+        self.assertEqual([ob.getId() for ob in om.objectValues('mt2')],
+                         ['b'])
+
+    def test_objectIds_spec_after_changes(self):
+        om = self._makeTyped()
+        self.assertEqual(om.objectIds('mt1'), ['a', 'c'])
+        om._delObject('a')
+        self.assertEqual(om.objectIds('mt1'), ['c'])
+        item = SimpleItem('e')
+        item.meta_type = 'mt1'
+        om._setObject('e', item)
+        self.assertEqual(om.objectIds('mt1'), ['c', 'e'])
+        # Code changing _objects directly is picked up, too.
+        om._objects = tuple(reversed(om._objects))
+        self.assertEqual(om.objectIds('mt1'), ['e', 'c'])
+
+    def test_superValues_skips_other_types(self):
+        om = self._makeTyped()
+        loaded = []
+        om.aq_base._getOb = lambda id: loaded.append(id) or id
+        self.assertEqual(om.superValues(('mt1', 'mt3')), ['a', 'c', 'd'])
+        self.assertEqual(loaded, ['a', 'c', 'd'])
+
     def test_list_imports(self):
         om = self._makeOne()
         # This must work whether we've done "make instance" or not.
@@ -501,6 +541,37 @@ class ObjectManagerTests(PlacelessSetup, unittest.TestCase):
             self.assertTrue(filename.endswith('.zexp') or
                             filename.endswith('.xml'))
 
+    def test_manage_exportObject_download_streams(self):
+        import transaction
+        import ZODB
+        from ZODB.DemoStorage import DemoStorage
+        from ZPublisher.HTTPResponse import HTTPResponse
+        from ZPublisher.Iterators import filestream_iterator
+        conn = ZODB.DB(DemoStorage()).open()
+        try:
+            conn.root()['om'] = self._getTargetClass()()
+            om = conn.root()['om'].__of__(FauxRoot())
+            item = SimpleItem()
+            item.id = 'item'
+            item.title = 'x' * 100000
+            om._setObject('item', item)
+            transaction.commit()
+            expected = om.manage_exportObject('item', download=1)
+            self.assertTrue(expected.startswith(b'ZEXP'))
+            response = HTTPResponse()
+            result = om.manage_exportObject(
+                'item', download=1, RESPONSE=response)
+            self.assertIsInstance(result, filestream_iterator)
+            try:
+                self.assertEqual(b''.join(result), expected)
+            finally:
+                result.close()
+            self.assertEqual(response.getHeader('Content-Length'),
+                             str(len(expected)))
+        finally:
+            transaction.abort()
+            conn.close()
+
 
 _marker = object()
 
@@ -137,6 +137,12 @@ class TestOrderSupport(unittest.TestCase):
              (('o4', ), ['o1', 'o2', 'o3', 'o4'], 3),
              (('n2', ), ['o1', 'o2', 'o3', 'o4'], 'ValueError')))
 
+    def test_getObjectPosition_follows_objectIds(self):
+        f = self._makeOne()
+        f.objectIds = lambda spec=None: ['o3', 'o1']
+        self.assertEqual(f.getObjectPosition('o1'), 1)
+        self.assertRaises(ValueError, f.getObjectPosition, 'o2')
+
     def test_moveObjectToPosition(self):
         self._doCanonTest(
             'moveObjectToPosition',
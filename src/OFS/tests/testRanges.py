@@ -343,6 +343,12 @@ class TestRequestRange(unittest.TestCase):
             if_range=self.file.http__etag()
         )
 
+    def testEqualIfRangeQuotedEtag(self):
+        self.expectSingleRange(
+            '10-25', 10, 26,
+            if_range='"%s"' % self.file.http__etag()
+        )
+
     def testNotEqualIfRangeEtag(self):
         self.expectOK(
             '10-25',
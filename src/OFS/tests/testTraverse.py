@@ -235,6 +235,26 @@ class TestTraverse(unittest.TestCase):
         self.assertTrue(self.folder1.unrestrictedTraverse('/folder1/file/'))
         self.assertTrue(self.folder1.unrestrictedTraverse('/folder1/'))
 
+    def testAbsoluteUrlRemembersContainerPath(self):
+        from OFS.Image import manage_addFile
+        from OFS.subscribers import resetPhysicalPaths
+        from zope.lifecycleevent import ObjectMovedEvent
+        manage_addFile(self.folder1, 'file2', file=b'')
+        folder1 = self.folder1
+        self.assertEqual(folder1.file.absolute_url(),
+                         'http://nohost/folder1/file')
+        self.assertEqual(folder1.file2.absolute_url_path(),
+                         '/folder1/file2')
+        self.assertEqual(folder1.file2.virtual_url_path(), 'folder1/file2')
+        paths = self.app.REQUEST._physical_paths
+        self.assertEqual([path for parent, path in paths.values()],
+                         [('', 'folder1')])
+        folder1._setId('renamed')
+        resetPhysicalPaths(ObjectMovedEvent(
+            folder1, self.app, 'folder1', self.app, 'renamed'))
+        self.assertEqual(folder1.file2.absolute_url(),
+                         'http://nohost/renamed/file2')
+
     def testTraverseToNone(self):
         self.assertRaises(
             KeyError,
@@ -420,6 +440,56 @@ class TestTraverse(unittest.TestCase):
             aq_base(self.root.folder1.file.restrictedTraverse('../..')) is
             aq_base(self.root))
 
+    def testTraverseRemembersPath(self):
+        from Acquisition import aq_base
+        from Acquisition import aq_parent
+        from OFS.Traversable import _traversalCache
+        file = self.folder1.file
+        self.assertEqual(_traversalCache(self.root), {})
+        ob = self.app.unrestrictedTraverse('/folder1/file')
+        self.assertTrue(aq_base(ob) is aq_base(file))
+        self.assertEqual(list(_traversalCache(self.root).values()), [(
+            ('folder1', self.folder1._p_oid), ('file', file._p_oid))])
+        ob = self.app.unrestrictedTraverse('/folder1/file')
+        self.assertTrue(aq_base(ob) is aq_base(file))
+        self.assertTrue(aq_base(aq_parent(ob)) is aq_base(self.folder1))
+        self.assertEqual(ob.getPhysicalPath(), ('', 'folder1', 'file'))
+
+    def testTraverseRemembersOnlySubobjects(self):
+        from OFS.Traversable import _traversalCache
+        self.app.unrestrictedTraverse('/folder1/file/..')
+        self.app.unrestrictedTraverse('/folder1/file/getId')
+        self.app.unrestrictedTraverse('/folder1/+something')
+        self.assertEqual(_traversalCache(self.root), {})
+
+    def testTraverseChecksRememberedPath(self):
+        self.app.unrestrictedTraverse('/folder1/file')
+        self.folder1._delObject('file')
+        self.assertRaises(
+            KeyError, self.app.unrestrictedTraverse, '/folder1/file')
+
+    def testTraverseValidatesRememberedPath(self):
+        from AccessControl import Unauthorized
+
+        class FileSecurityPolicy(UnitTestSecurityPolicy):
+            def validate(self, accessed, container, name, value, *args):
+                return name != 'file'
+
+        self.app.restrictedTraverse('/folder1/file')
+        self._setupSecurity(FileSecurityPolicy())
+        self.assertRaises(
+            Unauthorized, self.app.restrictedTraverse, '/folder1/file')
+        self.assertEqual(
+            self.app.restrictedTraverse('/folder1/file', None), None)
+
+    def testResetTraversalCache(self):
+        from OFS.subscribers import resetTraversalCache
+        from OFS.Traversable import _traversalCache
+        from zope.container.contained import ContainerModifiedEvent
+        self.app.unrestrictedTraverse('/folder1/file')
+        resetTraversalCache(ContainerModifiedEvent(self.folder1))
+        self.assertEqual(_traversalCache(self.root), {})
+
     def testTraverseToNameStartingWithPlus(self):
         # Verify it's possible to traverse to a name such as +something
         self.assertTrue(
@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import transaction
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+from ZODB.POSException import ConflictError
+
+
+class OrderingTests(unittest.TestCase):
+
+    def setUp(self):
+        from OFS import ordering
+        self._old_chunk_size = ordering.CHUNK_SIZE
+        ordering.CHUNK_SIZE = 4
+
+    def tearDown(self):
+        from OFS import ordering
+        ordering.CHUNK_SIZE = self._old_chunk_size
+
+    def _makeOne(self, ids=()):
+        from OFS.ordering import Ordering
+        return Ordering(ids)
+
+    def _check(self, order, expected):
+        self.assertEqual(list(order), expected)
+        self.assertEqual(len(order), len(expected))
+        for position, id in enumerate(expected):
+            self.assertEqual(order.index(id), position)
+            self.assertEqual(order[position], id)
+            self.assertIn(id, order)
+        self.assertTrue(all(len(chunk.ids) <= 4 for chunk in order._chunks))
+
+    def test_empty(self):
+        order = self._makeOne()
+        self._check(order, [])
+        self.assertRaises(IndexError, order.__getitem__, 0)
+        self.assertRaises(ValueError, order.index, 'a')
+        self.assertRaises(ValueError, order.remove, 'a')
+
+    def test_append(self):
+        ids = ['id%02d' % i for i in range(20)]
+        order = self._makeOne(ids)
+        self._check(order, ids)
+        self.assertEqual(order[-1], 'id19')
+        self.assertRaises(ValueError, order.append, 'id03')
+
+    def test_insert(self):
+        order = self._makeOne()
+        expected = []
+        for i in range(20):
+            id = 'id%02d' % i
+            order.insert(i // 3, id)
+            expected.insert(i // 3, id)
+        self._check(order, expected)
+        order.insert(100, 'last')
+        order.insert(-1, 'before_last')
+        self._check(order, expected + ['before_last', 'last'])
+
+    def test_remove(self):
+        ids = ['id%02d' % i for i in range(20)]
+        order = self._makeOne(ids)
+        for id in ids[2:8] + ids[::3]:
+            if id in order:
+                order.remove(id)
+                ids.remove(id)
+        self._check(order, ids)
+        for id in list(ids):
+            order.remove(id)
+        self._check(order, [])
+        order.append('a')
+        self._check(order, ['a'])
+
+    def test_move(self):
+        ids = ['id%02d' % i for i in range(10)]
+        order = self._makeOne(ids)
+        order.move('id08', 0)
+        order.move('id01', 5)
+        ids.remove('id08')
+        ids.insert(0, 'id08')
+        ids.remove('id01')
+        ids.insert(5, 'id01')
+        self._check(order, ids)
+
+    def test_reorder(self):
+        ids = ['id%02d' % i for i in range(10)]
+        order = self._makeOne(ids)
+        chunks = order._chunks
+        ids[0], ids[1] = ids[1], ids[0]
+        ids[8], ids[9] = ids[9], ids[8]
+        order.reorder(ids)
+        self._check(order, ids)
+        self.assertEqual(order._chunks, chunks)
+        self.assertRaises(ValueError, order.reorder, ids[1:])
+
+
+class OrderChunkConflictTests(unittest.TestCase):
+
+    def _resolve(self, old, committed, new):
+        from OFS.ordering import OrderChunk
+        return OrderChunk()._p_resolveConflict(
+            {'ids': old}, {'ids': committed}, {'ids': new})['ids']
+
+    def test_appends(self):
+        self.assertEqual(
+            self._resolve(['a'], ['a', 'b', 'c'], ['a', 'd']),
+            ['a', 'b', 'c', 'd'])
+
+    def test_inserts_and_removes(self):
+        self.assertEqual(
+            self._resolve(['a', 'b', 'c'], ['x', 'a', 'c'], ['a', 'b', 'y']),
+            ['x', 'a', 'y'])
+        self.assertEqual(
+            self._resolve(['a', 'b', 'c'], ['a', 'x', 'c'], ['a', 'c']),
+            ['a', 'x', 'c'])
+
+    def test_same_id_added(self):
+        self.assertRaises(ConflictError, self._resolve,
+                          ['a'], ['a', 'b'], ['a', 'b'])
+
+    def test_moved(self):
+        self.assertRaises(ConflictError, self._resolve,
+                          ['a', 'b', 'c'], ['b', 'a', 'c'], ['a', 'b', 'd'])
+
+
+class OrderingConflictTests(unittest.TestCase):
+
+    def setUp(self):
+        from OFS.ordering import Ordering
+        self.tempdir = tempfile.mkdtemp()
+        self.db = DB(FileStorage(os.path.join(self.tempdir, 'Data.fs')))
+        conn = self.db.open()
+        conn.root()['order'] = Ordering(['a', 'b', 'c'])
+        transaction.commit()
+        conn.close()
+
+    def tearDown(self):
+        transaction.abort()
+        self.db.close()
+        shutil.rmtree(self.tempdir)
+
+    def _open(self):
+        tm = transaction.TransactionManager()
+        return tm, self.db.open(tm).root()['order']
+
+    def test_concurrent_appends_and_removes(self):
+        tm1, order1 = self._open()
+        tm2, order2 = self._open()
+        order1.append('x')
+        order2.remove('b')
+        order2.append('y')
+        tm1.commit()
+        tm2.commit()
+        tm3, order = self._open()
+        self.assertEqual(list(order), ['a', 'c', 'x', 'y'])
+        self.assertEqual(len(order), 4)
+        self.assertEqual(order.index('y'), 3)
+
+    def test_concurrent_moves_conflict(self):
+        tm1, order1 = self._open()
+        tm2, order2 = self._open()
+        order1.move('c', 0)
+        order2.append('x')
+        tm1.commit()
+        self.assertRaises(ConflictError, tm2.commit)
+        tm2.abort()
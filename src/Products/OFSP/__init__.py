@@ -13,6 +13,7 @@
 
 from AccessControl.Permissions import add_documents_images_and_files
 from AccessControl.Permissions import add_folders
+import OFS.BTreeFolder
 import OFS.DTMLMethod
 import OFS.DTMLDocument
 import OFS.Folder
@@ -72,6 +73,22 @@ def initialize(context):
         legacy=(OFS.OrderedFolder.manage_addOrderedFolder,),
     )
 
+    context.registerClass(
+        OFS.BTreeFolder.BTreeFolder,
+        permission=add_folders,
+        constructors=(OFS.BTreeFolder.manage_addBTreeFolderForm,
+                      OFS.BTreeFolder.manage_addBTreeFolder),
+        legacy=(OFS.BTreeFolder.manage_addBTreeFolder,),
+    )
+
+    context.registerClass(
+        OFS.BTreeFolder.OrderedBTreeFolder,
+        permission=add_folders,
+        constructors=(OFS.BTreeFolder.manage_addOrderedBTreeFolderForm,
+                      OFS.BTreeFolder.manage_addOrderedBTreeFolder),
+        legacy=(OFS.BTreeFolder.manage_addOrderedBTreeFolder,),
+    )
+
     context.registerClass(
         OFS.userfolder.UserFolder,
         constructors=(OFS.userfolder.manage_addUserFolder,),
@@ -2,6 +2,8 @@
 
 Defines the VirtualHostMonster class
 """
+from collections import OrderedDict
+
 from AccessControl.class_init import InitializeClass
 from AccessControl.Permissions import view as View  # NOQA
 from AccessControl.SecurityInfo import ClassSecurityInfo
@@ -17,6 +19,10 @@ from ZPublisher.BaseRequest import quote
 from ZPublisher.HTTPRequest import splitport
 from zExceptions import BadRequest
 
+# The number of host names each VirtualHostMonster remembers the mapped
+# path of, the least recently used are forgotten first.
+host_cache_size = 1000
+
 
 class VirtualHostMonster(Persistent, Item, Implicit):
     """Provide a simple drop-in solution for virtual hosting.
@@ -30,6 +36,7 @@ class VirtualHostMonster(Persistent, Item, Implicit):
     title = ''
     lines = ()
     have_map = 0
+    _v_host_paths = None
 
     security = ClassSecurityInfo()
 
@@ -64,7 +71,7 @@ class VirtualHostMonster(Persistent, Item, Implicit):
                 except:
                     raise ValueError(
                         'Line needs a slash between host and path: %s' % line)
-                pp = filter(None, path.split('/'))
+                pp = [x for x in path.split('/') if x]
                 if pp:
                     obpath = pp[:]
                     if obpath[0] == 'VirtualHostBase':
@@ -103,11 +110,12 @@ class VirtualHostMonster(Persistent, Item, Implicit):
                 if hostname not in host_map:
                     host_map[hostname] = {}
                 host_map[hostname][port] = pp
-            except 'LineError' as msg:
+            except ValueError as msg:
                 line = '%s #! %s' % (line, msg)
             new_lines.append(line)
         self.lines = tuple(new_lines)
         self.have_map = bool(fixed_map or sub_map)  # booleanize
+        self._v_host_paths = None
         if RESPONSE is not None:
             RESPONSE.redirect(
                 'manage_edit?manage_tabs_message=Changes%20Saved.')
@@ -154,34 +162,36 @@ class VirtualHostMonster(Persistent, Item, Implicit):
             # Find and convert VirtualHostRoot directive
             # If it is followed by one or more path elements that each
             # start with '_vh_', use them to construct the path to the
-            # virtual root.
+            # virtual root. The stack is scanned once, up to the directive.
             vh = -1
-            for ii in range(len(stack)):
-                if stack[ii] == 'VirtualHostRoot':
-                    vh_used = 1
-                    pp = ['']
-                    at_end = (ii == len(stack) - 1)
-                    if vh >= 0:
-                        for jj in range(vh, ii):
-                            pp.insert(1, stack[jj][4:])
-                        stack[vh:ii + 1] = ['/'.join(pp), self.id]
-                        ii = vh + 1
-                    elif ii > 0 and stack[ii - 1][:1] == '/':
-                        pp = stack[ii - 1].split('/')
-                        stack[ii] = self.id
-                    else:
-                        stack[ii] = self.id
-                        stack.insert(ii, '/')
-                        ii += 1
-                    path = stack[:ii]
-                    # If the directive is on top of the stack, go ahead
-                    # and process it right away.
-                    if at_end:
-                        request.setVirtualRoot(pp)
-                        del stack[-2:]
+            for ii, name in enumerate(stack):
+                if name == 'VirtualHostRoot':
                     break
-                elif vh < 0 and stack[ii][:4] == '_vh_':
+                if vh < 0 and name[:4] == '_vh_':
                     vh = ii
+            else:
+                ii = -1
+            if ii >= 0:
+                vh_used = 1
+                pp = ['']
+                at_end = (ii == len(stack) - 1)
+                if vh >= 0:
+                    pp.extend(name[4:] for name in reversed(stack[vh:ii]))
+                    stack[vh:ii + 1] = ['/'.join(pp), self.id]
+                    ii = vh + 1
+                elif ii > 0 and stack[ii - 1][:1] == '/':
+                    pp = stack[ii - 1].split('/')
+                    stack[ii] = self.id
+                else:
+                    stack[ii] = self.id
+                    stack.insert(ii, '/')
+                    ii += 1
+                path = stack[:ii]
+                # If the directive is on top of the stack, go ahead
+                # and process it right away.
+                if at_end:
+                    request.setVirtualRoot(pp)
+                    del stack[-2:]
 
             if vh_used or not self.have_map:
                 if path is not None:
@@ -208,29 +218,46 @@ class VirtualHostMonster(Persistent, Item, Implicit):
             # Try to apply the host map if one exists, and if no
             # VirtualHost directives were found.
             host = request['SERVER_URL'].split('://')[1].lower()
-            hostname, port = (host.split(':', 1) + [None])[:2]
-            ports = self.fixed_map.get(hostname, 0)
-            if not ports and self.sub_map:
-                get = self.sub_map.get
-                while hostname:
-                    ports = get(hostname, 0)
-                    if ports:
-                        break
-                    if '.' not in hostname:
-                        return
-                    hostname = hostname.split('.', 1)[1]
-            if ports:
-                pp = ports.get(port, 0)
-                if pp == 0 and port is not None:
-                    # Try default port
-                    pp = ports.get(None, 0)
-                if not pp:
-                    return
-                # If there was no explicit VirtualHostRoot, add one at the end
-                if pp[0] == '/':
-                    pp = pp[:]
-                    pp.insert(1, self.id)
-                stack.extend(pp)
+            cache = self._v_host_paths
+            if cache is None:
+                cache = self._v_host_paths = OrderedDict()
+            pp = cache.pop(host, 0)
+            if pp == 0:
+                pp = self._mappedPath(host)
+                if len(cache) >= host_cache_size:
+                    cache.popitem(last=False)
+            cache[host] = pp
+            if not pp:
+                return
+            stack.extend(pp)
+
+    def _mappedPath(self, host):
+        # Return the (reversed) path elements the host map adds to the
+        # traversal stack for host, or None.
+        hostname, port = (host.split(':', 1) + [None])[:2]
+        ports = self.fixed_map.get(hostname, 0)
+        if not ports and self.sub_map:
+            get = self.sub_map.get
+            while hostname:
+                ports = get(hostname, 0)
+                if ports:
+                    break
+                if '.' not in hostname:
+                    return None
+                hostname = hostname.split('.', 1)[1]
+        if not ports:
+            return None
+        pp = ports.get(port, 0)
+        if pp == 0 and port is not None:
+            # Try default port
+            pp = ports.get(None, 0)
+        if not pp:
+            return None
+        pp = list(pp)
+        # If there was no explicit VirtualHostRoot, add one at the end
+        if pp[0] == '/':
+            pp.insert(1, self.id)
+        return tuple(pp)
 
     def __bobo_traverse__(self, request, name):
         '''Traversing away'''
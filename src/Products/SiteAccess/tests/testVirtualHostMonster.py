@@ -98,6 +98,13 @@ class VHMRegressions(unittest.TestCase):
         self.assertEqual(self.app.REQUEST['ACTUAL_URL'],
                          'http://www.mysite.com/')
 
+    def test_several_vh_elements(self):
+        ob = self.traverse('/VirtualHostBase/http/www.mysite.com:80'
+                           '/folder/VirtualHostRoot/_vh_a/_vh_b/doc')
+        self.assertEqual(ob.absolute_url(), 'http://www.mysite.com/a/b/doc')
+        self.assertEqual(self.app.REQUEST['ACTUAL_URL'],
+                         'http://www.mysite.com/a/b/doc')
+
 
 def gen_cases():
     for vbase, ubase in (
@@ -251,3 +258,72 @@ class VHMAddingTests(unittest.TestCase):
         self.assertTrue(VirtualHostMonster.id in self.root.objectIds())
         hook = queryBeforeTraverse(self.root, VirtualHostMonster.meta_type)
         self.assertTrue(hook)
+
+
+class VHMMappingTests(unittest.TestCase):
+
+    def setUp(self):
+        from OFS.Application import Application
+        from OFS.Folder import Folder
+        from Products.SiteAccess.VirtualHostMonster import VirtualHostMonster
+        from Testing.makerequest import makerequest
+        app = Application()
+        app._setObject('folder', Folder('folder'))
+        self.app = makerequest(app)
+        self.vhm = VirtualHostMonster().__of__(self.app)
+
+    def _traverse(self, host, stack=('doc', )):
+        request = self.app.REQUEST
+        request.other['SERVER_URL'] = 'http://' + host
+        request['ACTUAL_URL'] = 'http://%s/%s' % (host, '/'.join(stack))
+        request['TraversalRequestNameStack'] = stack = list(stack)
+        self.vhm(None, request)
+        return stack
+
+    def test_set_map(self):
+        self.vhm.set_map('www.example.com/folder\n'
+                         '*.example.org:8080/folder\n'
+                         'no-slash\n'
+                         'www.example.net/missing\n')
+        self.assertTrue(self.vhm.have_map)
+        self.assertEqual(self.vhm.fixed_map,
+                         {'www.example.com': {None: ['/', 'folder']}})
+        self.assertEqual(self.vhm.sub_map,
+                         {'example.org': {'8080': ['/', 'folder']}})
+        self.assertEqual(self.vhm.lines[:2], (
+            'www.example.com/folder', '*.example.org:8080/folder'))
+        self.assertTrue(self.vhm.lines[2].startswith('no-slash #! '))
+        self.assertTrue(self.vhm.lines[3].startswith(
+            'www.example.net/missing #! Path not found'))
+
+    def test_mapped_hosts(self):
+        self.vhm.set_map('www.example.com/folder\n'
+                         '*.example.org:8080/folder/VirtualHostRoot\n')
+        self.assertEqual(self._traverse('www.example.com'),
+                         ['doc', '/', 'virtual_hosting', 'folder'])
+        self.assertEqual(self._traverse('WWW.example.com:81'),
+                         ['doc', '/', 'virtual_hosting', 'folder'])
+        self.assertEqual(self._traverse('a.b.example.org:8080'),
+                         ['doc', '/', 'virtual_hosting', 'folder'])
+        self.assertEqual(self._traverse('a.b.example.org'), ['doc'])
+        self.assertEqual(self._traverse('example.com'), ['doc'])
+
+    def test_host_cache(self):
+        from Products.SiteAccess import VirtualHostMonster
+        old_size = VirtualHostMonster.host_cache_size
+        VirtualHostMonster.host_cache_size = 2
+        try:
+            self.vhm.set_map('*.example.com/folder\n')
+            for host in ('a.example.com', 'b.example.com', 'example.net',
+                         'a.example.com', 'c.example.com'):
+                self._traverse(host)
+            self.assertEqual(list(self.vhm._v_host_paths),
+                             ['a.example.com', 'c.example.com'])
+            self.assertEqual(self._traverse('a.example.com'),
+                             ['doc', '/', 'virtual_hosting', 'folder'])
+            # Changing the map forgets the hosts seen so far.
+            self.vhm.set_map('*.example.com/\n')
+            self.assertEqual(self._traverse('a.example.com'), ['doc'])
+            self.assertEqual(list(self.vhm._v_host_paths), ['a.example.com'])
+        finally:
+            VirtualHostMonster.host_cache_size = old_size
@@ -22,10 +22,12 @@ from ExtensionClass import Base
 from six.moves.urllib.parse import quote as urllib_quote
 from zExceptions import Forbidden
 from zExceptions import NotFound
+from zope.component import getSiteManager
 from zope.component import queryMultiAdapter
 from zope.event import notify
 from zope.interface import implementer
 from zope.interface import Interface
+from zope.interface import providedBy
 from zope.location.interfaces import LocationError
 from zope.publisher.defaultview import queryDefaultViewName
 from zope.publisher.interfaces import EndRequestEvent
@@ -43,12 +45,72 @@ from ZPublisher.interfaces import UseTraversalDefault
 _marker = []
 UNSPECIFIED_ROLES = ''
 
+# The number of factories an _AdapterCache remembers before it is cleared.
+adapter_cache_size = 1000
+
 
 def quote(text):
     # quote url path segments, but leave + and @ intact
     return urllib_quote(text, '/+@')
 
 
+class _AdapterCache(object):
+    # The adapter factories (or None) looked up in an adapter registry for
+    # the interfaces provided by an object and a request, a provided
+    # interface and a name. A new cache replaces it when the registrations
+    # change. The interfaces provided notify it when their declarations
+    # change, as they notify the lookup of the registry itself. Like that
+    # lookup, it is kept in a volatile attribute of the registry.
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.generation = registry._generation
+        self.factories = {}
+        self.specs = set()
+
+    def changed(self, originally_changed):
+        self.factories.clear()
+
+    def lookup(self, required, provided, name):
+        key = required + (provided, name)
+        factories = self.factories
+        try:
+            return factories[key]
+        except KeyError:
+            pass
+        factory = self.registry.lookup(required, provided, name)
+        if len(factories) >= adapter_cache_size:
+            # Names are taken from URLs, do not grow without limit.
+            factories.clear()
+        for spec in required:
+            if spec not in self.specs:
+                spec.subscribe(self)
+                self.specs.add(spec)
+        factories[key] = factory
+        return factory
+
+
+def queryRequestAdapter(ob, request, provided=Interface, name=u''):
+    """Look up the adapter of ob and request providing provided.
+
+    This does the same as queryMultiAdapter, but remembers the factories
+    found in the registry, and in particular that there is none. Traversal
+    looks up adapters which usually do not exist for most URL segments.
+    """
+    registry = getattr(getSiteManager(), 'adapters', None)
+    generation = getattr(registry, '_generation', None)
+    if generation is None:
+        return queryMultiAdapter((ob, request), provided, name)
+    cache = getattr(registry, '_v_publisher_adapters', None)
+    if cache is None or cache.generation != generation:
+        cache = registry._v_publisher_adapters = _AdapterCache(registry)
+    factory = cache.lookup(
+        (providedBy(ob), providedBy(request)), provided, name)
+    if factory is None:
+        return None
+    return factory(ob, request)
+
+
 class RequestContainer(Base):
     __roles__ = None
 
@@ -87,8 +149,8 @@ class DefaultPublishTraverse(object):
                         object, subobject = subobject[-2:]
                 except (AttributeError, KeyError, NotFound) as e:
                     # Try to find a view
-                    subobject = queryMultiAdapter(
-                        (object, request), Interface, name)
+                    subobject = queryRequestAdapter(object, request,
+                                                    Interface, name)
                     if subobject is not None:
                         # OFS.Application.__bobo_traverse__ calls
                         # REQUEST.RESPONSE.notFoundError which sets the HTTP
@@ -112,8 +174,8 @@ class DefaultPublishTraverse(object):
                 subobject = getattr(object, name)
             else:
                 # We try to fall back to a view:
-                subobject = queryMultiAdapter((object, request), Interface,
-                                              name)
+                subobject = queryRequestAdapter(object, request, Interface,
+                                                name)
                 if subobject is not None:
                     if IAcquirer.providedBy(subobject):
                         subobject = subobject.__of__(object)
@@ -339,7 +401,7 @@ class BaseRequest(object):
         if IPublishTraverse.providedBy(ob):
             ob2 = ob.publishTraverse(self, name)
         else:
-            adapter = queryMultiAdapter((ob, self), IPublishTraverse)
+            adapter = queryRequestAdapter(ob, self, IPublishTraverse)
             if adapter is None:
                 # Zope2 doesn't set up its own adapters in a lot of cases
                 # so we will just use a default adapter.
@@ -478,8 +540,8 @@ class BaseRequest(object):
                     if IBrowserPublisher.providedBy(object):
                         adapter = object
                     else:
-                        adapter = queryMultiAdapter((object, self),
-                                                    IBrowserPublisher)
+                        adapter = queryRequestAdapter(object, self,
+                                                      IBrowserPublisher)
                         if adapter is None:
                             # Zope2 doesn't set up its own adapters in a lot
                             # of cases so we will just use a default adapter.
@@ -14,13 +14,14 @@
 """ HTTP request management.
 """
 
+from bisect import bisect_right
 from cgi import FieldStorage
 import codecs
+from collections import OrderedDict
 from copy import deepcopy
+import ipaddress
 import os
-import random
 import re
-import time
 
 from AccessControl.tainted import should_be_tainted
 from AccessControl.tainted import taint_string
@@ -29,6 +30,8 @@ from six import PY2
 from six import PY3
 from six import string_types
 from six import text_type
+from six.moves._thread import allocate_lock
+from six.moves.urllib.parse import parse_qsl
 from six.moves.urllib.parse import unquote
 from zope.i18n.interfaces import IUserPreferredLanguages
 from zope.i18n.locales import locales, LoadLocaleError
@@ -40,7 +43,11 @@ from zope.publisher.interfaces.browser import IBrowserRequest
 
 from ZPublisher.BaseRequest import BaseRequest
 from ZPublisher.BaseRequest import quote
+from ZPublisher import conflicts
 from ZPublisher.Converters import get_converter
+from ZPublisher.Converters import type_converters
+from ZPublisher.multipart import get_boundary
+from ZPublisher.multipart import MultipartInput
 from ZPublisher.utils import basic_auth_decode
 from ZPublisher import xmlrpc
 
@@ -107,14 +114,77 @@ _marker = []
 # into REMOTE_ADDR. X_FORWARDED_FOR is left unchanged.
 # The ZConfig machinery may sets this attribute on initialization
 # if any trusted-proxies are defined in the configuration file.
+# It then is a TrustedProxies instance, which also matches addresses
+# in the IP networks (like 10.0.0.0/8) it contains.
 
 trusted_proxies = []
 
+# The number of parsed form field names kept by field_descriptor.
+# Form field names come from the client, the cache is therefore bounded.
+# A size of 0 disables the cache.
+field_descriptor_cache_size = 1000
+
 
 class NestedLoopExit(Exception):
     pass
 
 
+class TrustedProxies(tuple):
+    """A sequence of trusted proxy addresses and IP networks.
+
+    Networks are written like ``10.0.0.0/8``. Membership tests are
+    compiled: addresses are looked up in a set, networks are merged into
+    sorted address ranges which are searched by bisection.
+    """
+
+    def __new__(cls, proxies=()):
+        self = tuple.__new__(cls, proxies)
+        addresses = set()
+        ranges = []
+        for proxy in self:
+            if '/' in proxy:
+                try:
+                    network = ipaddress.ip_network(
+                        text_type(proxy), strict=False)
+                except ValueError:
+                    pass
+                else:
+                    ranges.append((
+                        (network.version, int(network.network_address)),
+                        (network.version, int(network.broadcast_address)),
+                    ))
+                    continue
+            addresses.add(proxy)
+        ranges.sort()
+        merged = []
+        for first, last in ranges:
+            if (merged and merged[-1][1][0] == first[0] and
+                    merged[-1][1][1] + 1 >= first[1]):
+                if last > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], last)
+            else:
+                merged.append((first, last))
+        self._addresses = frozenset(addresses)
+        self._firsts = [first for first, last in merged]
+        self._lasts = [last for first, last in merged]
+        return self
+
+    def __contains__(self, address):
+        if address in self._addresses:
+            return True
+        if not self._firsts:
+            return False
+        try:
+            ip = ipaddress.ip_address(text_type(address))
+        except ValueError:
+            return False
+        if ip.version == 6 and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        key = (ip.version, int(ip))
+        i = bisect_right(self._firsts, key) - 1
+        return i >= 0 and key <= self._lasts[i]
+
+
 @implementer(IBrowserRequest)
 class HTTPRequest(BaseRequest):
     """ Model HTTP request data.
@@ -172,13 +242,19 @@ class HTTPRequest(BaseRequest):
     args = ()
     _file = None
     _urls = ()
+    _inputs_pending = False
+    _timer = None  # a ZPublisher.timing.RequestTimer if enabled
+    _read_only_jar = None  # the connection guarded in read-only requests
+    _url_prefixes = None  # container path -> URL prefix of its contents
+    _physical_paths = None  # id(container) -> (container, physical path)
 
     charset = default_encoding
     retry_max_count = 0
 
     def supports_retry(self):
-        if self.retry_count < self.retry_max_count:
-            time.sleep(random.uniform(0, 2 ** (self.retry_count)))
+        # The publisher waits according to the policy before retrying.
+        if (self.retry_count < self.retry_max_count and
+                conflicts.policy.allows(self.retry_count)):
             return 1
 
     def retry(self):
@@ -195,11 +271,14 @@ class HTTPRequest(BaseRequest):
         # removing tempfiles.
         self.stdin = None
         self._file = None
+        self._inputs_pending = False
         self.form.clear()
         # we want to clear the lazy dict here because BaseRequests don't have
         # one.  Without this, there's the possibility of memory leaking
         # after every request.
         self._lazies = {}
+        self._url_prefixes = None
+        self._physical_paths = None
         BaseRequest.clear(self)
 
     def setServerURL(self, protocol=None, hostname=None, port=None):
@@ -260,13 +339,29 @@ class HTTPRequest(BaseRequest):
 
     def physicalPathToURL(self, path, relative=0):
         """ Convert a physical path into a URL in the current context """
-        path = self._script + list(
-            map(quote, self.physicalPathToVirtualPath(path)))
+        if isinstance(path, string_types):
+            path = path.split('/')
         if relative:
-            path.insert(0, '')
+            base = ''
         else:
-            path.insert(0, self['SERVER_URL'])
-        return '/'.join(path)
+            base = self['SERVER_URL']
+        rpp = self.other.get('VirtualRootPhysicalPath', ('',))
+        prefixes = self._url_prefixes
+        if prefixes is None or len(path) <= len(rpp):
+            # The virtual root may end in the last path element.
+            path = self._script + list(
+                map(quote, self.physicalPathToVirtualPath(path)))
+            path.insert(0, base)
+            return '/'.join(path)
+        # Listings convert the paths of many objects in the same
+        # container, whose URL prefix is only computed once.
+        container = tuple(path[:-1])
+        prefix = prefixes.get(container)
+        if prefix is None:
+            names = self._script + list(
+                map(quote, self.physicalPathToVirtualPath(container)))
+            prefix = prefixes[container] = ''.join(n + '/' for n in names)
+        return '%s/%s%s' % (base, prefix, quote(path[-1]))
 
     def physicalPathFromURL(self, URL):
         """ Convert a URL into a physical path in the current context.
@@ -295,6 +390,8 @@ class HTTPRequest(BaseRequest):
         for x in self._urls:
             del self.other[x]
         self._urls = ()
+        self._url_prefixes = {}
+        self._physical_paths = {}
 
     def getClientAddr(self):
         """ The IP address of the client.
@@ -346,6 +443,8 @@ class HTTPRequest(BaseRequest):
         self.steps = []
         self._steps = []
         self._lazies = {}
+        self._url_prefixes = {}
+        self._physical_paths = {}
         self._debug = DebugFlags()
         # We don't set up the locale initially but just on first access
         self._locale = _marker
@@ -459,6 +558,45 @@ class HTTPRequest(BaseRequest):
         self.cookies = cookies
         self.taintedcookies = taintedcookies
 
+    def _getForm(self):
+        if self._inputs_pending:
+            self._processPendingInputs()
+        return self._form
+
+    def _setForm(self, value):
+        self._form = value
+
+    form = property(_getForm, _setForm)
+
+    def _getTaintedForm(self):
+        if self._inputs_pending:
+            self._processPendingInputs()
+        return self._taintedform
+
+    def _setTaintedForm(self, value):
+        self._taintedform = value
+
+    taintedform = property(_getTaintedForm, _setTaintedForm)
+
+    def _processPendingInputs(self):
+        self._inputs_pending = False
+        self.processInputs()
+
+    def processInputsLazily(self):
+        """Process request inputs on first access of the form data
+
+        Only the query string of GET and HEAD requests is deferred, and
+        only if it does not contain a method marker which would change
+        the path to publish. Otherwise the inputs are processed right away.
+        """
+        environ = self.environ
+        method = environ.get('REQUEST_METHOD', 'GET')
+        if (method not in ('GET', 'HEAD') or
+                has_method_marker(environ.get('QUERY_STRING', ''))):
+            self.processInputs()
+        else:
+            self._inputs_pending = True
+
     def processInputs(
             self,
             # "static" variables that we want to be local for speed
@@ -502,8 +640,16 @@ class HTTPRequest(BaseRequest):
             # In Python 3 we need the proper encoding to parse the input.
             fs_kw['encoding'] = self.charset
 
-        fs = ZopeFieldStorage(
-            fp=fp, environ=environ, keep_blank_values=1, **fs_kw)
+        boundary = None
+        if fp is not None:
+            boundary = get_boundary(environ.get('CONTENT_TYPE', ''))
+        if boundary is not None:
+            # Parse uploads incrementally, cgi works line by line and
+            # copies each part into a temporary file of its own.
+            fs = MultipartInput(fp, environ, boundary, self.charset)
+        else:
+            fs = ZopeFieldStorage(
+                fp=fp, environ=environ, keep_blank_values=1, **fs_kw)
 
         # Keep a reference to the FieldStorage. Otherwise it's
         # __del__ method is called too early and closing FieldStorage.file.
@@ -528,7 +674,6 @@ class HTTPRequest(BaseRequest):
             tuple_items = {}
             defaults = {}
             tainteddefaults = {}
-            converter = None
 
             for item in fslist:
 
@@ -549,108 +694,41 @@ class HTTPRequest(BaseRequest):
                     else:
                         item = item.value
 
-                flags = 0
-                character_encoding = ''
                 # Variables for potentially unsafe values.
                 tainted = None
-                converter_type = None
-
-                # Loop through the different types and set
-                # the appropriate flags
 
-                # We'll search from the back to the front.
-                # We'll do the search in two steps.  First, we'll
-                # do a string search, and then we'll check it with
-                # a re search.
+                # The type markers are parsed once per field name.
+                (key, attr, tainted_key, flags, ignore_empty,
+                 converter_type, character_encoding, tuple_keys,
+                 methods, special, bad_attr) = field_descriptor(key)
 
-                l = key.rfind(':')
-                if l >= 0:
-                    mo = search_type(key, l)
-                    if mo:
-                        l = mo.start(0)
-                    else:
-                        l = -1
-
-                    while l >= 0:
-                        type_name = key[l + 1:]
-                        key = key[:l]
-                        c = get_converter(type_name, None)
-
-                        if c is not None:
-                            converter = c
-                            converter_type = type_name
-                            flags = flags | CONVERTED
-                        elif type_name == 'list':
-                            flags = flags | SEQUENCE
-                        elif type_name == 'tuple':
-                            tuple_items[key] = 1
-                            flags = flags | SEQUENCE
-                        elif (type_name == 'method' or type_name == 'action'):
-                            if l:
-                                meth = key
-                            else:
-                                meth = item
-                        elif (type_name == 'default_method' or
-                              type_name == 'default_action'):
-                            if not meth:
-                                if l:
-                                    meth = key
-                                else:
-                                    meth = item
-                        elif type_name == 'default':
-                            flags = flags | DEFAULT
-                        elif type_name == 'record':
-                            flags = flags | RECORD
-                        elif type_name == 'records':
-                            flags = flags | RECORDS
-                        elif type_name == 'ignore_empty':
-                            if not item:
-                                flags = flags | EMPTY
-                        elif has_codec(type_name):
-                            character_encoding = type_name
-
-                        l = key.rfind(':')
-                        if l < 0:
-                            break
-                        mo = search_type(key, l)
-                        if mo:
-                            l = mo.start(0)
-                        else:
-                            l = -1
+                for is_default, meth_key in methods:
+                    if not is_default or not meth:
+                        meth = item if meth_key is None else meth_key
+                for tuple_key in tuple_keys:
+                    tuple_items[tuple_key] = 1
+                if ignore_empty and not item:
+                    flags = flags | EMPTY
 
                 # Filter out special names from form:
-                if key in isCGI_NAMEs or key.startswith('HTTP_'):
+                if special:
                     continue
 
-                # If the key is tainted, mark it so as well.
-                tainted_key = key
-                if should_be_tainted(key):
-                    tainted_key = taint_string(key)
-
                 if flags:
 
                     # skip over empty fields
                     if flags & EMPTY:
                         continue
 
-                    # Split the key and its attribute
-                    if flags & REC:
-                        key = key.split(".")
-                        key, attr = ".".join(key[:-1]), key[-1]
-
-                        # Update the tainted_key if necessary
-                        tainted_key = key
-                        if should_be_tainted(key):
-                            tainted_key = taint_string(key)
-
-                        # Attributes cannot hold a <.
-                        if should_be_tainted(attr):
-                            raise ValueError(
-                                "%s is not a valid record attribute name" %
-                                escape(attr, True))
+                    # Attributes cannot hold a <.
+                    if bad_attr:
+                        raise ValueError(
+                            "%s is not a valid record attribute name" %
+                            escape(attr, True))
 
                     # defer conversion
                     if flags & CONVERTED:
+                        converter = get_converter(converter_type)
                         try:
                             if character_encoding:
                                 # We have a string with a specified character
@@ -1615,6 +1693,135 @@ def has_codec(x):
         return 1
 
 
+def parse_field_name(key):
+    """Parse the type markers of a form field name.
+
+    Returns a tuple of the key and attribute name without the markers,
+    the (possibly tainted) key, the flags, whether empty values are
+    ignored, the converter name, the character encoding, the keys to be
+    made tuples, the method markers as ``(is_default, key)`` pairs (key is
+    None if the value names the method), whether the name is a special
+    CGI name and whether the attribute name is unsafe.
+    """
+    flags = 0
+    ignore_empty = False
+    converter_type = None
+    character_encoding = ''
+    tuple_keys = []
+    methods = []
+    attr = None
+    bad_attr = False
+
+    # We'll search from the back to the front.
+    # We'll do the search in two steps.  First, we'll
+    # do a string search, and then we'll check it with
+    # a re search.
+
+    l = key.rfind(':')
+    if l >= 0:
+        mo = search_type(key, l)
+        if mo:
+            l = mo.start(0)
+        else:
+            l = -1
+
+        while l >= 0:
+            type_name = key[l + 1:]
+            key = key[:l]
+
+            if get_converter(type_name, None) is not None:
+                converter_type = type_name
+                flags = flags | CONVERTED
+            elif type_name == 'list':
+                flags = flags | SEQUENCE
+            elif type_name == 'tuple':
+                tuple_keys.append(key)
+                flags = flags | SEQUENCE
+            elif (type_name == 'method' or type_name == 'action'):
+                methods.append((False, key if l else None))
+            elif (type_name == 'default_method' or
+                  type_name == 'default_action'):
+                methods.append((True, key if l else None))
+            elif type_name == 'default':
+                flags = flags | DEFAULT
+            elif type_name == 'record':
+                flags = flags | RECORD
+            elif type_name == 'records':
+                flags = flags | RECORDS
+            elif type_name == 'ignore_empty':
+                ignore_empty = True
+            elif has_codec(type_name):
+                character_encoding = type_name
+
+            l = key.rfind(':')
+            if l < 0:
+                break
+            mo = search_type(key, l)
+            if mo:
+                l = mo.start(0)
+            else:
+                l = -1
+
+    special = key in isCGI_NAMEs or key.startswith('HTTP_')
+
+    # Split the key and its attribute
+    if flags & REC:
+        key = key.split(".")
+        key, attr = ".".join(key[:-1]), key[-1]
+        bad_attr = bool(should_be_tainted(attr))
+
+    # If the key is tainted, mark it so as well.
+    tainted_key = key
+    if should_be_tainted(key):
+        tainted_key = taint_string(key)
+
+    return (key, attr, tainted_key, flags, ignore_empty, converter_type,
+            character_encoding, tuple(tuple_keys), tuple(methods),
+            special, bad_attr)
+
+
+_field_descriptors = OrderedDict()
+_field_descriptors_lock = allocate_lock()
+_field_descriptors_converters = [len(type_converters)]
+
+
+def field_descriptor(key):
+    """Return the result of parse_field_name for key, cached."""
+    size = field_descriptor_cache_size
+    if size <= 0:
+        return parse_field_name(key)
+    with _field_descriptors_lock:
+        if _field_descriptors_converters[0] != len(type_converters):
+            # A converter was registered, cached names may be stale.
+            _field_descriptors.clear()
+            _field_descriptors_converters[0] = len(type_converters)
+        descriptor = _field_descriptors.pop(key, None)
+        if descriptor is not None:
+            _field_descriptors[key] = descriptor
+            return descriptor
+    descriptor = parse_field_name(key)
+    with _field_descriptors_lock:
+        _field_descriptors[key] = descriptor
+        while len(_field_descriptors) > size:
+            _field_descriptors.popitem(last=False)
+    return descriptor
+
+
+def has_method_marker(qs):
+    """Return whether a field name in the query string *qs* has a method
+    marker (like ``:method`` or ``:default_action``).
+
+    The field names are decoded and parsed like ``processInputs`` does,
+    so percent-encoded markers are found, too.
+    """
+    if ':' not in qs and '%' not in qs:
+        return False
+    for name, value in parse_qsl(qs, keep_blank_values=True):
+        if ':' in name and field_descriptor(name)[8]:
+            return True
+    return False
+
+
 def sane_environment(env):
     # return an environment mapping which has been cleaned of
     # funny business such as REDIRECT_ prefixes added by Apache
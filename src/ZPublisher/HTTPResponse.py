@@ -15,10 +15,8 @@
 from io import BytesIO
 import os
 import re
-import struct
 import sys
 import time
-import zlib
 
 from six import class_types
 from six import PY2
@@ -37,6 +35,7 @@ from zExceptions import (
 )
 from zExceptions.ExceptionFormatter import format_exception
 from ZPublisher.BaseResponse import BaseResponse
+from ZPublisher import compression
 from ZPublisher.Iterators import IUnboundStreamIterator, IStreamIterator
 from ZPublisher import pubevents
 
@@ -88,18 +87,13 @@ charset_re_match = re.compile(
 absuri_match = re.compile(r'\w+://[\w\.]+').match
 tag_search = re.compile('[a-zA-Z]>').search
 
-_gzip_header = (b"\037\213"  # magic
-                b"\010"  # compression method
-                b"\000"  # flags
-                b"\000\000\000\000"  # time
-                b"\002"
-                b"\377")
-
-# these mime major types should not be gzip content encoded
+# these mime major types should not be gzip content encoded,
+# unless the gzip-mime-type configuration option lists the types to compress
 uncompressableMimeMajorTypes = ('image',)
 
 # The environment variable DONT_GZIP_MAJOR_MIME_TYPES can be set to a list
-# of comma seperated mime major types which should also not be compressed
+# of comma seperated mime major types which should also not be compressed.
+# It is ignored if gzip-mime-type is configured.
 
 otherTypes = os.environ.get('DONT_GZIP_MAJOR_MIME_TYPES', '').lower()
 if otherTypes:
@@ -550,39 +544,45 @@ class HTTPBaseResponse(BaseResponse):
 
         self.insertBase()
 
-        if (self.use_HTTP_content_compression and
-                self.headers.get('content-encoding', 'gzip') == 'gzip'):
-            # use HTTP content encoding to compress body contents unless
-            # this response already has another type of content encoding
-            if content_type.split('/')[0] not in uncompressableMimeMajorTypes:
-                # only compress if not listed as uncompressable
-                body = self.body
-                startlen = len(body)
-                co = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS,
-                                      zlib.DEF_MEM_LEVEL, 0)
-                chunks = [_gzip_header, co.compress(body),
-                          co.flush(),
-                          struct.pack("<LL",
-                                      zlib.crc32(body) & 0xffffffff,
-                                      startlen)]
-                z = b''.join(chunks)
-                newlen = len(z)
-                if newlen < startlen:
-                    self.body = z
-                    self.setHeader('content-length', newlen)
-                    self.setHeader('content-encoding', 'gzip')
-                    if self.use_HTTP_content_compression == 1:
-                        # use_HTTP_content_compression == 1 if force was
-                        # NOT used in enableHTTPCompression().
-                        # If we forced it, then Accept-Encoding
-                        # was ignored anyway, so cache should not
-                        # vary on it. Otherwise if not forced, cache should
-                        # respect Accept-Encoding client header
-                        vary = self.getHeader('Vary')
-                        if vary is None or 'Accept-Encoding' not in vary:
-                            self.appendHeader('Vary', 'Accept-Encoding')
+        body = self.body
+        startlen = len(body)
+        if self._shouldCompress(startlen):
+            encoder = compression.GzipEncoder()
+            z = encoder.compress(body) + encoder.flush()
+            newlen = len(z)
+            if newlen < startlen:
+                self.body = z
+                self.setHeader('content-length', newlen)
+                self._setCompressionHeaders()
         return self
 
+    def _shouldCompress(self, length=None):
+        # Return whether the body is to be gzip compressed, given its
+        # length if it is known.
+        # use HTTP content encoding to compress body contents unless
+        # this response already has another type of content encoding
+        if not (self.use_HTTP_content_compression and
+                self.headers.get('content-encoding', 'gzip') == 'gzip'):
+            return False
+        if length is not None and length < compression.min_size:
+            return False
+        # only compress if not listed as uncompressable
+        return compression.is_compressible(
+            self.headers.get('content-type'), uncompressableMimeMajorTypes)
+
+    def _setCompressionHeaders(self):
+        self.setHeader('content-encoding', 'gzip')
+        if self.use_HTTP_content_compression == 1:
+            # use_HTTP_content_compression == 1 if force was
+            # NOT used in enableHTTPCompression().
+            # If we forced it, then Accept-Encoding
+            # was ignored anyway, so cache should not
+            # vary on it. Otherwise if not forced, cache should
+            # respect Accept-Encoding client header
+            vary = self.getHeader('Vary')
+            if vary is None or 'Accept-Encoding' not in vary:
+                self.appendHeader('Vary', 'Accept-Encoding')
+
     def enableHTTPCompression(self, REQUEST={}, force=0, disable=0, query=0):
         """Enable HTTP Content Encoding with gzip compression if possible
 
@@ -611,12 +611,16 @@ class HTTPBaseResponse(BaseResponse):
            has been previously requested.
 
            In setBody, the major mime type is used to determine if content
-           encoding should actually be performed.
+           encoding should actually be performed. Bodies written with
+           ``write`` or set to a file or stream iterator are compressed
+           while they are sent.
 
            By default, image types are not compressed.
            Additional major mime types can be specified by setting the
            environment variable DONT_GZIP_MAJOR_MIME_TYPES to a comma-seperated
            list of major mime types that should also not be gzip compressed.
+           If the gzip-mime-type configuration option is used, only the
+           listed types are compressed.
         """
         if query:
             return self.use_HTTP_content_compression
@@ -991,6 +995,7 @@ class WSGIResponse(HTTPBaseResponse):
     _streaming = 0
     _http_version = None
     _server_version = None
+    _encoder = None  # a compression.GzipEncoder if the body is compressed
 
     # Append any "cleanup" functions to this list.
     after_list = ()
@@ -1058,6 +1063,20 @@ class WSGIResponse(HTTPBaseResponse):
         reraise(t, v, tb)
 
     def finalize(self):
+        # Compress files and stream iterators while they are sent.
+        body = self.body
+        if (self._encoder is None and
+                (isinstance(body, IOBase) or
+                 IUnboundStreamIterator.providedBy(body)) and
+                self._shouldCompress(self._contentLength())):
+            self._encoder = self._startEncoding()
+            self.body = compression.GzipIterator(body, self._encoder)
+            self._streaming = 1
+        elif self._encoder is not None:
+            # The body is compressed after the written data, the length
+            # set by setBody does not apply.
+            self.headers.pop('content-length', None)
+
         # Set 204 (no content) status if 200 and response is empty
         # and not streaming.
         if ('content-type' not in self.headers and
@@ -1091,10 +1110,39 @@ class WSGIResponse(HTTPBaseResponse):
         if not self._streaming:
             notify(pubevents.PubBeforeStreaming(self))
             self._streaming = 1
+            if self._shouldCompress(self._contentLength()):
+                self._encoder = self._startEncoding()
+            start = getattr(self.stdout, 'start', None)
+            if start is not None:
+                # The output is handed to the WSGI server while we are
+                # still publishing, so status and headers are final now.
+                start(self)
             self.stdout.flush()
 
+        if self._encoder is not None:
+            data = self._encoder.compress(data)
+            if not data:
+                return
         self.stdout.write(data)
 
+    def _shouldCompress(self, length=None):
+        if self._encoder is not None:
+            # The body follows data which was compressed while written.
+            return False
+        return super(WSGIResponse, self)._shouldCompress(length)
+
+    def _contentLength(self):
+        try:
+            return int(self.headers['content-length'])
+        except (KeyError, ValueError):
+            return None
+
+    def _startEncoding(self):
+        # The length of the compressed body is not known in advance.
+        self.headers.pop('content-length', None)
+        self._setCompressionHeaders()
+        return compression.GzipEncoder()
+
     def setBody(self, body, title='', is_error=False, lock=None):
         if isinstance(body, IOBase):
             body.seek(0, 2)
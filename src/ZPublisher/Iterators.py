@@ -3,6 +3,10 @@ import io
 from zope.interface import Interface
 from zope.interface import implementer
 
+# The default size of the chunks read by filestream_iterator. The ZConfig
+# machinery may set this attribute on initialization.
+default_streamsize = 1 << 16
+
 
 class IUnboundStreamIterator(Interface):
     """
@@ -45,8 +49,10 @@ class filestream_iterator(io.FileIO):
     fixed-sized sequence of bytes.
     """
 
-    def __init__(self, name, mode='rb', bufsize=-1, streamsize=1 << 16):
+    def __init__(self, name, mode='rb', bufsize=-1, streamsize=None):
         super(filestream_iterator, self).__init__(name, mode)
+        if streamsize is None:
+            streamsize = default_streamsize
         self.streamsize = streamsize
 
     def __next__(self):
@@ -15,13 +15,17 @@
 from contextlib import contextmanager, closing
 from io import BytesIO
 from io import IOBase
+from logging import getLogger
 import sys
+from threading import Thread
 
 from AccessControl.SecurityManagement import newSecurityManager
 from AccessControl.SecurityManagement import noSecurityManager
 from six import PY3
 from six import reraise
 from six.moves._thread import allocate_lock
+from six.moves.queue import Empty
+from six.moves.queue import Queue
 import transaction
 from transaction.interfaces import TransientError
 from zExceptions import (
@@ -29,17 +33,24 @@ from zExceptions import (
     upgradeException,
 )
 from ZODB.POSException import ConflictError
+from ZODB.utils import oid_repr
 from zope.component import queryMultiAdapter
 from zope.event import notify
 from zope.globalrequest import setRequest, clearRequest
 from zope.security.management import newInteraction, endInteraction
 from zope.publisher.skinnable import setDefaultSkin
 
+from ZPublisher import compression
+from ZPublisher import conflicts
 from ZPublisher.HTTPRequest import WSGIRequest
 from ZPublisher.HTTPResponse import WSGIResponse
+from ZPublisher import Iterators
+from ZPublisher.interfaces import IReadOnlyPublished
 from ZPublisher.Iterators import IUnboundStreamIterator
 from ZPublisher.mapply import mapply
+from ZPublisher import pagecache
 from ZPublisher import pubevents
+from ZPublisher import timing
 from ZPublisher.utils import recordMetaData
 
 if sys.version_info >= (3, ):
@@ -49,8 +60,17 @@ else:
 
 _DEFAULT_DEBUG_MODE = False
 _DEFAULT_REALM = None
+_DEFAULT_STREAMING = False
+_DEFAULT_LAZY_INPUTS = False
+_DEFAULT_FILE_WRAPPER = True
+_DEFAULT_READ_ONLY_PATHS = ()
+_STREAM_QUEUE_SIZE = 16
+_STREAM_START, _STREAM_DATA, _STREAM_DONE, _STREAM_ERROR = range(4)
 _MODULE_LOCK = allocate_lock()
 _MODULES = {}
+_SAFE_METHODS = ('GET', 'HEAD')
+
+LOG = getLogger('ZPublisher')
 
 
 def call_object(obj, args, request):
@@ -81,6 +101,27 @@ def set_default_authentication_realm(realm):
     _DEFAULT_REALM = realm
 
 
+def set_default_streaming(streaming):
+    global _DEFAULT_STREAMING
+    _DEFAULT_STREAMING = streaming
+
+
+def set_default_lazy_inputs(lazy_inputs):
+    global _DEFAULT_LAZY_INPUTS
+    _DEFAULT_LAZY_INPUTS = lazy_inputs
+
+
+def set_default_file_wrapper(file_wrapper):
+    global _DEFAULT_FILE_WRAPPER
+    _DEFAULT_FILE_WRAPPER = file_wrapper
+
+
+def set_default_read_only_paths(paths):
+    global _DEFAULT_READ_ONLY_PATHS
+    _DEFAULT_READ_ONLY_PATHS = tuple(
+        '/' + path.strip('/') for path in paths)
+
+
 def get_module_info(module_name='Zope2'):
     global _MODULES
     info = _MODULES.get(module_name)
@@ -117,6 +158,64 @@ def _exc_view_created_response(exc, request, response):
     return False
 
 
+def is_read_only(request, obj):
+    """Return whether publishing ``obj`` must not change the database.
+
+    This is the case for GET and HEAD requests of objects providing
+    IReadOnlyPublished and of objects below a configured read-only path.
+    """
+    if request.get('REQUEST_METHOD', 'GET') not in _SAFE_METHODS:
+        return False
+    # Methods are checked by the object they are bound to.
+    context = getattr(obj, '__self__', obj)
+    if (IReadOnlyPublished.providedBy(obj) or
+            IReadOnlyPublished.providedBy(context)):
+        return True
+    if _DEFAULT_READ_ONLY_PATHS:
+        path = _physical_path(context) or request.get('PATH_INFO', '')
+        for prefix in _DEFAULT_READ_ONLY_PATHS:
+            if (prefix == '/' or path == prefix or
+                    path.startswith(prefix + '/')):
+                return True
+    return False
+
+
+def _physical_path(obj):
+    getPhysicalPath = getattr(obj, 'getPhysicalPath', None)
+    if getPhysicalPath is None:
+        return None
+    return '/'.join(getPhysicalPath()) or '/'
+
+
+def _begin_read_only(request, app):
+    # The transaction is aborted instead of committed, changes of objects
+    # of the database connection are logged on their way.
+    transaction.doom()
+    jar = getattr(app, '_p_jar', None)
+    if jar is None:
+        return
+    register = jar.register
+    path = request.get('PATH_INFO', '')
+
+    def logging_register(obj):
+        LOG.warning(
+            'Discarding change of %s.%s (oid %s) in read-only request for %s',
+            obj.__class__.__module__, obj.__class__.__name__,
+            oid_repr(obj._p_oid), path)
+        register(obj)
+
+    jar.register = logging_register
+    request._read_only_jar = jar
+
+
+def _end_read_only(request):
+    jar = getattr(request, '_read_only_jar', None)
+    if jar is not None:
+        # Connections are shared, do not leave the logging behind.
+        del jar.register
+        request._read_only_jar = None
+
+
 @contextmanager
 def transaction_pubevents(request, response, tm=transaction.manager):
     try:
@@ -128,10 +227,15 @@ def transaction_pubevents(request, response, tm=transaction.manager):
         yield
 
         notify(pubevents.PubBeforeCommit(request))
+        timer = getattr(request, '_timer', None)
+        if timer is not None:
+            timer.start()
         if tm.isDoomed():
             tm.abort()
         else:
             tm.commit()
+        if timer is not None:
+            timer.stop('commit')
         notify(pubevents.PubSuccess(request))
     except Exception as exc:
         # Normalize HTTP exceptions
@@ -173,14 +277,23 @@ def transaction_pubevents(request, response, tm=transaction.manager):
             # Avoid traceback / exception reference cycle.
             del exc, exc_info
     finally:
+        _end_read_only(request)
         endInteraction()
 
 
 def publish(request, module_info):
     obj, realm, debug_mode = module_info
-
-    request.processInputs()
+    timer = getattr(request, '_timer', None)
+    if timer is not None:
+        timer.start()
+
+    if _DEFAULT_LAZY_INPUTS:
+        request.processInputsLazily()
+    else:
+        request.processInputs()
     response = request.response
+    if timer is not None:
+        timer.stop('inputs')
 
     if debug_mode:
         response.debug_mode = debug_mode
@@ -196,8 +309,13 @@ def publish(request, module_info):
     request['PARENTS'] = [obj]
 
     obj = request.traverse(path, validated_hook=validate_user)
+    if timer is not None:
+        timer.stop('traverse')
+        timer.traversed(request)
     notify(pubevents.PubAfterTraversal(request))
     recordMetaData(obj, request)
+    if is_read_only(request, obj):
+        _begin_read_only(request, module_info[0])
 
     result = mapply(obj,
                     request.args,
@@ -210,6 +328,8 @@ def publish(request, module_info):
                     bind=1)
     if result is not response:
         response.setBody(result)
+    if timer is not None:
+        timer.stop('call')
 
     return response
 
@@ -230,13 +350,241 @@ def load_app(module_info):
         app._p_jar.close()
 
 
+def _publish_response(environ, stdout, stderr, _publish, _response,
+                      _response_factory, _request, _request_factory,
+                      module_info, timer=None):
+    response = (_response if _response is not None else
+                _response_factory(stdout=stdout, stderr=stderr))
+    response._http_version = environ['SERVER_PROTOCOL'].split('/')[1]
+    response._server_version = environ.get('SERVER_SOFTWARE')
+
+    new_request = (_request if _request is not None else
+                   _request_factory(environ['wsgi.input'], environ, response))
+    if timer is not None:
+        new_request._timer = timer
+
+    for i in range(getattr(new_request, 'retry_max_count', 3) + 1):
+        request = new_request
+        setRequest(request)
+        try:
+            with load_app(module_info) as new_mod_info, \
+                    pagecache.recording(environ, request, new_mod_info[0]):
+                with transaction_pubevents(request, response):
+                    response = _publish(request, new_mod_info)
+            break
+        except (ConflictError, TransientError) as exc:
+            # Data already handed to the client cannot be taken back.
+            retry = request.supports_retry() and not getattr(
+                stdout, 'started', False)
+            conflicts.stats.record(
+                conflicts.published_prefix(request), exc, retry)
+            if retry:
+                conflicts.policy.wait(request.retry_count)
+                new_request = request.retry()
+                response = new_request.response
+                if timer is not None:
+                    new_request._timer = timer
+            else:
+                raise
+        finally:
+            request.close()
+            clearRequest()
+
+    return response
+
+
+class _ResponseStream(object):
+    """Output of a response published in a separate thread.
+
+    The publishing thread uses it as ``response.stdout``, data passed to
+    ``response.write`` is put on a bounded queue and the WSGI server
+    consumes it by iterating over the stream. A slow client thus blocks
+    the publisher instead of the response piling up in memory.
+    """
+
+    def __init__(self, maxsize=_STREAM_QUEUE_SIZE):
+        self._queue = Queue(maxsize)
+        self.started = False
+        self.closed = False
+
+    def start(self, response):
+        # Called by ``response.write`` before the first chunk.
+        self.started = True
+        self._queue.put((_STREAM_START, response.finalize()))
+
+    def write(self, data):
+        if self.closed:
+            raise IOError('The client closed the connection.')
+        if data:
+            self._queue.put((_STREAM_DATA, data))
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        # Nothing is buffered, streamed data has been consumed already.
+        return b''
+
+    def finish(self, response):
+        self._queue.put((_STREAM_DONE, response))
+
+    def fail(self, exc_info):
+        self._queue.put((_STREAM_ERROR, exc_info))
+
+    def get(self):
+        kind, value = self._queue.get()
+        if kind == _STREAM_ERROR:
+            try:
+                reraise(*value)
+            finally:
+                del value
+        return kind, value
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        kind, value = self.get()
+        if kind == _STREAM_DATA:
+            return value
+        raise StopIteration
+
+    next = __next__  # Python 2
+
+    def close(self):
+        # Called by the WSGI server when it is done with the response,
+        # unblock the publishing thread if it is still writing.
+        self.closed = True
+        try:
+            while True:
+                self._queue.get_nowait()
+        except Empty:
+            pass
+
+
+def _publish_streaming(stream, environ, *args):
+    # Runs in its own thread.
+    timer = args[-1]
+    published = False
+    try:
+        with closing(BytesIO()) as stderr:
+            response = _publish_response(environ, stream, stderr, *args)
+            if stream.started:
+                if timer is not None:
+                    timer.start()
+                body = response.body
+                if isinstance(body, bytes):
+                    body = [body]
+                encoder = getattr(response, '_encoder', None)
+                if (encoder is not None and
+                        not isinstance(body, compression.GzipIterator)):
+                    # Compress the rest of what was passed to write().
+                    body = compression.GzipIterator(body, encoder)
+                for chunk in body:
+                    stream.write(chunk)
+                for func in response.after_list:
+                    func()
+                if timer is not None:
+                    timer.stop('finalize')
+                    timer.record()
+            # Otherwise the response is finalized and the timings are
+            # recorded by _stream_module.
+            published = True
+            stream.finish(response)
+    except BaseException:
+        if timer is not None and not published:
+            timer.record(outcome=timing.ERROR)
+        # Always hand the error over, the WSGI server waits for it.
+        stream.fail(sys.exc_info())
+        if not isinstance(sys.exc_info()[1], Exception):
+            # Let SystemExit, GreenletExit and the like end the thread.
+            raise
+
+
+def _stream_module(environ, start_response, *args):
+    stream = _ResponseStream()
+    thread = Thread(target=_publish_streaming,
+                    args=(stream, environ) + args,
+                    name='publish %s' % environ.get('PATH_INFO'))
+    thread.daemon = True
+    thread.start()
+
+    # Exceptions raised before anything was written propagate as usual.
+    kind, value = stream.get()
+    if kind == _STREAM_START:
+        status, headers = value
+        start_response(status, headers)
+        return stream
+
+    # Nothing was written, the response is complete.
+    response = value
+    timer = args[-1]
+    with timing.recording(timer):
+        if timer is not None:
+            timer.start()
+        status, headers = response.finalize()
+        start_response(status, headers)
+        for func in response.after_list:
+            func()
+        if timer is not None:
+            timer.stop('finalize')
+    result = _response_body(response, environ)
+    _store_page(environ, status, headers, result)
+    return result
+
+
+def _store_page(environ, status, headers, result):
+    # Add a response to the page cache, if it was looked up there.
+    render = environ.get(pagecache.ENVIRON_KEY)
+    if render is None or pagecache.cache is None:
+        return
+    if (isinstance(result, tuple) and
+            all(isinstance(chunk, bytes) for chunk in result)):
+        pagecache.cache.store(
+            render, environ, status, headers, b''.join(result))
+
+
+def _file_wrapper(body, environ):
+    # Let the WSGI server send files backed by a file descriptor,
+    # e.g. with os.sendfile, instead of reading them in Python.
+    file_wrapper = environ.get('wsgi.file_wrapper')
+    if file_wrapper is None or not _DEFAULT_FILE_WRAPPER:
+        return None
+    try:
+        body.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        # io.UnsupportedOperation is both an OSError and a ValueError.
+        return None
+    blksize = getattr(body, 'streamsize', Iterators.default_streamsize)
+    return file_wrapper(body, blksize)
+
+
+def _response_body(response, environ=None):
+    if (isinstance(response.body, _FILE_TYPES) or
+            IUnboundStreamIterator.providedBy(response.body)):
+        if environ is not None:
+            wrapped = _file_wrapper(response.body, environ)
+            if wrapped is not None:
+                return wrapped
+        return response.body
+    # If somebody used response.write, that data will be in the
+    # response.stdout BytesIO, so we put that before the body.
+    encoder = getattr(response, '_encoder', None)
+    if encoder is not None:
+        # The written data is compressed, the body has to follow suit.
+        return (response.stdout.getvalue(), encoder.compress(response.body),
+                encoder.flush())
+    return (response.stdout.getvalue(), response.body)
+
+
 def publish_module(environ, start_response,
                    _publish=publish,  # only for testing
                    _response=None,
                    _response_factory=WSGIResponse,
                    _request=None,
                    _request_factory=WSGIRequest,
-                   _module_name='Zope2'):
+                   _module_name='Zope2',
+                   _streaming=None):
     module_info = get_module_info(_module_name)
     result = ()
 
@@ -251,48 +599,41 @@ def publish_module(environ, start_response,
         path_info = path_info.decode('utf-8')
 
         environ['PATH_INFO'] = path_info
-    with closing(BytesIO()) as stdout, closing(BytesIO()) as stderr:
-        response = (_response if _response is not None else
-                    _response_factory(stdout=stdout, stderr=stderr))
-        response._http_version = environ['SERVER_PROTOCOL'].split('/')[1]
-        response._server_version = environ.get('SERVER_SOFTWARE')
-
-        request = (_request if _request is not None else
-                   _request_factory(environ['wsgi.input'], environ, response))
 
-        for i in range(getattr(request, 'retry_max_count', 3) + 1):
-            setRequest(request)
-            try:
-                with load_app(module_info) as new_mod_info:
-                    with transaction_pubevents(request, response):
-                        response = _publish(request, new_mod_info)
-                break
-            except (ConflictError, TransientError) as exc:
-                if request.supports_retry():
-                    new_request = request.retry()
-                    request.close()
-                    request = new_request
-                    response = new_request.response
-                else:
-                    raise
-            finally:
-                request.close()
-                clearRequest()
+    page_cache = pagecache.cache
+    if page_cache is not None and _response is None:
+        db = getattr(module_info[0], '_db', None)
+        entry, render = page_cache.lookup(environ, db)
+        if entry is not None:
+            return page_cache.serve(entry, start_response)
+        if render is not None:
+            environ[pagecache.ENVIRON_KEY] = render
+
+    if _streaming is None:
+        _streaming = _DEFAULT_STREAMING
+    timer = timing.request_timer()
+    args = (_publish, _response, _response_factory, _request,
+            _request_factory, module_info, timer)
+    if _streaming and _response is None:
+        return _stream_module(environ, start_response, *args)
+
+    with closing(BytesIO()) as stdout, closing(BytesIO()) as stderr, \
+            timing.recording(timer):
+        response = _publish_response(environ, stdout, stderr, *args)
+        if timer is not None:
+            timer.start()
 
         # Start the WSGI server response
         status, headers = response.finalize()
         start_response(status, headers)
 
-        if (isinstance(response.body, _FILE_TYPES) or
-                IUnboundStreamIterator.providedBy(response.body)):
-            result = response.body
-        else:
-            # If somebody used response.write, that data will be in the
-            # response.stdout BytesIO, so we put that before the body.
-            result = (response.stdout.getvalue(), response.body)
+        result = _response_body(response, environ)
+        _store_page(environ, status, headers, result)
 
         for func in response.after_list:
             func()
+        if timer is not None:
+            timer.stop('finalize')
 
     # Return the result body iterable.
     return result
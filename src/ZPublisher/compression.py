@@ -0,0 +1,134 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""gzip content encoding of responses.
+
+Responses which called ``enableHTTPCompression`` are compressed with a
+``GzipEncoder``, complete bodies at once and streamed bodies chunk by
+chunk as they are sent.
+"""
+
+from functools import partial
+import struct
+import zlib
+
+from zope.interface import implementer
+
+from ZPublisher.Iterators import IUnboundStreamIterator
+
+# Files are read in blocks of this size.
+BLOCK_SIZE = 1 << 16
+
+_gzip_header = (b"\037\213"  # magic
+                b"\010"  # compression method
+                b"\000"  # flags
+                b"\000\000\000\000"  # time
+                b"\002"
+                b"\377")
+
+# The ZConfig machinery may set these attributes on initialization.
+
+# The zlib compression level, from 1 (fastest) to 9 (smallest).
+level = 6
+
+# Bodies of a known size smaller than this are not compressed.
+min_size = 0
+
+# If set, only these MIME types are compressed. Entries are either full
+# types like 'application/json' or major types like 'text/*'.
+mime_types = None
+
+
+def is_compressible(content_type, uncompressable_major_types=()):
+    """Return whether a body of ``content_type`` may be compressed.
+
+    Without a ``mime_types`` allowlist all types but those with a major
+    type in ``uncompressable_major_types`` are compressed.
+    """
+    mime_type = (content_type or '').split(';')[0].strip().lower()
+    major = mime_type.split('/')[0]
+    if mime_types is not None:
+        return mime_type in mime_types or major + '/*' in mime_types
+    return major not in uncompressable_major_types
+
+
+class GzipEncoder(object):
+    """Compress data in the gzip format incrementally."""
+
+    def __init__(self, compresslevel=None):
+        if compresslevel is None:
+            compresslevel = level
+        self._compressor = zlib.compressobj(
+            compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS,
+            zlib.DEF_MEM_LEVEL, 0)
+        self._crc = 0
+        self._size = 0
+        self._header = _gzip_header
+
+    def compress(self, data):
+        """Return the next part of the compressed data, maybe empty."""
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        result = self._compressor.compress(data)
+        if result and self._header:
+            result = self._header + result
+            self._header = b''
+        return result
+
+    def flush(self):
+        """Return the rest of the compressed data."""
+        result = self._header + self._compressor.flush() + struct.pack(
+            "<LL", self._crc & 0xffffffff, self._size & 0xffffffff)
+        self._header = b''
+        return result
+
+
+@implementer(IUnboundStreamIterator)
+class GzipIterator(object):
+    """Iterate over the compressed chunks of the iterable ``body``.
+
+    ``close`` is passed on to the body, so files and stream iterators
+    are closed by the WSGI server as usual.
+    """
+
+    def __init__(self, body, encoder):
+        self._body = body
+        if IUnboundStreamIterator.providedBy(body):
+            self._chunks = body
+        elif hasattr(body, 'read'):
+            self._chunks = iter(partial(body.read, BLOCK_SIZE), b'')
+        else:
+            self._chunks = iter(body)
+        self._encoder = encoder
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self._encoder is not None:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                result = self._encoder.flush()
+                self._encoder = None
+                return result
+            chunk = self._encoder.compress(chunk)
+            if chunk:
+                return chunk
+        raise StopIteration
+
+    next = __next__  # Python 2
+
+    def close(self):
+        close = getattr(self._body, 'close', None)
+        if close is not None:
+            close()
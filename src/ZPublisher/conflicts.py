@@ -0,0 +1,164 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Retrying requests after conflicts.
+
+The publisher asks ``policy`` whether and when a request which failed with
+a ConflictError or another transient error is retried, and counts the
+conflicts in ``stats``, by the prefix of the physical path of the
+published object like ``timing``. The ZConfig machinery replaces
+``policy`` if a ``<conflict-retry>`` section is configured.
+"""
+
+from collections import deque
+import random
+import time
+
+from six.moves._thread import allocate_lock
+from ZPublisher import timing
+
+# Paths and classes beyond this number are counted as OTHER.
+MAX_KEYS = 100
+OTHER = '(other)'
+UNKNOWN = '(unknown)'
+# The path of conflicts before traversal finished.
+TRAVERSAL = '(traversal)'
+
+
+def published_prefix(request):
+    """Return the path conflicts publishing ``request`` are counted by.
+
+    This is the prefix of the physical path of the published object, or
+    TRAVERSAL if the conflict happened before traversal finished.
+    """
+    if request.get('PUBLISHED') is None:
+        return TRAVERSAL
+    return timing.path_prefix(timing.published_path(request))
+
+
+class RetryPolicy(object):
+    """Exponential backoff with optional jitter and a retry budget.
+
+    The n-th retry waits ``base_delay * factor ** n`` seconds, at most
+    ``max_delay``. With ``jitter`` the actual delay is chosen at random
+    between 0 and that value, so requests which conflicted with each
+    other do not collide again. A ``budget`` larger than 0 limits the
+    number of retries of this process within ``budget_period`` seconds.
+    """
+
+    def __init__(self, base_delay=1.0, factor=2.0, max_delay=10.0,
+                 jitter=True, budget=0, budget_period=60.0,
+                 clock=time.time, sleep=time.sleep):
+        self.base_delay = base_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.budget = budget
+        self.budget_period = budget_period
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = allocate_lock()
+        self._retries = deque()
+
+    def _expire(self, now):
+        retries = self._retries
+        while retries and retries[0] <= now - self.budget_period:
+            retries.popleft()
+
+    def allows(self, retry_count):
+        """Return whether the budget allows another retry."""
+        if self.budget <= 0:
+            return True
+        with self._lock:
+            self._expire(self.clock())
+            return len(self._retries) < self.budget
+
+    def delay(self, retry_count):
+        """Return the seconds to wait before retry number ``retry_count``."""
+        delay = min(self.base_delay * self.factor ** retry_count,
+                    self.max_delay)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def wait(self, retry_count):
+        """Take a retry from the budget and wait before it starts."""
+        if self.budget > 0:
+            with self._lock:
+                self._retries.append(self.clock())
+        delay = self.delay(retry_count)
+        if delay > 0:
+            self.sleep(delay)
+
+
+class ConflictStats(object):
+    """Counts conflicts by path and by the class of the conflicting object.
+    """
+
+    def __init__(self, max_keys=MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = allocate_lock()
+        self.reset()
+
+    def reset(self):
+        self.conflicts = 0
+        self.retries = 0
+        self.paths = {}
+        self.classes = {}
+
+    def _count(self, counts, key):
+        if key not in counts and len(counts) >= self.max_keys:
+            key = OTHER
+        counts[key] = counts.get(key, 0) + 1
+
+    def record(self, path, exc, retried):
+        """Count the conflict ``exc`` which happened publishing ``path``."""
+        get_class_name = getattr(exc, 'get_class_name', None)
+        class_name = get_class_name() if get_class_name is not None else None
+        with self._lock:
+            self.conflicts += 1
+            if retried:
+                self.retries += 1
+            self._count(self.paths, path or '/')
+            self._count(self.classes, class_name or UNKNOWN)
+
+    def top(self, counts, limit=20):
+        """Return the ``limit`` largest (key, count) pairs of ``counts``."""
+        with self._lock:
+            items = list(counts.items())
+        items.sort(key=lambda item: (-item[1], item[0]))
+        return items[:limit]
+
+    def render(self):
+        """Render the counters in the Prometheus text format."""
+        with self._lock:
+            lines = [
+                '# HELP zope_conflicts_total Conflicts while publishing.',
+                '# TYPE zope_conflicts_total counter',
+                'zope_conflicts_total %d' % self.conflicts,
+                '# HELP zope_conflict_retries_total Retried requests.',
+                '# TYPE zope_conflict_retries_total counter',
+                'zope_conflict_retries_total %d' % self.retries,
+            ]
+            for name, label, counts in (
+                    ('zope_conflicts_by_path_total', 'path', self.paths),
+                    ('zope_conflicts_by_class_total', 'class', self.classes)):
+                lines.append('# TYPE %s counter' % name)
+                for key in sorted(counts):
+                    quoted = key.replace('\\', '\\\\').replace('"', '\\"')
+                    lines.append('%s{%s="%s"} %d' % (
+                        name, label, quoted, counts[key]))
+        return '\n'.join(lines) + '\n'
+
+
+policy = RetryPolicy()
+stats = ConflictStats()
@@ -68,6 +68,15 @@ class IPubBeforeStreaming(Interface):
     response = Attribute(u"The current HTTP response")
 
 
+class IReadOnlyPublished(Interface):
+    """Marker for objects which never change the database when published.
+
+    GET and HEAD requests for objects providing this interface are
+    published in a doomed transaction. Changes are logged and discarded
+    instead of being committed.
+    """
+
+
 class UseTraversalDefault(Exception):
     """Indicate default traversal in ``__bobo_traverse__``
 
@@ -0,0 +1,252 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Incremental parser for multipart/form-data request bodies.
+
+The body is read in large blocks and scanned for the boundary instead of
+line by line. The content of each part is written straight into its final
+file object, which is kept in memory up to a configurable size and spooled
+to a temporary file beyond it.
+"""
+
+from email.message import Message
+from email.parser import HeaderParser
+from email.utils import collapse_rfc2231_value
+from io import BytesIO
+from tempfile import TemporaryFile
+
+from six import PY2
+from six.moves.urllib.parse import parse_qsl
+
+# Size of the blocks read from the request body.
+BLOCK_SIZE = 1 << 16
+
+# Parts larger than this are spooled to a temporary file.
+# The ZConfig machinery may set this attribute on initialization.
+memory_limit = 1 << 16
+
+
+def _header_params(value, param):
+    msg = Message()
+    msg['content-type'] = value
+    return msg.get_param(param)
+
+
+def get_boundary(content_type):
+    """Return the boundary of a multipart/form-data content type.
+
+    Returns None if *content_type* is no multipart/form-data type or has no
+    usable boundary.
+    """
+    if not content_type.lower().startswith('multipart/form-data'):
+        return None
+    boundary = _header_params(content_type, 'boundary')
+    if not boundary or len(boundary) > 200:
+        return None
+    if isinstance(boundary, tuple):
+        return None
+    return boundary.encode('latin-1')
+
+
+class QueryField(object):
+    """A field passed in the query string of a multipart request."""
+
+    file = None
+    filename = None
+    headers = {}
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+
+class FormPart(object):
+    """A part of a multipart/form-data body."""
+
+    name = None
+    filename = None
+
+    def __init__(self, headers, charset):
+        self.headers = headers
+        self.charset = charset
+        self.file = BytesIO()
+        self.size = 0
+
+        name = headers.get_param('name', header='content-disposition')
+        if name is not None:
+            self.name = collapse_rfc2231_value(name)
+        filename = headers.get_param('filename', header='content-disposition')
+        if filename is not None:
+            self.filename = collapse_rfc2231_value(filename)
+
+    def write(self, data, limit):
+        if not data:
+            return
+        self.size += len(data)
+        if self.size > limit and isinstance(self.file, BytesIO):
+            spooled = TemporaryFile('w+b')
+            spooled.write(self.file.getvalue())
+            self.file = spooled
+        self.file.write(data)
+
+    def finish(self):
+        self.file.seek(0)
+
+    @property
+    def value(self):
+        self.file.seek(0)
+        value = self.file.read()
+        self.file.seek(0)
+        if self.filename is None and not PY2:
+            value = value.decode(self.charset, 'replace')
+        return value
+
+
+class MultipartInput(object):
+    """The fields of a multipart/form-data request.
+
+    ``list`` holds the fields in the same way ``cgi.FieldStorage`` does,
+    with the fields of the query string first.
+    """
+
+    headers = {}
+    file = None
+    value = None
+
+    def __init__(self, fp, environ, boundary, charset='utf-8',
+                 limit=None, block_size=None):
+        self.charset = charset
+        self.limit = memory_limit if limit is None else limit
+        self.block_size = BLOCK_SIZE if block_size is None else block_size
+
+        length = environ.get('CONTENT_LENGTH')
+        try:
+            self._remaining = int(length) if length else None
+        except ValueError:
+            self._remaining = None
+
+        self.list = []
+        qs = environ.get('QUERY_STRING')
+        if qs:
+            kw = {} if PY2 else {'encoding': charset}
+            for name, value in parse_qsl(qs, True, **kw):
+                self.list.append(QueryField(name, value))
+
+        self._fp = fp
+        self._parse(boundary)
+        self._fp = None
+
+    def _read(self):
+        size = self.block_size
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+            if size <= 0:
+                return b''
+        data = self._fp.read(size)
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        return data
+
+    def _headers(self, block):
+        if not PY2:
+            block = block.decode(self.charset, 'replace')
+        return HeaderParser().parsestr(block)
+
+    def _parse(self, boundary):
+        # Each delimiter starts on a new line. Pretend there is a line
+        # break before the body so the first boundary is found as well.
+        delimiter = b'\n--' + boundary
+        dlen = len(delimiter)
+        limit = self.limit
+        buf = b'\n'
+        pos = 0  # where to look for the next delimiter
+        part = None  # None while in the preamble
+        eof = False
+
+        while True:
+            i = buf.find(delimiter, pos)
+            if i < 0:
+                if eof:
+                    break
+                # Keep what might be the start of a delimiter.
+                keep = max(len(buf) - dlen - 1, 0)
+                if part is not None:
+                    part.write(buf[:keep], limit)
+                buf = buf[keep:]
+                pos = 0
+                data = self._read()
+                eof = not data
+                buf += data
+                continue
+
+            # Inspect the rest of the delimiter line.
+            end = buf.find(b'\n', i + dlen)
+            tail = buf[i + dlen:i + dlen + 2]
+            if tail != b'--' and end < 0:
+                if not eof:
+                    data = self._read()
+                    eof = not data
+                    buf += data
+                    continue
+                # A delimiter at the very end of the body.
+                tail = b'--'
+            if tail != b'--' and buf[i + dlen:end].strip():
+                # Just data looking like the delimiter.
+                pos = i + 1
+                continue
+
+            if part is not None:
+                data = buf[:i]
+                if data[-1:] == b'\r':
+                    data = data[:-1]
+                part.write(data, limit)
+                part.finish()
+                self.list.append(part)
+                part = None
+
+            if tail == b'--':
+                # The closing delimiter, ignore the epilogue.
+                return
+
+            buf = buf[end + 1:]
+            pos = 0
+
+            # Read the headers of the next part.
+            while True:
+                if buf[:1] == b'\n' or buf[:2] == b'\r\n':
+                    block, end = b'', buf.find(b'\n')
+                    break
+                end = buf.find(b'\n\n')
+                crlf = buf.find(b'\n\r\n')
+                if crlf >= 0 and (end < 0 or crlf < end):
+                    end = crlf + 1
+                if end >= 0:
+                    block, end = buf[:end], end + 1
+                    break
+                if eof:
+                    return
+                data = self._read()
+                eof = not data
+                buf += data
+            buf = buf[end + 1:]
+            part = FormPart(self._headers(block), self.charset)
+
+        if part is not None:
+            # The body ended without a closing delimiter.
+            data = buf
+            if data[-1:] == b'\n':
+                data = data[:-1]
+                if data[-1:] == b'\r':
+                    data = data[:-1]
+            part.write(data, limit)
+            part.finish()
+            self.list.append(part)
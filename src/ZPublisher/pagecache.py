@@ -0,0 +1,359 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""An in-process cache of complete responses to anonymous GET requests.
+
+Cached responses are served by the publisher without opening a database
+connection. While a cacheable response is rendered, all objects loaded
+from the database or used from the object cache of its connection are
+recorded, so the response is discarded as soon as a transaction changes
+one of them. Requests whose response turned out not to be cacheable are
+remembered for a while and not recorded again. The ``page-cache-size``
+option enables the cache.
+
+Only data read from the database is tracked. Responses depending on
+anything else, like the time or the client address, are cached until
+they are older than ``page-cache-max-age``.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import time
+import weakref
+
+from persistent import Persistent
+from six.moves._thread import allocate_lock
+
+# The environ key under which a cache miss is passed to the publisher.
+ENVIRON_KEY = 'zope.page_cache'
+
+# Responses must not be larger than this fraction of the cache size.
+MAX_ENTRY_FRACTION = 4
+
+# The number of requests remembered to have uncacheable responses.
+UNCACHEABLE_SIZE = 1000
+
+# The oid of the marker put into the object cache while recording, no
+# database comes anywhere near it.
+_MARKER_OID = b'\xff' * 8
+
+# The length of the part of the cache keys taken from the URL.
+_BASE_KEY_LENGTH = 6
+
+# Responses which must not be stored by shared caches are not cached.
+_UNCACHEABLE_DIRECTIVES = ('private', 'no-store', 'no-cache')
+
+# The ZConfig machinery may set this attribute on initialization.
+cache = None
+
+
+class Render(object):
+    """A cacheable request, on its way through the publisher."""
+
+    def __init__(self, key):
+        self.key = key
+        self.oids = set()
+        self.invalidated = set()
+        self.stale = False
+        self.anonymous = False
+
+    def record(self, setstate):
+        """Return a version of ``setstate`` which records the loads."""
+        oids = self.oids
+
+        def recording_setstate(obj):
+            oids.add(obj._p_oid)
+            return setstate(obj)
+        return recording_setstate
+
+
+class Entry(object):
+
+    def __init__(self, status, headers, body, oids, created):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.oids = oids
+        self.created = created
+        self.size = len(body) + sum(
+            len(name) + len(value) for name, value in headers)
+
+
+def _header(headers, name):
+    name = name.lower()
+    values = [value for key, value in headers if key.lower() == name]
+    return ', '.join(values) if values else None
+
+
+def _vary_names(headers):
+    vary = _header(headers, 'Vary')
+    if not vary:
+        return ()
+    return tuple(sorted(set(
+        name.strip().lower() for name in vary.split(',') if name.strip())))
+
+
+def _vary_values(environ, names):
+    return tuple(environ.get('HTTP_' + name.upper().replace('-', '_'), '')
+                 for name in names)
+
+
+class PageCache(object):
+    """Complete responses in a LRU cache bounded by size in bytes."""
+
+    def __init__(self, size, max_age=300.0, clock=time.time):
+        self.size = size
+        self.max_age = max_age
+        self.clock = clock
+        self._lock = allocate_lock()
+        self._db = None
+        self._instance = None
+        self._renders = weakref.WeakSet()
+        self.reset()
+        self.clear()
+
+    def reset(self):
+        """Reset the counters."""
+        self.hits = self.misses = self.stores = self.invalidations = 0
+
+    def clear(self):
+        self._entries = OrderedDict()
+        # The names of the headers the responses vary on, and the number
+        # of cached variants, by the key of the request without them.
+        self._vary = {}
+        self._variants = {}
+        self._by_oid = {}
+        # The time an uncacheable response was rendered by request key.
+        self._uncacheable = OrderedDict()
+        self.used = 0
+
+    def key(self, environ):
+        """Return the cache key of a request or None if not cacheable."""
+        method = environ.get('REQUEST_METHOD', 'GET')
+        if method not in ('GET', 'HEAD'):
+            return None
+        if 'HTTP_AUTHORIZATION' in environ or 'HTTP_COOKIE' in environ:
+            # These could identify a user.
+            return None
+        host = environ.get('HTTP_HOST') or '%s:%s' % (
+            environ.get('SERVER_NAME'), environ.get('SERVER_PORT'))
+        return (method, environ.get('wsgi.url_scheme', 'http'), host,
+                environ.get('SCRIPT_NAME', ''), environ.get('PATH_INFO', ''),
+                environ.get('QUERY_STRING', ''))
+
+    def _bind(self, db):
+        # Receive the invalidations of all transactions committed to db.
+        # The MVCC storage adapter of a ZODB is not part of its API, but
+        # it hands out the storage instances each connection polls, too.
+        if self._instance is not None:
+            self._instance.release()
+        self.clear()
+        self._db = db
+        self._instance = db._mvcc_storage.new_instance()
+        self._instance.poll_invalidations()
+
+    def _poll(self):
+        oids = self._instance.poll_invalidations()
+        if oids is None:
+            # Too many invalidations, everything may have changed.
+            self.invalidations += len(self._entries)
+            self.clear()
+            for render in self._renders:
+                render.stale = True
+            return
+        if not oids:
+            return
+        for render in self._renders:
+            render.invalidated.update(oids)
+        for oid in oids:
+            for key in self._by_oid.pop(oid, ()):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.used -= entry.size
+        base_key = key[:_BASE_KEY_LENGTH]
+        self._variants[base_key] -= 1
+        if not self._variants[base_key]:
+            del self._variants[base_key]
+            del self._vary[base_key]
+        for oid in entry.oids:
+            keys = self._by_oid.get(oid)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_oid[oid]
+
+    def lookup(self, environ, db):
+        """Return a cached entry for a request or a Render for a miss.
+
+        Returns (None, None) if the request is not cacheable.
+        """
+        base_key = self.key(environ)
+        if base_key is None or db is None:
+            return None, None
+        with self._lock:
+            if db is not self._db:
+                self._bind(db)
+            self._poll()
+            rendered = self._uncacheable.get(base_key)
+            if rendered is not None:
+                if self.clock() - rendered < self.max_age:
+                    return None, None
+                del self._uncacheable[base_key]
+            names = self._vary.get(base_key, ())
+            key = base_key + _vary_values(environ, names)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self.clock() - entry.created < self.max_age:
+                    # Mark as recently used.
+                    self._entries[key] = self._entries.pop(key)
+                    self.hits += 1
+                    return entry, None
+                self._remove(key)
+            self.misses += 1
+            render = Render(base_key)
+            self._renders.add(render)
+        return None, render
+
+    def _cacheable(self, render, status, headers):
+        # Return the names of the headers a response varies on or None
+        # if the response must not be cached.
+        if not (render.anonymous and status.startswith('200 ')):
+            return None
+        if _header(headers, 'Set-Cookie') is not None:
+            return None
+        cache_control = (_header(headers, 'Cache-Control') or '').lower()
+        if any(directive in cache_control
+               for directive in _UNCACHEABLE_DIRECTIVES):
+            return None
+        names = _vary_names(headers)
+        if '*' in names:
+            return None
+        return names
+
+    def _skip(self, render):
+        # Do not record the request of render for a while.
+        with self._lock:
+            self._renders.discard(render)
+            uncacheable = self._uncacheable
+            uncacheable.pop(render.key, None)
+            uncacheable[render.key] = self.clock()
+            while len(uncacheable) > UNCACHEABLE_SIZE:
+                uncacheable.popitem(last=False)
+
+    def store(self, render, environ, status, headers, body):
+        """Store the response rendered for ``render`` if cacheable."""
+        names = self._cacheable(render, status, headers)
+        if names is None:
+            self._skip(render)
+            return False
+        entry = Entry(status, list(headers), body, frozenset(render.oids),
+                      self.clock())
+        if entry.size > self.size // MAX_ENTRY_FRACTION:
+            self._skip(render)
+            return False
+        with self._lock:
+            self._poll()
+            self._renders.discard(render)
+            if render.stale or render.invalidated & entry.oids:
+                # Changed while the response was rendered.
+                return False
+            if self._vary.get(render.key, names) != names:
+                # The headers differ between variants, start over.
+                for key in list(self._entries):
+                    if key[:_BASE_KEY_LENGTH] == render.key:
+                        self._remove(key)
+            key = render.key + _vary_values(environ, names)
+            if key in self._entries:
+                self._remove(key)
+            self._vary[render.key] = names
+            self._variants[render.key] = self._variants.get(render.key, 0) + 1
+            self._entries[key] = entry
+            self.used += entry.size
+            for oid in entry.oids:
+                self._by_oid.setdefault(oid, set()).add(key)
+            while self.used > self.size:
+                # Evict the least recently used entries.
+                self._remove(next(iter(self._entries)))
+            self.stores += 1
+        return True
+
+    def serve(self, entry, start_response):
+        headers = [(name, value) for name, value in entry.headers
+                   if name.lower() != 'age']
+        headers.append(('Age', '%d' % max(self.clock() - entry.created, 0)))
+        start_response(entry.status, headers)
+        return (entry.body, )
+
+    def render(self):
+        """Render the counters in the Prometheus text format."""
+        with self._lock:
+            counters = (
+                ('zope_page_cache_hits_total', 'counter', self.hits),
+                ('zope_page_cache_misses_total', 'counter', self.misses),
+                ('zope_page_cache_stores_total', 'counter', self.stores),
+                ('zope_page_cache_invalidations_total', 'counter',
+                 self.invalidations),
+                ('zope_page_cache_entries', 'gauge', len(self._entries)),
+                ('zope_page_cache_bytes', 'gauge', self.used),
+            )
+        lines = []
+        for name, kind, value in counters:
+            lines.append('# TYPE %s %s' % (name, kind))
+            lines.append('%s %d' % (name, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _used_since(cache, marker):
+    # Return the oids of the objects used since marker was added to the
+    # object cache. Using an object moves it to the most recently used
+    # end of the cache, behind the marker which nothing uses.
+    items = cache.lru_items()
+    for i, (oid, ob) in enumerate(items):
+        if ob is marker:
+            return [oid for oid, ob in items[i + 1:]]
+    return None
+
+
+@contextmanager
+def recording(environ, request, app):
+    """Record the objects used while publishing a cacheable request."""
+    render = environ.get(ENVIRON_KEY)
+    jar = getattr(app, '_p_jar', None)
+    if render is None or jar is None:
+        yield
+        return
+    # Objects already in the object cache are used without a load, they
+    # are found by their position in the cache.
+    marker = Persistent()
+    marker._p_oid = _MARKER_OID
+    marker._p_jar = jar
+    jar._cache[_MARKER_OID] = marker
+    jar.setstate = render.record(jar.setstate)
+    try:
+        yield
+        used = _used_since(jar._cache, marker)
+        if used is None:
+            # The cache was collected down to the marker, objects used
+            # before the collection are unknown.
+            render.stale = True
+        else:
+            render.oids.update(used)
+        user = request.other.get('AUTHENTICATED_USER')
+        if user is not None and user.getId() is None:
+            render.anonymous = True
+    finally:
+        del jar.setstate
+        del jar._cache[_MARKER_OID]
@@ -0,0 +1,66 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Compare HTTPRequest.processInputs with and without the field name cache.
+
+Run with ``python -m ZPublisher.tests.bench_processInputs``.
+"""
+
+from io import BytesIO
+import timeit
+
+from six.moves.urllib.parse import urlencode
+
+from ZPublisher import HTTPRequest
+from ZPublisher.HTTPResponse import HTTPResponse
+
+FIELDS = 500
+
+
+def make_body(fields=FIELDS):
+    items = []
+    for i in range(fields):
+        items.append(('row%d.count:int:record' % (i % 50), str(i)))
+        items.append(('tags%d:utf8:ustring:list' % (i % 20), 'tag%d' % i))
+    return urlencode(items[:fields]).encode('ascii')
+
+
+def process(body):
+    environ = {
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '8080',
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+    }
+    request = HTTPRequest.HTTPRequest(BytesIO(body), environ, HTTPResponse())
+    request.processInputs()
+    return request
+
+
+def main(number=200):
+    body = make_body()
+    size = HTTPRequest.field_descriptor_cache_size
+    try:
+        for label, cache_size in (('uncached', 0), ('cached', size)):
+            HTTPRequest.field_descriptor_cache_size = cache_size
+            HTTPRequest._field_descriptors.clear()
+            seconds = min(timeit.repeat(
+                lambda: process(body), number=number, repeat=3))
+            print('%-8s %8.3f ms per request' % (
+                label, seconds * 1000.0 / number))
+    finally:
+        HTTPRequest.field_descriptor_cache_size = size
+
+
+if __name__ == '__main__':
+    main()
@@ -648,6 +648,49 @@ class TestBaseRequestViews(TestRequestViewsBase):
         ob = r.traverse('folder/obj')
         self.assertEqual(ob(), 'view on obj')
 
+    def test_traverse_view_registered_later(self):
+        from zope.component import getGlobalSiteManager
+        from zope.interface import Interface
+        from zope.publisher.browser import IDefaultBrowserLayer
+        root = self._makeBasicObject()
+        root._setObject('obj', self._makeDummyObject('obj'))
+        r = self._makeOne(root)
+        self.assertRaises(NotFound, r.traverse, 'obj/later')
+        view = getGlobalSiteManager().adapters.lookup(
+            (self._dummyInterface(), IDefaultBrowserLayer), Interface, 'meth')
+        getGlobalSiteManager().registerAdapter(
+            view, (self._dummyInterface(), IDefaultBrowserLayer),
+            Interface, 'later')
+        r = self._makeOne(root)
+        self.assertEqual(r.traverse('obj/later')(), 'view on obj')
+
+    def test_traverse_view_interface_declared_later(self):
+        from zope.interface import classImplements
+        root = self._makeBasicObject()
+        obj = root._setObject('obj', self._makeBasicObject())
+        obj.name = 'obj'
+        r = self._makeOne(root)
+        self.assertRaises(NotFound, r.traverse, 'obj/meth')
+        classImplements(obj.__class__, self._dummyInterface())
+        r = self._makeOne(root)
+        self.assertEqual(r.traverse('obj/meth')(), 'view on obj')
+
+    def test_queryRequestAdapter_remembers_factories(self):
+        from zope.component import getGlobalSiteManager
+        from zope.interface import Interface
+        from zope.interface import providedBy
+        from ZPublisher.BaseRequest import queryRequestAdapter
+        root, folder = self._makeRootAndFolder()
+        r = self._makeOne(root)
+        self.assertEqual(queryRequestAdapter(folder, r, Interface, 'meth')(),
+                         'view on folder')
+        self.assertEqual(queryRequestAdapter(folder, r, Interface, 'x'),
+                         None)
+        cache = getGlobalSiteManager().adapters._v_publisher_adapters
+        required = (providedBy(folder), providedBy(r))
+        self.assertEqual(cache.factories[required + (Interface, 'x')], None)
+        self.assertEqual(len(cache.factories), 2)
+
     def test_traverse_view_attr_local(self):
         # method on object used first
         root, folder = self._makeRootAndFolder()
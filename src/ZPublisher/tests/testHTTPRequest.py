@@ -245,6 +245,64 @@ class HTTPRequestTests(unittest.TestCase, HTTPRequestFactoryMixin):
         self._noFormValuesInOther(req)
         self.assertEqual(req.form, {})
 
+    def test_processInputsLazily_defers_query_string(self):
+        env = {'SERVER_NAME': 'testingharnas', 'SERVER_PORT': '80',
+               'QUERY_STRING': 'foo=bar&num:int=1'}
+        req = self._makeOne(environ=env)
+        req.processInputsLazily()
+        self.assertTrue(req._inputs_pending)
+        self.assertEqual(req['num'], 1)
+        self.assertFalse(req._inputs_pending)
+        self.assertEqual(req.form, {'foo': 'bar', 'num': 1})
+
+    def test_processInputsLazily_taintedform(self):
+        env = {'SERVER_NAME': 'testingharnas', 'SERVER_PORT': '80',
+               'QUERY_STRING': 'foo=%3Cbar%3E'}
+        req = self._makeOne(environ=env)
+        req.processInputsLazily()
+        self.assertTrue(should_be_tainted(req.taintedform['foo']))
+        self.assertEqual(req.form, {'foo': '<bar>'})
+
+    def test_processInputsLazily_method_marker(self):
+        env = {'SERVER_NAME': 'testingharnas', 'SERVER_PORT': '80',
+               'PATH_INFO': '/folder', 'QUERY_STRING': 'edit:method=1'}
+        req = self._makeOne(environ=env)
+        req.processInputsLazily()
+        self.assertFalse(req._inputs_pending)
+        self.assertEqual(req.other['PATH_INFO'], '/folder/edit')
+
+    def test_processInputsLazily_encoded_method_marker(self):
+        for qs, path in (('edit:%6Dethod=1', '/folder/edit'),
+                         ('%3Adefault_method=view', '/folder/view'),
+                         (':%61ction=save', '/folder/save')):
+            env = {'SERVER_NAME': 'testingharnas', 'SERVER_PORT': '80',
+                   'PATH_INFO': '/folder', 'QUERY_STRING': qs}
+            req = self._makeOne(environ=env)
+            req.processInputsLazily()
+            self.assertFalse(req._inputs_pending, qs)
+            self.assertEqual(req.other['PATH_INFO'], path)
+
+    def test_processInputsLazily_no_method_marker(self):
+        from ZPublisher.HTTPRequest import has_method_marker
+        self.assertFalse(has_method_marker(''))
+        self.assertFalse(has_method_marker('method=1&action=x&a%20b=c'))
+        self.assertFalse(has_method_marker('b:int=1&c:list=%3Amethod'))
+
+    def test_processInputsLazily_post(self):
+        environ = self._makePostEnviron(body=TEST_FILE_DATA)
+        req = self._makeOne(stdin=BytesIO(TEST_FILE_DATA), environ=environ)
+        req.processInputsLazily()
+        self.assertFalse(req._inputs_pending)
+        self.assertIn('smallfile', req.form)
+
+    def test_processInputsLazily_close_skips_processing(self):
+        env = {'SERVER_NAME': 'testingharnas', 'SERVER_PORT': '80',
+               'QUERY_STRING': 'num:int=notanumber'}
+        req = self._makeOne(environ=env)
+        req.processInputsLazily()
+        req.close()
+        self.assertEqual(req.form, {})
+
     def test_processInputs_wo_marshalling(self):
         inputs = (
             ('foo', 'bar'), ('spam', 'eggs'),
@@ -732,6 +790,54 @@ class HTTPRequestTests(unittest.TestCase, HTTPRequestFactoryMixin):
         self._noTaintedValues(req)
         self._onlyTaintedformHoldsTaintedStrings(req)
 
+    def test_processInputs_w_cached_field_names(self):
+        # Field names are parsed once, the per-value effects of the
+        # markers apply to each request nevertheless.
+        from ZPublisher import HTTPRequest
+        HTTPRequest._field_descriptors.clear()
+        inputs = (('num:int:ignore_empty', '1'),
+                  ('seq:tuple', 'a'),
+                  ('rec.attr:record', 'b'),
+                  ('go:default_method', ''))
+        for i in range(2):
+            req = self._processInputs(inputs)
+            self.assertEqual(req['num'], 1)
+            self.assertEqual(req['seq'], ('a',))
+            self.assertEqual(req['rec'].attr, 'b')
+        self.assertIn('num:int:ignore_empty', HTTPRequest._field_descriptors)
+        req = self._processInputs((('num:int:ignore_empty', ''),))
+        self.assertNotIn('num', req.form)
+
+    def test_processInputs_w_field_name_cache_disabled(self):
+        from ZPublisher import HTTPRequest
+        HTTPRequest._field_descriptors.clear()
+        self.addCleanup(setattr, HTTPRequest, 'field_descriptor_cache_size',
+                        HTTPRequest.field_descriptor_cache_size)
+        HTTPRequest.field_descriptor_cache_size = 0
+        req = self._processInputs((('num:int', '1'),))
+        self.assertEqual(req['num'], 1)
+        self.assertEqual(len(HTTPRequest._field_descriptors), 0)
+
+    def test_field_descriptor_cache_is_bounded(self):
+        from ZPublisher import HTTPRequest
+        HTTPRequest._field_descriptors.clear()
+        self.addCleanup(setattr, HTTPRequest, 'field_descriptor_cache_size',
+                        HTTPRequest.field_descriptor_cache_size)
+        HTTPRequest.field_descriptor_cache_size = 2
+        for key in ('a:int', 'b:int', 'a:int', 'c:int'):
+            HTTPRequest.field_descriptor(key)
+        self.assertEqual(list(HTTPRequest._field_descriptors.keys()),
+                         ['a:int', 'c:int'])
+
+    def test_field_descriptor_cache_new_converter(self):
+        from ZPublisher import HTTPRequest
+        from ZPublisher.Converters import type_converters
+        HTTPRequest._field_descriptors.clear()
+        self.assertIsNone(HTTPRequest.field_descriptor('x:upper')[5])
+        type_converters['upper'] = lambda v: v.upper()
+        self.addCleanup(type_converters.pop, 'upper')
+        self.assertEqual(HTTPRequest.field_descriptor('x:upper')[5], 'upper')
+
     def test_processInputs_w_cookie_parsing(self):
         env = {'SERVER_NAME': 'testingharnas', 'SERVER_PORT': '80'}
 
@@ -1057,6 +1163,20 @@ class HTTPRequestTests(unittest.TestCase, HTTPRequestFactoryMixin):
         finally:
             trusted_proxies[:] = orig
 
+    def test_getClientAddr_trusted_proxy_networks(self):
+        from ZPublisher import HTTPRequest
+        env = {'REMOTE_ADDR': '10.0.3.4',
+               'HTTP_X_FORWARDED_FOR': '10.1.20.30, 192.168.1.100, 10.0.0.7'}
+
+        orig = HTTPRequest.trusted_proxies
+        try:
+            HTTPRequest.trusted_proxies = HTTPRequest.TrustedProxies(
+                ['10.0.0.0/16', '192.168.1.100'])
+            request = self._makeOne(environ=env)
+            self.assertEqual(request.getClientAddr(), '10.1.20.30')
+        finally:
+            HTTPRequest.trusted_proxies = orig
+
     def test_getHeader_exact(self):
         environ = self._makePostEnviron()
         request = self._makeOne(environ=environ)
@@ -1195,6 +1315,65 @@ class HTTPRequestTests(unittest.TestCase, HTTPRequestFactoryMixin):
         req._script = ['foo', 'bar']
         self.assertEqual(req.getVirtualRoot(), '/foo/bar')
 
+    def test_physicalPathToURL(self):
+        req = self._makeOne(environ={'SERVER_NAME': 'nohost',
+                                     'SERVER_PORT': '80'})
+        self.assertEqual(req.physicalPathToURL(('', 'a b', 'c')),
+                         'http://nohost/a%20b/c')
+        self.assertEqual(req.physicalPathToURL('/a b/d', relative=1),
+                         '/a%20b/d')
+        self.assertEqual(req.physicalPathToURL(('', )), 'http://nohost')
+        self.assertEqual(list(req._url_prefixes), [('', 'a b')])
+
+    def test_physicalPathToURL_virtual_root(self):
+        class Root(object):
+            def getPhysicalPath(self):
+                return ('', 'a')
+
+        req = self._makeOne(environ={'SERVER_NAME': 'nohost',
+                                     'SERVER_PORT': '80'})
+        self.assertEqual(req.physicalPathToURL(('', 'a', 'b', 'c')),
+                         'http://nohost/a/b/c')
+        req['PARENTS'] = [Root()]
+        req.setVirtualRoot('/v')
+        self.assertEqual(req.physicalPathToURL(('', 'a', 'b', 'c')),
+                         'http://nohost/v/b/c')
+        self.assertEqual(req.physicalPathToURL(('', 'a', 'b')),
+                         'http://nohost/v/b')
+        self.assertEqual(req.physicalPathToURL(('', 'a')),
+                         'http://nohost/v')
+        self.assertEqual(req.physicalPathToURL(('', 'x', 'y'), relative=1),
+                         '/v/x/y')
+
+
+class TrustedProxiesTests(unittest.TestCase):
+
+    def _makeOne(self, proxies):
+        from ZPublisher.HTTPRequest import TrustedProxies
+        return TrustedProxies(proxies)
+
+    def test_sequence(self):
+        proxies = self._makeOne(['127.0.0.1', '10.0.0.0/8'])
+        self.assertEqual(proxies, ('127.0.0.1', '10.0.0.0/8'))
+        self.assertEqual(proxies[:], ('127.0.0.1', '10.0.0.0/8'))
+        self.assertIn('127.0.0.1', proxies)
+        self.assertNotIn('127.0.0.2', proxies)
+        self.assertNotIn('', self._makeOne(()))
+
+    def test_networks(self):
+        proxies = self._makeOne([
+            '10.1.0.0/16', '10.0.0.0/16', '10.0.128.0/17', '192.168.1.8/30',
+            'fd00::/64', '::1'])
+        self.assertEqual(len(proxies._firsts), 3)
+        for address in ('10.0.0.0', '10.0.200.1', '10.1.255.255',
+                        '192.168.1.11', '::ffff:10.1.0.1', 'fd00::1234',
+                        '::1'):
+            self.assertIn(address, proxies)
+        for address in ('9.255.255.255', '10.2.0.0', '192.168.1.12',
+                        '192.168.1.7', '::10.0.0.1', 'fd00:0:0:1::',
+                        'proxy.example.com', ''):
+            self.assertNotIn(address, proxies)
+
 
 class TestHTTPRequestZope3Views(TestRequestViewsBase):
 
@@ -7,3 +7,15 @@ class TestFileStreamIterator(unittest.TestCase):
 
     def testInterface(self):
         verifyClass(IStreamIterator, filestream_iterator)
+
+    def testStreamSize(self):
+        from ZPublisher import Iterators
+        old_streamsize = Iterators.default_streamsize
+        Iterators.default_streamsize = 3
+        self.addCleanup(setattr, Iterators, 'default_streamsize',
+                        old_streamsize)
+        with filestream_iterator(__file__) as iterator:
+            self.assertEqual(iterator.streamsize, 3)
+            self.assertEqual(len(next(iterator)), 3)
+        with filestream_iterator(__file__, streamsize=5) as iterator:
+            self.assertEqual(iterator.streamsize, 5)
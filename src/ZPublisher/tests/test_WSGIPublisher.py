@@ -13,6 +13,7 @@
 ##############################################################################
 import codecs
 import io
+import os
 import unittest
 
 import transaction
@@ -152,6 +153,54 @@ class WSGIResponseTests(unittest.TestCase):
         self.assertEqual(response.getHeader('Content-Length'),
                          '%d' % len(TestStreamIterator.data))
 
+    def test_write_w_compression(self):
+        import zlib
+        stdout = io.BytesIO()
+        response = self._makeOne(stdout=stdout)
+        response.enableHTTPCompression({'HTTP_ACCEPT_ENCODING': 'gzip'})
+        response.setHeader('Content-Type', 'text/plain')
+        response.setHeader('Content-Length', '10000')
+        for i in range(1000):
+            response.write(b'0123456789')
+        self.assertTrue(response._encoder is not None)
+        data = stdout.getvalue() + response._encoder.flush()
+        self.assertEqual(zlib.decompress(data, 16 + zlib.MAX_WBITS),
+                         b'0123456789' * 1000)
+        self.assertEqual(response.getHeader('Content-Encoding'), 'gzip')
+        self.assertEqual(response.getHeader('Vary'), 'Accept-Encoding')
+        self.assertEqual(response.getHeader('Content-Length'), None)
+
+    def test_finalize_compresses_file(self):
+        import zlib
+        from ZPublisher.compression import GzipIterator
+        response = self._makeOne()
+        response.enableHTTPCompression(force=1)
+        response.setHeader('Content-Type', 'text/plain')
+        response.setBody(io.BytesIO(b'x' * 100000))
+        status, headers = response.finalize()
+        self.assertTrue(isinstance(response.body, GzipIterator))
+        self.assertEqual(response._streaming, 1)
+        self.assertNotIn('Content-Length', dict(headers))
+        self.assertEqual(dict(headers)['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            zlib.decompress(b''.join(response.body), 16 + zlib.MAX_WBITS),
+            b'x' * 100000)
+
+    def test_finalize_skips_compression_below_min_size(self):
+        from ZPublisher import compression
+        old_min_size = compression.min_size
+        compression.min_size = 1024
+        self.addCleanup(setattr, compression, 'min_size', old_min_size)
+        response = self._makeOne()
+        response.enableHTTPCompression(force=1)
+        response.setHeader('Content-Type', 'text/plain')
+        body = io.BytesIO(b'x' * 100)
+        response.setBody(body)
+        response.finalize()
+        self.assertTrue(response.body is body)
+        self.assertEqual(response.getHeader('Content-Length'), '100')
+        self.assertEqual(response.getHeader('Content-Encoding'), None)
+
     def test___str___raises(self):
         response = self._makeOne()
         response.setBody('TESTING')
@@ -205,6 +254,92 @@ class TestPublish(unittest.TestCase):
         self._callFUT(request, (_object, _realm, _debug_mode))
         self.assertEqual(response.realm, None)
 
+    def test_lazy_inputs(self):
+        from ZPublisher import WSGIPublisher
+        request = DummyRequest(PATH_INFO='/')
+        request.response = DummyResponse()
+        _object = DummyCallable()
+        request._traverse_to = _object
+        WSGIPublisher.set_default_lazy_inputs(True)
+        try:
+            self._callFUT(request, (_object, 'TESTING', False))
+        finally:
+            WSGIPublisher.set_default_lazy_inputs(False)
+        self.assertFalse(request._processedInputs)
+        self.assertTrue(request._processedInputsLazily)
+
+    def test_w_timer(self):
+        from ZPublisher.timing import RequestTimer
+        request = DummyRequest(PATH_INFO='/')
+        request.response = DummyResponse()
+        request._timer = timer = RequestTimer()
+        _object = DummyCallable()
+        request._traverse_to = _object
+        self._callFUT(request, (_object, 'TESTING', False))
+        self.assertEqual(sorted(timer.durations),
+                         ['call', 'inputs', 'traverse'])
+        self.assertEqual(timer.prefix, '/')
+
+    def _publishReadOnly(self, _object, **environ):
+        request = DummyRequest(**environ)
+        request.response = DummyResponse()
+        request._traverse_to = _object
+        transaction.begin()
+        self.addCleanup(transaction.abort)
+        self._callFUT(request, (DummyCallable(), 'TESTING', False))
+        return transaction.isDoomed()
+
+    def test_read_only_w_marker(self):
+        from ZPublisher.interfaces import IReadOnlyPublished
+        from zope.interface import alsoProvides
+        _object = DummyCallable()
+        alsoProvides(_object, IReadOnlyPublished)
+        self.assertTrue(self._publishReadOnly(
+            _object, PATH_INFO='/', REQUEST_METHOD='GET'))
+        self.assertFalse(self._publishReadOnly(
+            _object, PATH_INFO='/', REQUEST_METHOD='POST'))
+        self.assertFalse(self._publishReadOnly(
+            DummyCallable(), PATH_INFO='/', REQUEST_METHOD='GET'))
+
+    def test_read_only_w_path(self):
+        from ZPublisher import WSGIPublisher
+        WSGIPublisher.set_default_read_only_paths(['static/'])
+        self.addCleanup(WSGIPublisher.set_default_read_only_paths, ())
+        self.assertTrue(self._publishReadOnly(
+            DummyCallable(), PATH_INFO='/static/a.css', REQUEST_METHOD='HEAD'))
+        self.assertTrue(self._publishReadOnly(
+            DummyCallable(), PATH_INFO='/static', REQUEST_METHOD='GET'))
+        self.assertFalse(self._publishReadOnly(
+            DummyCallable(), PATH_INFO='/statics', REQUEST_METHOD='GET'))
+
+    def test_read_only_logs_changes(self):
+        from zope.testing.loggingsupport import InstalledHandler
+        from ZODB.DB import DB
+        from ZPublisher.interfaces import IReadOnlyPublished
+        from ZPublisher.WSGIPublisher import _end_read_only
+        from zope.interface import alsoProvides
+        db = DB(None)
+        self.addCleanup(db.close)
+        conn = db.open()
+        app = conn.root()
+        transaction.commit()
+        request = DummyRequest(PATH_INFO='/', REQUEST_METHOD='GET')
+        request.response = DummyResponse()
+        request._traverse_to = lambda: app.__setitem__('changed', True)
+        alsoProvides(request._traverse_to, IReadOnlyPublished)
+        handler = InstalledHandler('ZPublisher')
+        self.addCleanup(handler.uninstall)
+        self._callFUT(request, (app, 'TESTING', False))
+        self.assertTrue(transaction.isDoomed())
+        _end_read_only(request)
+        transaction.abort()
+        conn.close()
+        self.assertNotIn('register', conn.__dict__)
+        self.assertEqual(len(handler.records), 1)
+        self.assertIn('PersistentMapping (oid 0x00)',
+                      handler.records[0].getMessage())
+        self.assertNotIn('changed', db.open().root())
+
 
 class TestPublishModule(ZopeTestCase):
 
@@ -315,6 +450,137 @@ class TestPublishModule(ZopeTestCase):
         app_iter = self._callFUT(environ, start_response, _publish)
         self.assertEqual(app_iter, (b'WRITTEN', b'BODY'))
 
+    def test_streaming_hands_written_data_to_server(self):
+        import threading
+        from ZPublisher.HTTPResponse import WSGIResponse
+        from ZPublisher.WSGIPublisher import publish_module
+        environ = self._makeEnviron()
+        start_response = DummyCallable()
+        proceed = threading.Event()
+
+        def _publish(request, mod_info):
+            response = request.response
+            response.setHeader('Content-Type', 'text/plain')
+            response.write(b'FIRST')
+            proceed.wait(5)
+            response.write(b'SECOND')
+            response.setBody(b'BODY')
+            return response
+
+        app_iter = publish_module(environ, start_response, _publish,
+                                  _response_factory=WSGIResponse,
+                                  _streaming=True)
+        # The first chunk arrives while publishing is still in progress.
+        self.assertEqual(next(app_iter), b'FIRST')
+        status, headers = start_response._called_with[0]
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('Content-Length', dict(headers))
+        proceed.set()
+        self.assertEqual(list(app_iter), [b'SECOND', b'BODY'])
+        app_iter.close()
+
+    def test_write_and_body_w_compression(self):
+        import zlib
+        from ZPublisher.HTTPResponse import WSGIResponse
+        from ZPublisher.WSGIPublisher import publish_module
+        environ = self._makeEnviron(HTTP_ACCEPT_ENCODING='gzip')
+        start_response = DummyCallable()
+
+        def _publish(request, mod_info):
+            response = request.response
+            response.enableHTTPCompression(request)
+            response.setHeader('Content-Type', 'text/plain')
+            response.write(b'WRITTEN' * 100)
+            response.setBody(b'BODY' * 100)
+            return response
+
+        for streaming in (False, True):
+            app_iter = publish_module(environ, start_response, _publish,
+                                      _response_factory=WSGIResponse,
+                                      _streaming=streaming)
+            data = b''.join(app_iter)
+            self.assertEqual(zlib.decompress(data, 16 + zlib.MAX_WBITS),
+                             b'WRITTEN' * 100 + b'BODY' * 100)
+            headers = dict(start_response._called_with[0][1])
+            self.assertEqual(headers['Content-Encoding'], 'gzip')
+            self.assertNotIn('Content-Length', headers)
+
+    def test_streaming_without_write_returns_complete_response(self):
+        environ = self._makeEnviron()
+        start_response = DummyCallable()
+        _response = DummyResponse()
+        _response.body = b'BODY'
+        _publish = DummyCallable()
+        _publish._result = _response
+        from ZPublisher.WSGIPublisher import publish_module
+        app_iter = publish_module(environ, start_response, _publish,
+                                  _streaming=True)
+        self.assertEqual(app_iter, (b'', b'BODY'))
+        self.assertEqual(start_response._called_with[0][0],
+                         '204 No Content')
+
+    def test_streaming_raises_errors_before_first_write(self):
+        from zExceptions import Redirect
+        from ZPublisher.WSGIPublisher import publish_module
+        environ = self._makeEnviron(**{
+            'x-wsgiorg.throw_errors': True,
+        })
+        start_response = DummyCallable()
+        _publish = DummyCallable()
+        _publish._raise = Redirect('/redirect_to')
+        with self.assertRaises(Redirect):
+            publish_module(environ, start_response, _publish,
+                           _streaming=True)
+        self.assertIsNone(start_response._called_with)
+
+    def test_streaming_raises_errors_after_first_write_on_iteration(self):
+        from ZPublisher.HTTPResponse import WSGIResponse
+        from ZPublisher.WSGIPublisher import publish_module
+        environ = self._makeEnviron(**{
+            'x-wsgiorg.throw_errors': True,
+        })
+        start_response = DummyCallable()
+
+        def _publish(request, mod_info):
+            request.response.write(b'WRITTEN')
+            raise ValueError('broken')
+
+        app_iter = publish_module(environ, start_response, _publish,
+                                  _response_factory=WSGIResponse,
+                                  _streaming=True)
+        self.assertEqual(next(app_iter), b'WRITTEN')
+        with self.assertRaises(ValueError):
+            next(app_iter)
+        app_iter.close()
+
+    def test_streaming_raises_base_exceptions(self):
+        import threading
+        import time
+        from ZPublisher.WSGIPublisher import publish_module
+
+        class Killed(BaseException):
+            pass
+
+        raised = []
+        if hasattr(threading, 'excepthook'):
+            # Keep the publishing thread from printing the traceback.
+            self.addCleanup(setattr, threading, 'excepthook',
+                            threading.excepthook)
+            threading.excepthook = raised.append
+        environ = self._makeEnviron()
+        _publish = DummyCallable()
+        _publish._raise = Killed()
+        with self.assertRaises(Killed):
+            publish_module(environ, DummyCallable(), _publish,
+                           _streaming=True)
+        if hasattr(threading, 'excepthook'):
+            # The publishing thread is ended by the exception as well.
+            for i in range(100):
+                if raised:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(raised[0].exc_type, Killed)
+
     def test_raises_unauthorized(self):
         from zExceptions import Unauthorized
         environ = self._makeEnviron()
@@ -430,6 +696,57 @@ class TestPublishModule(ZopeTestCase):
         app_iter = self._callFUT(environ, start_response, _publish)
         self.assertTrue(app_iter is body)
 
+    def _makeFileResponse(self, data=b'hello'):
+        import tempfile
+        from ZPublisher.Iterators import filestream_iterator
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(data)
+        self.addCleanup(os.remove, f.name)
+        _response = DummyResponse()
+        _response._status = '200 OK'
+        _response.body = filestream_iterator(f.name, streamsize=4)
+        self.addCleanup(_response.body.close)
+        return _response
+
+    def test_response_is_file_w_file_wrapper(self):
+        wrapped = []
+
+        def file_wrapper(filelike, blksize):
+            wrapped.append((filelike, blksize))
+            return 'WRAPPED'
+
+        _response = self._makeFileResponse()
+        environ = self._makeEnviron(**{'wsgi.file_wrapper': file_wrapper})
+        start_response = DummyCallable()
+        _publish = DummyCallable()
+        _publish._result = _response
+        app_iter = self._callFUT(environ, start_response, _publish)
+        self.assertEqual(app_iter, 'WRAPPED')
+        self.assertEqual(wrapped, [(_response.body, 4)])
+
+    def test_response_is_file_w_file_wrapper_disabled(self):
+        from ZPublisher import WSGIPublisher
+        WSGIPublisher.set_default_file_wrapper(False)
+        self.addCleanup(WSGIPublisher.set_default_file_wrapper, True)
+        _response = self._makeFileResponse()
+        environ = self._makeEnviron(**{'wsgi.file_wrapper': DummyCallable()})
+        start_response = DummyCallable()
+        _publish = DummyCallable()
+        _publish._result = _response
+        app_iter = self._callFUT(environ, start_response, _publish)
+        self.assertTrue(app_iter is _response.body)
+
+    def test_response_is_file_wo_fileno_w_file_wrapper(self):
+        _response = DummyResponse()
+        _response._status = '200 OK'
+        body = _response.body = io.BytesIO(b'hello')
+        environ = self._makeEnviron(**{'wsgi.file_wrapper': DummyCallable()})
+        start_response = DummyCallable()
+        _publish = DummyCallable()
+        _publish._result = _response
+        app_iter = self._callFUT(environ, start_response, _publish)
+        self.assertTrue(app_iter is body)
+
     def test_request_closed(self):
         environ = self._makeEnviron()
         start_response = DummyCallable()
@@ -448,6 +765,154 @@ class TestPublishModule(ZopeTestCase):
                       _request_factory=_request_factory)
         self.assertTrue(_request._closed)
 
+    def test_conflict_retried_after_policy_delay(self):
+        from ZODB.POSException import ConflictError
+        from ZPublisher import conflicts
+        from ZPublisher.HTTPRequest import WSGIRequest
+        slept = []
+        self.addCleanup(setattr, conflicts, 'policy', conflicts.policy)
+        conflicts.policy = conflicts.RetryPolicy(
+            base_delay=0.5, jitter=False, sleep=slept.append)
+        conflicts.stats.reset()
+        self.addCleanup(conflicts.stats.reset)
+
+        class Request(WSGIRequest):
+            retry_max_count = 2
+
+        calls = []
+
+        def _publish(request, module_info):
+            calls.append(request.retry_count)
+            if len(calls) < 3:
+                raise ConflictError()
+            return request.response
+
+        environ = self._makeEnviron(**{
+            'PATH_INFO': '/folder', 'x-wsgiorg.throw_errors': True})
+        self._callFUT(environ, noopStartResponse, _publish,
+                      _request_factory=Request)
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertEqual(slept, [0.5, 1.0])
+        self.assertEqual(conflicts.stats.conflicts, 2)
+        self.assertEqual(conflicts.stats.retries, 2)
+        # The conflicts happened before traversal finished.
+        self.assertEqual(conflicts.stats.paths, {conflicts.TRAVERSAL: 2})
+
+    def test_conflict_counted_by_published_path(self):
+        from OFS.SimpleItem import SimpleItem
+        from ZODB.POSException import ConflictError
+        from ZPublisher import conflicts
+        from ZPublisher.HTTPRequest import WSGIRequest
+        self.addCleanup(setattr, conflicts, 'policy', conflicts.policy)
+        conflicts.policy = conflicts.RetryPolicy(
+            jitter=False, sleep=lambda seconds: None)
+        conflicts.stats.reset()
+        self.addCleanup(conflicts.stats.reset)
+
+        class Request(WSGIRequest):
+            retry_max_count = 1
+
+        published = SimpleItem()
+        published.getPhysicalPath = lambda: ('', 'site', 'folder', 'doc')
+        calls = []
+
+        def _publish(request, module_info):
+            calls.append(request.retry_count)
+            request['PUBLISHED'] = published
+            if len(calls) < 2:
+                raise ConflictError()
+            return request.response
+
+        environ = self._makeEnviron(**{
+            'PATH_INFO': '/VirtualHostBase/http/example.com:80/site'
+                         '/VirtualHostRoot/folder/doc',
+            'x-wsgiorg.throw_errors': True})
+        self._callFUT(environ, noopStartResponse, _publish,
+                      _request_factory=Request)
+        self.assertEqual(conflicts.stats.paths, {'/site': 1})
+
+    def test_conflict_not_retried_without_budget(self):
+        from ZODB.POSException import ConflictError
+        from ZPublisher import conflicts
+        from ZPublisher.HTTPRequest import WSGIRequest
+        self.addCleanup(setattr, conflicts, 'policy', conflicts.policy)
+        conflicts.policy = conflicts.RetryPolicy(
+            jitter=False, budget=1, sleep=lambda seconds: None)
+        conflicts.stats.reset()
+        self.addCleanup(conflicts.stats.reset)
+
+        class Request(WSGIRequest):
+            retry_max_count = 2
+
+        _publish = DummyCallable()
+        _publish._raise = ConflictError()
+        environ = self._makeEnviron(**{
+            'PATH_INFO': '/folder', 'x-wsgiorg.throw_errors': True})
+        with self.assertRaises(ConflictError):
+            self._callFUT(environ, noopStartResponse, _publish,
+                          _request_factory=Request)
+        self.assertEqual(conflicts.stats.conflicts, 2)
+        self.assertEqual(conflicts.stats.retries, 1)
+
+    def _enableTiming(self):
+        from ZPublisher import timing
+        timing.timings.reset()
+        self.addCleanup(timing.timings.reset)
+        self.addCleanup(setattr, timing, 'enabled', timing.enabled)
+        timing.enabled = True
+        return timing
+
+    def _timedPublish(self, exc=None, traversed=True):
+        from OFS.SimpleItem import SimpleItem
+        published = SimpleItem()
+        published.getPhysicalPath = lambda: ('', 'folder', 'doc')
+
+        def _publish(request, module_info):
+            if traversed:
+                request['PUBLISHED'] = published
+                request._timer.traversed(request)
+            if exc is not None:
+                raise exc
+            return DummyResponse()
+        return _publish
+
+    def test_publisher_timing(self):
+        timing = self._enableTiming()
+        # Keyed by the physical path, not by PATH_INFO.
+        environ = self._makeEnviron(
+            PATH_INFO='/VirtualHostBase/http/example.com:80/folder/doc')
+        start_response = DummyCallable()
+        self._callFUT(environ, start_response, self._timedPublish())
+        self.assertEqual(timing.timings.prefixes(), ['/folder'])
+        self.assertEqual(timing.timings.outcomes('/folder'), ['ok'])
+        histograms = dict(timing.timings.histograms('/folder'))
+        self.assertEqual(sorted(histograms), ['commit', 'finalize', 'total'])
+        self.assertEqual(histograms['total'].count, 1)
+
+    def test_publisher_timing_error(self):
+        from ZPublisher.WSGIPublisher import publish_module
+        timing = self._enableTiming()
+        for streaming in (False, True):
+            environ = self._makeEnviron(
+                PATH_INFO='/folder/doc', **{'x-wsgiorg.throw_errors': True})
+            with self.assertRaises(ValueError):
+                publish_module(environ, noopStartResponse,
+                               self._timedPublish(ValueError()),
+                               _streaming=streaming)
+        self.assertEqual(timing.timings.outcomes('/folder'), ['error'])
+        histograms = dict(timing.timings.histograms('/folder', timing.ERROR))
+        self.assertEqual(histograms['total'].count, 2)
+
+    def test_publisher_timing_not_traversed(self):
+        from zExceptions import NotFound
+        timing = self._enableTiming()
+        environ = self._makeEnviron(
+            PATH_INFO='/probe', **{'x-wsgiorg.throw_errors': True})
+        with self.assertRaises(NotFound):
+            self._callFUT(environ, noopStartResponse,
+                          self._timedPublish(NotFound(), traversed=False))
+        self.assertEqual(timing.timings.prefixes(), [])
+
     def testCustomExceptionViewUnauthorized(self):
         from AccessControl import Unauthorized
         registerExceptionView(IUnauthorized)
@@ -651,6 +1116,7 @@ def registerExceptionView(for_):
 
 class DummyRequest(dict):
     _processedInputs = False
+    _processedInputsLazily = False
     _traversed = None
     _traverse_to = None
     args = ()
@@ -658,6 +1124,9 @@ class DummyRequest(dict):
     def processInputs(self):
         self._processedInputs = True
 
+    def processInputsLazily(self):
+        self._processedInputsLazily = True
+
     def traverse(self, path, response=None, validated_hook=None):
         self._traversed = (path, response, validated_hook)
         return self._traverse_to
@@ -0,0 +1,112 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+
+from io import BytesIO
+import unittest
+import zlib
+
+
+def gunzip(data):
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+class IsCompressibleTests(unittest.TestCase):
+
+    def setUp(self):
+        from ZPublisher import compression
+        self._old_mime_types = compression.mime_types
+
+    def tearDown(self):
+        from ZPublisher import compression
+        compression.mime_types = self._old_mime_types
+
+    def _callFUT(self, content_type, uncompressable=('image',)):
+        from ZPublisher.compression import is_compressible
+        return is_compressible(content_type, uncompressable)
+
+    def test_wo_allowlist(self):
+        self.assertTrue(self._callFUT('text/html; charset=utf-8'))
+        self.assertTrue(self._callFUT(None))
+        self.assertFalse(self._callFUT('image/png'))
+
+    def test_w_allowlist(self):
+        from ZPublisher import compression
+        compression.mime_types = ('text/*', 'application/json')
+        self.assertTrue(self._callFUT('text/csv; charset=utf-8'))
+        self.assertTrue(self._callFUT('Application/JSON'))
+        self.assertFalse(self._callFUT('application/pdf'))
+        self.assertFalse(self._callFUT(None))
+
+
+class GzipEncoderTests(unittest.TestCase):
+
+    def _makeOne(self, *args):
+        from ZPublisher.compression import GzipEncoder
+        return GzipEncoder(*args)
+
+    def test_incremental(self):
+        encoder = self._makeOne()
+        chunks = [b'line %d\n' % i for i in range(10000)]
+        data = b''.join(encoder.compress(chunk) for chunk in chunks)
+        data += encoder.flush()
+        self.assertEqual(gunzip(data), b''.join(chunks))
+        self.assertLess(len(data), len(b''.join(chunks)))
+
+    def test_empty(self):
+        encoder = self._makeOne(1)
+        self.assertEqual(encoder.compress(b''), b'')
+        self.assertEqual(gunzip(encoder.flush()), b'')
+
+
+class GzipIteratorTests(unittest.TestCase):
+
+    def _makeOne(self, body):
+        from ZPublisher.compression import GzipEncoder
+        from ZPublisher.compression import GzipIterator
+        return GzipIterator(body, GzipEncoder())
+
+    def test_iterable(self):
+        body = [b'abc' * 100, b'def' * 100]
+        self.assertEqual(gunzip(b''.join(self._makeOne(body))),
+                         b''.join(body))
+
+    def test_file_is_read_in_blocks_and_closed(self):
+        from ZPublisher import compression
+        data = b'line\n' * 100000
+        body = BytesIO(data)
+        iterator = self._makeOne(body)
+        chunks = list(iterator)
+        self.assertLess(len(chunks), len(data) // compression.BLOCK_SIZE + 3)
+        self.assertEqual(gunzip(b''.join(chunks)), data)
+        iterator.close()
+        self.assertTrue(body.closed)
+
+    def test_stream_iterator(self):
+        from ZPublisher.Iterators import IUnboundStreamIterator
+        from zope.interface import implementer
+
+        @implementer(IUnboundStreamIterator)
+        class TestStreamIterator(object):
+            chunks = [b'hello ', b'world']
+
+            def __next__(self):
+                if self.chunks:
+                    return self.chunks.pop(0)
+                raise StopIteration
+
+            next = __next__
+
+        iterator = self._makeOne(TestStreamIterator())
+        self.assertTrue(IUnboundStreamIterator.providedBy(iterator))
+        self.assertEqual(gunzip(b''.join(iterator)), b'hello world')
+        iterator.close()
@@ -0,0 +1,128 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+
+import unittest
+
+from ZODB.POSException import ConflictError
+
+
+class RetryPolicyTests(unittest.TestCase):
+
+    def _makeOne(self, **kw):
+        from ZPublisher.conflicts import RetryPolicy
+        self.now = 0.0
+        self.slept = []
+        kw.setdefault('clock', lambda: self.now)
+        kw.setdefault('sleep', self.slept.append)
+        return RetryPolicy(**kw)
+
+    def test_exponential_backoff(self):
+        policy = self._makeOne(base_delay=0.1, factor=3, max_delay=0.5,
+                               jitter=False)
+        self.assertAlmostEqual(policy.delay(0), 0.1)
+        self.assertAlmostEqual(policy.delay(1), 0.3)
+        self.assertAlmostEqual(policy.delay(2), 0.5)
+
+    def test_jitter(self):
+        policy = self._makeOne(base_delay=1.0, factor=2.0)
+        for i in range(20):
+            delay = policy.delay(1)
+            self.assertTrue(0 <= delay <= 2.0)
+
+    def test_wait(self):
+        policy = self._makeOne(base_delay=0.5, jitter=False)
+        policy.wait(1)
+        self.assertEqual(self.slept, [1.0])
+        policy = self._makeOne(base_delay=0, jitter=False)
+        policy.wait(1)
+        self.assertEqual(self.slept, [])
+
+    def test_unlimited_budget(self):
+        policy = self._makeOne(jitter=False)
+        for i in range(100):
+            policy.wait(0)
+        self.assertTrue(policy.allows(0))
+
+    def test_budget(self):
+        policy = self._makeOne(budget=2, budget_period=10, jitter=False)
+        self.assertTrue(policy.allows(0))
+        policy.wait(0)
+        self.now = 5.0
+        policy.wait(0)
+        self.assertFalse(policy.allows(0))
+        self.now = 10.0
+        self.assertTrue(policy.allows(0))
+        policy.wait(0)
+        self.assertFalse(policy.allows(0))
+
+
+class PublishedPrefixTests(unittest.TestCase):
+
+    def _callFUT(self, request):
+        from ZPublisher.conflicts import published_prefix
+        return published_prefix(request)
+
+    def test_published(self):
+        from OFS.SimpleItem import SimpleItem
+        item = SimpleItem()
+        item.getPhysicalPath = lambda: ('', 'site', 'item')
+        self.assertEqual(self._callFUT({'PUBLISHED': item}), '/site')
+
+    def test_not_traversed(self):
+        from ZPublisher.conflicts import TRAVERSAL
+        self.assertEqual(self._callFUT({'PATH_INFO': '/site/item'}),
+                         TRAVERSAL)
+
+
+class ConflictStatsTests(unittest.TestCase):
+
+    def _makeOne(self, max_keys=10):
+        from ZPublisher.conflicts import ConflictStats
+        return ConflictStats(max_keys)
+
+    def test_record(self):
+        from ZPublisher.conflicts import UNKNOWN
+        stats = self._makeOne()
+        from persistent import Persistent
+        exc = ConflictError(object=Persistent())
+        stats.record('/folder/add', exc, True)
+        stats.record('/folder/add', exc, False)
+        stats.record(None, ValueError(), False)
+        self.assertEqual(stats.conflicts, 3)
+        self.assertEqual(stats.retries, 1)
+        self.assertEqual(stats.top(stats.paths),
+                         [('/folder/add', 2), ('/', 1)])
+        self.assertEqual(stats.top(stats.classes),
+                         [('persistent.Persistent', 2), (UNKNOWN, 1)])
+
+    def test_keys_are_bounded(self):
+        from ZPublisher.conflicts import OTHER
+        stats = self._makeOne(max_keys=1)
+        for path in ('/a', '/b', '/c', '/a'):
+            stats.record(path, ConflictError(), True)
+        self.assertEqual(stats.paths, {'/a': 2, OTHER: 2})
+
+    def test_render(self):
+        stats = self._makeOne()
+        stats.record('/a', ConflictError(), True)
+        lines = stats.render().splitlines()
+        self.assertIn('zope_conflicts_total 1', lines)
+        self.assertIn('zope_conflict_retries_total 1', lines)
+        self.assertIn('zope_conflicts_by_path_total{path="/a"} 1', lines)
+
+    def test_reset(self):
+        stats = self._makeOne()
+        stats.record('/a', ConflictError(), True)
+        stats.reset()
+        self.assertEqual(stats.conflicts, 0)
+        self.assertEqual(stats.paths, {})
@@ -0,0 +1,130 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+
+from io import BytesIO
+import unittest
+
+from six import PY2
+
+BODY = (
+    b'preamble\r\n'
+    b'--12345\r\n'
+    b'Content-Disposition: form-data; name="title"\r\n'
+    b'\r\n'
+    b'T\xc3\xa4st\r\n'
+    b'--12345\r\n'
+    b'Content-Disposition: form-data; name="file"; filename="a.txt"\r\n'
+    b'Content-Type: text/plain\r\n'
+    b'\r\n'
+    b'line 1\r\n'
+    b'--12345 is no boundary\r\n'
+    b'line 3\r\n'
+    b'\r\n'
+    b'--12345--\r\n'
+    b'epilogue'
+)
+
+
+class GetBoundaryTests(unittest.TestCase):
+
+    def _callFUT(self, content_type):
+        from ZPublisher.multipart import get_boundary
+        return get_boundary(content_type)
+
+    def test_multipart(self):
+        self.assertEqual(
+            self._callFUT('multipart/form-data; boundary=12345'), b'12345')
+        self.assertEqual(
+            self._callFUT('multipart/form-data; boundary="a b"'), b'a b')
+
+    def test_other_types(self):
+        self.assertIsNone(
+            self._callFUT('application/x-www-form-urlencoded'))
+        self.assertIsNone(self._callFUT('multipart/form-data'))
+        self.assertIsNone(self._callFUT(''))
+
+
+class MultipartInputTests(unittest.TestCase):
+
+    def _makeOne(self, body=BODY, environ=None, **kw):
+        from ZPublisher.multipart import MultipartInput
+        if environ is None:
+            environ = {'CONTENT_LENGTH': str(len(body))}
+        return MultipartInput(BytesIO(body), environ, b'12345', **kw)
+
+    def _fields(self, fs):
+        return dict((item.name, item) for item in fs.list)
+
+    def test_fields(self):
+        fs = self._makeOne()
+        self.assertEqual([item.name for item in fs.list], ['title', 'file'])
+        fields = self._fields(fs)
+        title = fields['title']
+        self.assertIsNone(title.filename)
+        if PY2:
+            self.assertEqual(title.value, b'T\xc3\xa4st')
+        else:
+            self.assertEqual(title.value, u'T\xe4st')
+        upload = fields['file']
+        self.assertEqual(upload.filename, 'a.txt')
+        self.assertEqual(upload.headers['content-type'], 'text/plain')
+        self.assertEqual(
+            upload.file.read(),
+            b'line 1\r\n--12345 is no boundary\r\nline 3\r\n')
+
+    def test_small_blocks(self):
+        # Delimiters spanning several blocks are found, too.
+        for size in (1, 2, 3, 7, 11):
+            fields = self._fields(self._makeOne(block_size=size))
+            self.assertEqual(
+                fields['file'].file.read(),
+                b'line 1\r\n--12345 is no boundary\r\nline 3\r\n')
+            self.assertEqual(fields['title'].file.read(), b'T\xc3\xa4st')
+
+    def test_large_parts_are_spooled_to_disk(self):
+        fs = self._makeOne(limit=10)
+        fields = self._fields(fs)
+        self.addCleanup(fields['file'].file.close)
+        self.assertIsInstance(fields['title'].file, BytesIO)
+        self.assertNotIsInstance(fields['file'].file, BytesIO)
+        self.assertEqual(fields['file'].file.tell(), 0)
+
+    def test_query_string_fields_come_first(self):
+        environ = {'QUERY_STRING': 'a=1&b=', 'CONTENT_LENGTH': ''}
+        fs = self._makeOne(environ=environ)
+        self.assertEqual([item.name for item in fs.list],
+                         ['a', 'b', 'title', 'file'])
+        self.assertEqual(fs.list[0].value, '1')
+        self.assertEqual(fs.list[1].value, '')
+        self.assertIsNone(fs.list[1].file)
+
+    def test_content_length_is_respected(self):
+        body = BODY.replace(b'--12345--', b'--12345')
+        environ = {'CONTENT_LENGTH': str(body.index(b'line 3'))}
+        fields = self._fields(self._makeOne(body, environ))
+        self.assertEqual(fields['file'].file.read(),
+                         b'line 1\r\n--12345 is no boundary')
+
+    def test_lf_line_ends_and_no_closing_delimiter(self):
+        body = (b'\n--12345\n'
+                b'Content-Disposition: form-data; name="f"; filename="f"\n'
+                b'\n'
+                b'test\n\n')
+        fields = self._fields(self._makeOne(body, {}))
+        self.assertEqual(fields['f'].file.read(), b'test\n')
+
+    def test_part_without_headers(self):
+        body = b'--12345\r\n\r\nignored\r\n--12345--\r\n'
+        fs = self._makeOne(body, {})
+        self.assertEqual(len(fs.list), 1)
+        self.assertIsNone(fs.list[0].name)
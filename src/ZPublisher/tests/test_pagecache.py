@@ -0,0 +1,302 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+
+from io import BytesIO
+import unittest
+
+from AccessControl.users import nobody
+from persistent.mapping import PersistentMapping
+import transaction
+from ZODB.DB import DB
+
+
+def makeEnviron(**kw):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': '/page',
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '8080',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(b''),
+    }
+    environ.update(kw)
+    return environ
+
+
+class DummyRequest(object):
+
+    def __init__(self, user=nobody):
+        self.other = {'AUTHENTICATED_USER': user}
+
+
+class PageCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DB(None)
+        conn = self.db.open()
+        root = conn.root()
+        root['page'] = PersistentMapping(title='first')
+        root['other'] = PersistentMapping(title='other')
+        transaction.commit()
+        conn.close()
+
+    def tearDown(self):
+        transaction.abort()
+        self.db.close()
+
+    def _makeOne(self, size=1 << 20, **kw):
+        from ZPublisher.pagecache import PageCache
+        return PageCache(size, **kw)
+
+    def _render(self, cache, environ, name='page', user=nobody,
+                headers=(('Content-Type', 'text/plain'), )):
+        from ZPublisher.pagecache import recording
+        entry, render = cache.lookup(environ, self.db)
+        self.assertEqual(entry, None)
+        conn = self.db.open()
+        try:
+            app = conn.root()
+            environ['zope.page_cache'] = render
+            with recording(environ, DummyRequest(user), app):
+                body = app[name]['title'].encode('ascii')
+        finally:
+            transaction.abort()
+            conn.close()
+        stored = cache.store(render, environ, '200 OK', list(headers), body)
+        return body, stored
+
+    def _change(self, name='page', title='second'):
+        conn = self.db.open()
+        conn.root()[name]['title'] = title
+        transaction.commit()
+        conn.close()
+
+    def test_hit(self):
+        cache = self._makeOne()
+        environ = makeEnviron()
+        body, stored = self._render(cache, environ)
+        self.assertTrue(stored)
+        entry, render = cache.lookup(makeEnviron(), self.db)
+        self.assertEqual(render, None)
+        self.assertEqual(entry.body, b'first')
+        self.assertEqual((cache.hits, cache.misses, cache.stores), (1, 1, 1))
+
+    def test_serve(self):
+        cache = self._makeOne()
+        environ = makeEnviron()
+        self._render(cache, environ)
+        entry, render = cache.lookup(environ, self.db)
+        calls = []
+        body = cache.serve(entry, lambda *args: calls.append(args))
+        self.assertEqual(body, (b'first', ))
+        status, headers = calls[0]
+        self.assertEqual(status, '200 OK')
+        self.assertIn(('Age', '0'), headers)
+
+    def test_invalidated_by_change_of_loaded_object(self):
+        cache = self._makeOne()
+        self._render(cache, makeEnviron())
+        self._change()
+        entry, render = cache.lookup(makeEnviron(), self.db)
+        self.assertEqual(entry, None)
+        self.assertEqual(cache.invalidations, 1)
+        body, stored = self._render(cache, makeEnviron())
+        self.assertEqual(body, b'second')
+
+    def test_not_invalidated_by_change_of_other_object(self):
+        cache = self._makeOne()
+        self._render(cache, makeEnviron())
+        self._change('other')
+        entry, render = cache.lookup(makeEnviron(), self.db)
+        self.assertEqual(entry.body, b'first')
+
+    def test_objects_cached_by_connection_are_recorded(self):
+        cache = self._makeOne()
+        conn = self.db.open()
+        # Load the object into the object cache of the connection.
+        self.assertEqual(conn.root()['page']['title'], 'first')
+        transaction.abort()
+        conn.close()
+        self._render(cache, makeEnviron())
+        self._change()
+        entry, render = cache.lookup(makeEnviron(), self.db)
+        self.assertEqual(entry, None)
+
+    def test_change_while_rendering(self):
+        from ZPublisher.pagecache import recording
+        cache = self._makeOne()
+        environ = makeEnviron()
+        entry, render = cache.lookup(environ, self.db)
+        conn = self.db.open()
+        app = conn.root()
+        environ['zope.page_cache'] = render
+        with recording(environ, DummyRequest(), app):
+            body = app['page']['title'].encode('ascii')
+        transaction.abort()
+        conn.close()
+        self._change()
+        self.assertFalse(
+            cache.store(render, environ, '200 OK', [], body))
+
+    def test_expired(self):
+        now = [100.0]
+        cache = self._makeOne(max_age=10, clock=lambda: now[0])
+        self._render(cache, makeEnviron())
+        now[0] += 10
+        entry, render = cache.lookup(makeEnviron(), self.db)
+        self.assertEqual(entry, None)
+
+    def test_uncacheable_requests(self):
+        cache = self._makeOne()
+        for environ in (makeEnviron(REQUEST_METHOD='POST'),
+                        makeEnviron(HTTP_COOKIE='__ac=x'),
+                        makeEnviron(HTTP_AUTHORIZATION='Basic eDp4')):
+            self.assertEqual(cache.lookup(environ, self.db), (None, None))
+
+    def test_uncacheable_responses(self):
+        cache = self._makeOne()
+        for path, headers in (('/a', (('Set-Cookie', 'a=b'), )),
+                              ('/b', (('Cache-Control', 'private'), )),
+                              ('/c', (('Vary', '*'), ))):
+            body, stored = self._render(cache, makeEnviron(PATH_INFO=path),
+                                        headers=headers)
+            self.assertFalse(stored)
+
+    def test_uncacheable_responses_are_remembered(self):
+        now = [100.0]
+        cache = self._makeOne(max_age=10, clock=lambda: now[0])
+        self._render(cache, makeEnviron(), headers=(('Set-Cookie', 'a=b'), ))
+        self.assertEqual(cache.lookup(makeEnviron(), self.db), (None, None))
+        now[0] += 10
+        body, stored = self._render(cache, makeEnviron())
+        self.assertTrue(stored)
+
+    def test_connection_cache_is_kept(self):
+        cache = self._makeOne()
+        conn = self.db.open()
+        self.assertEqual(conn.root()['page']['title'], 'first')
+        loaded = conn._cache.cache_non_ghost_count
+        transaction.abort()
+        conn.close()
+        self._render(cache, makeEnviron())
+        conn = self.db.open()
+        try:
+            self.assertEqual(conn._cache.cache_non_ghost_count, loaded)
+            self.assertEqual(conn._cache.get(b'\xff' * 8), None)
+        finally:
+            conn.close()
+
+    def test_authenticated_user_is_not_cached(self):
+        from AccessControl.users import SimpleUser
+        cache = self._makeOne()
+        user = SimpleUser('user', '', (), ())
+        body, stored = self._render(cache, makeEnviron(), user=user)
+        self.assertFalse(stored)
+
+    def test_vary(self):
+        cache = self._makeOne()
+        headers = (('Vary', 'Accept-Encoding'), )
+        self._render(cache, makeEnviron(HTTP_ACCEPT_ENCODING='gzip'),
+                     headers=headers)
+        entry, render = cache.lookup(makeEnviron(), self.db)
+        self.assertEqual(entry, None)
+        self._render(cache, makeEnviron(), headers=headers)
+        entry, render = cache.lookup(
+            makeEnviron(HTTP_ACCEPT_ENCODING='gzip'), self.db)
+        self.assertEqual(entry.body, b'first')
+        self.assertEqual(len(cache._entries), 2)
+
+    def test_evicts_least_recently_used(self):
+        cache = self._makeOne(size=400)
+        # Entries of 95 bytes, 4 fit into the cache.
+        headers = [('X-Pad', 'x' * 85)]
+        for path in ('/a', '/b', '/c', '/d'):
+            self._render(cache, makeEnviron(PATH_INFO=path), headers=headers)
+        cache.lookup(makeEnviron(PATH_INFO='/a'), self.db)
+        body, stored = self._render(cache, makeEnviron(PATH_INFO='/e'),
+                                    headers=headers)
+        self.assertTrue(stored)
+        self.assertLessEqual(cache.used, 400)
+        paths = [key[4] for key in cache._entries]
+        self.assertIn('/a', paths)
+        self.assertNotIn('/b', paths)
+
+    def test_render(self):
+        cache = self._makeOne()
+        self._render(cache, makeEnviron())
+        text = cache.render()
+        self.assertIn('zope_page_cache_misses_total 1', text)
+        self.assertIn('zope_page_cache_entries 1', text)
+
+
+class PublishModuleTests(unittest.TestCase):
+
+    def setUp(self):
+        from App.ZApplication import ZApplicationWrapper
+        from ZPublisher import WSGIPublisher
+        from ZPublisher import pagecache
+        self.db = DB(None)
+        self.wrapper = ZApplicationWrapper(
+            self.db, 'Application', PersistentMapping)
+        WSGIPublisher._MODULES['pagecache_test'] = (
+            self.wrapper, 'Zope', False)
+        self._old_cache = pagecache.cache
+        pagecache.cache = pagecache.PageCache(1 << 20)
+        self.published = 0
+
+    def tearDown(self):
+        from ZPublisher import WSGIPublisher
+        from ZPublisher import pagecache
+        del WSGIPublisher._MODULES['pagecache_test']
+        pagecache.cache = self._old_cache
+        transaction.abort()
+        self.db.close()
+
+    def _publish(self, request, module_info):
+        self.published += 1
+        app = module_info[0]
+        request['AUTHENTICATED_USER'] = nobody
+        response = request.response
+        response.setHeader('Content-Type', 'text/plain')
+        response.setBody(app.get('title', 'none'))
+        return response
+
+    def _callFUT(self, **kw):
+        from ZPublisher.WSGIPublisher import publish_module
+        calls = []
+        result = publish_module(
+            makeEnviron(**kw), lambda *args: calls.append(args),
+            self._publish, _module_name='pagecache_test')
+        return calls[0][0], b''.join(result)
+
+    def test_hit_skips_publishing(self):
+        self.assertEqual(self._callFUT(), ('200 OK', b'none'))
+        self.assertEqual(self._callFUT(), ('200 OK', b'none'))
+        self.assertEqual(self.published, 1)
+
+    def test_change_invalidates(self):
+        self._callFUT()
+        app = self.wrapper()
+        app['title'] = 'changed'
+        transaction.commit()
+        app._p_jar.close()
+        self.assertEqual(self._callFUT(), ('200 OK', b'changed'))
+        self.assertEqual(self.published, 2)
+
+    def test_cookies_bypass_cache(self):
+        self._callFUT()
+        self._callFUT(HTTP_COOKIE='a=b')
+        self.assertEqual(self.published, 2)
@@ -0,0 +1,177 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+
+from functools import partial
+import unittest
+
+
+class PathPrefixTests(unittest.TestCase):
+
+    def _callFUT(self, path, depth):
+        from ZPublisher.timing import path_prefix
+        return path_prefix(path, depth)
+
+    def test_depth(self):
+        self.assertEqual(self._callFUT('/a/b/c', 1), '/a')
+        self.assertEqual(self._callFUT('/a/b/c', 2), '/a/b')
+        self.assertEqual(self._callFUT('/a//b/', 5), '/a/b')
+        self.assertEqual(self._callFUT('', 1), '/')
+        self.assertEqual(self._callFUT(None, 1), '/')
+
+
+class PublishedPathTests(unittest.TestCase):
+
+    def _callFUT(self, request):
+        from ZPublisher.timing import published_path
+        return published_path(request)
+
+    def test_published(self):
+        from OFS.SimpleItem import SimpleItem
+        item = SimpleItem()
+        item.getPhysicalPath = lambda: ('', 'site', 'item')
+        self.assertEqual(self._callFUT({'PUBLISHED': item}), '/site/item')
+        self.assertEqual(self._callFUT(
+            {'PUBLISHED': item.getId, 'PARENTS': [item]}), '/site/item')
+        self.assertEqual(self._callFUT({'PUBLISHED': None}), '/')
+
+
+class HistogramTests(unittest.TestCase):
+
+    def _makeOne(self):
+        from ZPublisher.timing import Histogram
+        return Histogram(buckets=(0.1, 1.0))
+
+    def test_observe(self):
+        histogram = self._makeOne()
+        for seconds in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 2.65)
+        self.assertEqual(histogram.cumulative(),
+                         [(0.1, 2), (1.0, 3), (None, 4)])
+
+    def test_quantile(self):
+        histogram = self._makeOne()
+        self.assertIsNone(histogram.quantile(0.5))
+        for seconds in (0.05, 0.05, 0.5, 2.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.75), 1.0)
+        self.assertIsNone(histogram.quantile(0.99))
+
+
+class PhaseTimingsTests(unittest.TestCase):
+
+    def _makeOne(self, max_prefixes=10):
+        from ZPublisher.timing import PhaseTimings
+        return PhaseTimings(max_prefixes)
+
+    def test_observe_in_phase_order(self):
+        timings = self._makeOne()
+        timings.observe('/a', {'total': 0.2, 'inputs': 0.1})
+        timings.observe('/a', {'total': 0.3})
+        self.assertEqual(timings.prefixes(), ['/a'])
+        histograms = timings.histograms('/a')
+        self.assertEqual([phase for phase, h in histograms],
+                         ['inputs', 'total'])
+        self.assertEqual(histograms[1][1].count, 2)
+
+    def test_observe_outcomes(self):
+        from ZPublisher.timing import ERROR
+        timings = self._makeOne()
+        timings.observe('/a', {'total': 0.2})
+        timings.observe('/a', {'total': 0.3}, ERROR)
+        self.assertEqual(timings.outcomes('/a'), ['error', 'ok'])
+        self.assertEqual(timings.histograms('/a')[0][1].sum, 0.2)
+        self.assertEqual(timings.histograms('/a', ERROR)[0][1].sum, 0.3)
+        self.assertEqual(timings.histograms('/b', ERROR), [])
+
+    def test_prefixes_are_bounded(self):
+        from ZPublisher.timing import OTHER
+        timings = self._makeOne(max_prefixes=2)
+        for prefix in ('/a', '/b', '/c', '/d', '/a'):
+            timings.observe(prefix, {'total': 0.1})
+        self.assertEqual(timings.prefixes(), [OTHER, '/a', '/b'])
+        self.assertEqual(dict(timings.histograms(OTHER))['total'].count, 2)
+
+    def test_render(self):
+        timings = self._makeOne()
+        timings.observe('/a"', {'commit': 0.003})
+        lines = timings.render().splitlines()
+        labels = 'path="/a\\"",outcome="ok",phase="commit"'
+        self.assertIn('# TYPE zope_publisher_phase_seconds histogram', lines)
+        self.assertIn('zope_publisher_phase_seconds_bucket'
+                      '{%s,le="0.0025"} 0' % labels, lines)
+        self.assertIn('zope_publisher_phase_seconds_bucket'
+                      '{%s,le="0.005"} 1' % labels, lines)
+        self.assertIn('zope_publisher_phase_seconds_bucket'
+                      '{%s,le="+Inf"} 1' % labels, lines)
+        self.assertIn('zope_publisher_phase_seconds_count'
+                      '{%s} 1' % labels, lines)
+
+    def test_reset(self):
+        timings = self._makeOne()
+        timings.observe('/a', {'total': 0.1})
+        timings.reset()
+        self.assertEqual(timings.prefixes(), [])
+
+
+class RequestTimerTests(unittest.TestCase):
+
+    def _makeOne(self, path, times):
+        from ZPublisher.timing import RequestTimer
+        timer = RequestTimer(clock=partial(next, iter(times)))
+        if path is not None:
+            timer.prefix = path
+        return timer
+
+    def test_phases_add_up(self):
+        from ZPublisher.timing import PhaseTimings
+        timer = self._makeOne('/a', [0.0, 1.0, 3.0, 4.0, 6.0, 10.0])
+        timer.stop('inputs')
+        timer.start()
+        timer.stop('commit')
+        timer.stop('commit')
+        timings = PhaseTimings()
+        timer.record(timings)
+        self.assertEqual(timer.durations,
+                         {'inputs': 1.0, 'commit': 3.0, 'total': 10.0})
+        self.assertEqual(timings.prefixes(), ['/a'])
+
+    def test_request_timer_disabled(self):
+        from ZPublisher import timing
+        self.assertFalse(timing.enabled)
+        self.assertIsNone(timing.request_timer())
+
+    def test_not_recorded_before_traversal(self):
+        from ZPublisher.timing import PhaseTimings
+        timer = self._makeOne(None, [0.0, 1.0])
+        timings = PhaseTimings()
+        timer.record(timings)
+        self.assertEqual(timings.prefixes(), [])
+
+    def test_recording(self):
+        from ZPublisher.timing import ERROR
+        from ZPublisher.timing import recording
+        timer = self._makeOne('/a', [0.0, 1.0])
+        recorded = []
+        timer.record = lambda outcome: recorded.append(outcome)
+        with self.assertRaises(ValueError):
+            with recording(timer):
+                raise ValueError()
+        with recording(timer):
+            pass
+        with recording(None):
+            pass
+        self.assertEqual(recorded, [ERROR, 'ok'])
@@ -0,0 +1,239 @@
+##############################################################################
+#
+# Copyright (c) 2018 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Timing of the phases of publishing a request.
+
+The durations of the phases are recorded in histograms with fixed buckets,
+one per phase, outcome and prefix of the physical path of the published
+object. Requests which fail before traversal finished, e.g. with NotFound,
+are not recorded. Recording is disabled by default, the ZConfig machinery
+enables it if ``publisher-timing`` is set.
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from timeit import default_timer
+
+from six.moves._thread import allocate_lock
+
+# The phases in the order they happen while publishing.
+PHASES = ('inputs', 'traverse', 'call', 'commit', 'finalize', 'total')
+
+# Upper bounds of the histogram buckets in seconds, the last bucket
+# takes everything above.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0)
+
+# Requests prefixes beyond this number are counted as OTHER.
+MAX_PREFIXES = 100
+OTHER = '(other)'
+
+# The outcomes of publishing, ERROR if an exception propagated.
+OK = 'ok'
+ERROR = 'error'
+
+# The ZConfig machinery may set these attributes on initialization.
+enabled = False
+path_depth = 1
+
+
+def path_prefix(path, depth=None):
+    """Return the first ``depth`` elements of ``path``."""
+    if depth is None:
+        depth = path_depth
+    names = [name for name in (path or '').split('/') if name]
+    return '/' + '/'.join(names[:depth])
+
+
+def published_path(request):
+    """Return the physical path of the object published by ``request``.
+
+    For objects without a physical path, like methods and views, the path
+    of the closest object they were traversed from is returned.
+    """
+    for ob in [request.get('PUBLISHED')] + list(request.get('PARENTS', ())):
+        getPhysicalPath = getattr(ob, 'getPhysicalPath', None)
+        if getPhysicalPath is not None:
+            return '/'.join(getPhysicalPath())
+    return '/'
+
+
+class Histogram(object):
+    """Counts of durations in fixed buckets."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        """Return (upper bound, count) pairs, counting all smaller ones."""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (None, ), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Return the upper bound of the bucket holding quantile ``q``.
+
+        Returns None if nothing was recorded and if the quantile lies in
+        the last bucket, which has no upper bound.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return None
+
+
+class PhaseTimings(object):
+    """The histograms of all phases, outcomes and path prefixes."""
+
+    def __init__(self, max_prefixes=MAX_PREFIXES):
+        self.max_prefixes = max_prefixes
+        self._lock = allocate_lock()
+        self._histograms = {}  # prefix -> outcome -> phase -> Histogram
+
+    def observe(self, prefix, durations, outcome=OK):
+        """Record the ``durations`` mapping of phases to seconds."""
+        with self._lock:
+            outcomes = self._histograms.get(prefix)
+            if outcomes is None:
+                if len(self._histograms) >= self.max_prefixes:
+                    prefix = OTHER
+                outcomes = self._histograms.setdefault(prefix, {})
+            histograms = outcomes.setdefault(outcome, {})
+            for phase, seconds in durations.items():
+                histogram = histograms.get(phase)
+                if histogram is None:
+                    histogram = histograms[phase] = Histogram()
+                histogram.observe(seconds)
+
+    def prefixes(self):
+        with self._lock:
+            return sorted(self._histograms)
+
+    def outcomes(self, prefix):
+        with self._lock:
+            return sorted(self._histograms.get(prefix, {}))
+
+    def histograms(self, prefix, outcome=OK):
+        """Return (phase, histogram) pairs of ``prefix`` in phase order."""
+        with self._lock:
+            histograms = dict(
+                self._histograms.get(prefix, {}).get(outcome, {}))
+        return [(phase, histograms[phase])
+                for phase in PHASES if phase in histograms]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """Render all histograms in the Prometheus text format."""
+        name = 'zope_publisher_phase_seconds'
+        lines = [
+            '# HELP %s Time spent in the phases of publishing.' % name,
+            '# TYPE %s histogram' % name,
+        ]
+        for prefix in self.prefixes():
+            quoted = prefix.replace('\\', '\\\\').replace('"', '\\"')
+            for outcome, phase, histogram in self._series(prefix):
+                labels = 'path="%s",outcome="%s",phase="%s"' % (
+                    quoted, outcome, phase)
+                for bound, total in histogram.cumulative():
+                    le = '+Inf' if bound is None else repr(bound)
+                    lines.append('%s_bucket{%s,le="%s"} %d' % (
+                        name, labels, le, total))
+                lines.append('%s_sum{%s} %r' % (name, labels, histogram.sum))
+                lines.append('%s_count{%s} %d' % (
+                    name, labels, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def _series(self, prefix):
+        for outcome in self.outcomes(prefix):
+            for phase, histogram in self.histograms(prefix, outcome):
+                yield outcome, phase, histogram
+
+
+timings = PhaseTimings()
+
+
+class RequestTimer(object):
+    """Measures the phases of publishing one request.
+
+    Durations of phases passed more than once, e.g. when a request is
+    retried after a conflict, are added up. The path prefix is only known
+    once traversal succeeded, the timings are not recorded before.
+    """
+
+    prefix = None
+
+    def __init__(self, clock=default_timer):
+        self.clock = clock
+        self.durations = {}
+        self.started = self._last = clock()
+
+    def start(self):
+        self._last = self.clock()
+
+    def stop(self, phase):
+        now = self.clock()
+        durations = self.durations
+        durations[phase] = durations.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def traversed(self, request):
+        """Take the path prefix from the object published by ``request``."""
+        self.prefix = path_prefix(published_path(request))
+
+    def record(self, registry=None, outcome=OK):
+        if self.prefix is None:
+            return
+        self.durations['total'] = self.clock() - self.started
+        if registry is None:
+            registry = timings
+        registry.observe(self.prefix, self.durations, outcome)
+
+
+def request_timer():
+    """Return a RequestTimer if timing is enabled."""
+    if enabled:
+        return RequestTimer()
+    return None
+
+
+@contextmanager
+def recording(timer):
+    """Record the timings of ``timer`` (if any) when the block is left.
+
+    The outcome is ERROR if the block raised an exception.
+    """
+    if timer is None:
+        yield
+        return
+    outcome = ERROR
+    try:
+        yield
+        outcome = OK
+    finally:
+        timer.record(outcome=outcome)
@@ -14,12 +14,14 @@
 """Datatypes for the Zope schema for use with ZConfig."""
 
 import io
+import ipaddress
 import os
 import traceback
 
 from six.moves import UserDict
 from six import PY2, text_type
 
+from ZConfig.datatypes import IpaddrOrHostname
 from ZODB.config import ZODBDatabase
 from zope.deferredimport import deprecated
 
@@ -54,6 +56,14 @@ def datetime_format(value):
     return value
 
 
+def trusted_proxy(value):
+    # An IP address, a host name or an IP network like 10.0.0.0/8.
+    if '/' not in value:
+        return IpaddrOrHostname()(value)
+    network = ipaddress.ip_network(text_type(value), strict=False)
+    return str(network)
+
+
 def environment(section):
     return section.environ
 
@@ -92,6 +102,17 @@ def importable_name(name):
                 name, IO.getvalue()))
 
 
+def conflict_retry_policy(section):
+    # A datatype that creates the retry policy configured by a section
+    return section.policy(
+        base_delay=section.base_delay,
+        factor=section.factor,
+        max_delay=section.max_delay,
+        jitter=section.jitter,
+        budget=section.budget,
+        budget_period=section.budget_period)
+
+
 class ZDaemonEnvironDict(UserDict):
     # zdaemon 2 expects to use a 'mapping' attribute of the environ object.
 
@@ -84,7 +84,7 @@ def root_wsgi_handler(cfg):
             mapped.extend(_name_to_ips(name))
 
         from ZPublisher import HTTPRequest
-        HTTPRequest.trusted_proxies = tuple(mapped)
+        HTTPRequest.trusted_proxies = HTTPRequest.TrustedProxies(mapped)
 
     # set the maximum number of ConflictError retries
     from ZPublisher import HTTPRequest
@@ -93,16 +93,69 @@ def root_wsgi_handler(cfg):
     else:
         HTTPRequest.retry_max_count = 3
 
+    # set up the delays between retries
+    from ZPublisher import conflicts
+    if cfg.conflict_retry is not None:
+        conflicts.policy = cfg.conflict_retry
+
+    # set the size up to which form parts are kept in memory
+    from ZPublisher import multipart
+    multipart.memory_limit = cfg.form_memory_limit
+
+    # set the size of the chunks files are sent in
+    from ZPublisher import Iterators
+    Iterators.default_streamsize = cfg.file_stream_size
+
+    # set the size from which uploaded files are stored in blobs
+    from OFS import Image
+    Image.blob_threshold = cfg.file_blob_threshold
+    Image.pdata_size = cfg.file_pdata_size
+    Image.savepoint_size = cfg.file_savepoint_size
+
+    # set the size up to which copies are made in memory
+    from OFS import CopySupport
+    CopySupport.copy_memory_limit = cfg.copy_memory_limit
+
+    # set the number of traversed paths remembered per transaction
+    from OFS import Traversable
+    Traversable.traversal_cache_size = cfg.traversal_cache_size
+
+    # set up the cache of responses to anonymous requests
+    from ZPublisher import pagecache
+    if cfg.page_cache_size:
+        pagecache.cache = pagecache.PageCache(
+            cfg.page_cache_size, cfg.page_cache_max_age)
+    else:
+        pagecache.cache = None
+
+    # set up gzip content encoding
+    from ZPublisher import compression
+    compression.level = cfg.gzip_level
+    compression.min_size = cfg.gzip_min_size
+    if cfg.gzip_mime_types:
+        compression.mime_types = tuple(
+            mime_type.lower() for mime_type in cfg.gzip_mime_types)
+    else:
+        compression.mime_types = None
+
+    # set up the timing of the publishing phases
+    from ZPublisher import timing
+    timing.enabled = cfg.publisher_timing
+    timing.path_depth = cfg.publisher_timing_depth
+
 
 def _name_to_ips(host):
     """Map a name *host* to the sequence of its IP addresses.
 
-    Use *host* itself (as sequence) if it already is an IP address.
+    Use *host* itself (as sequence) if it already is an IP address
+    or an IP network like ``10.0.0.0/8``.
     Thus, if only a specific interface on a host is trusted,
     identify it by its IP (and not the host name).
     """
     if isinstance(host, bytes):
         host = host.decode('utf-8')
+    if '/' in host:
+        return [str(ipaddress.ip_network(host, strict=False))]
     try:
         ip = ipaddress.ip_address(host)
     except ValueError:
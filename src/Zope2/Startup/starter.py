@@ -75,11 +75,16 @@ class WSGIStarter(object):
         WSGIPublisher.set_default_debug_mode(self.cfg.debug_mode)
         WSGIPublisher.set_default_authentication_realm(
             self.cfg.http_realm)
+        WSGIPublisher.set_default_streaming(self.cfg.response_streaming)
+        WSGIPublisher.set_default_lazy_inputs(self.cfg.lazy_form_processing)
+        WSGIPublisher.set_default_file_wrapper(self.cfg.wsgi_file_wrapper)
+        WSGIPublisher.set_default_read_only_paths(self.cfg.read_only_paths)
         if self.cfg.trusted_proxies:
             mapped = []
             for name in self.cfg.trusted_proxies:
                 mapped.extend(_name_to_ips(name))
-            ZPublisher.HTTPRequest.trusted_proxies = tuple(mapped)
+            ZPublisher.HTTPRequest.trusted_proxies = (
+                ZPublisher.HTTPRequest.TrustedProxies(mapped))
 
     def setupSecurityOptions(self):
         import AccessControl
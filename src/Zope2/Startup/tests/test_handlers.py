@@ -30,6 +30,11 @@ class TestNameToIPs(unittest.TestCase):
         self.assertEqual(self._callFUT(
             '0000:0000:0000:0000:0000:0abc:0007:0def'), ['::abc:7:def'])
 
+    def test_network(self):
+        self.assertEqual(self._callFUT('10.0.0.0/8'), ['10.0.0.0/8'])
+        self.assertEqual(self._callFUT('192.168.1.1/24'), ['192.168.1.0/24'])
+        self.assertEqual(self._callFUT(u'fd00::/64'), ['fd00::/64'])
+
     def test_hostname(self):
         hosts = self._callFUT('localhost')
         self.assertTrue(hosts == ['127.0.0.1'] or hosts == ['::1'], hosts)
@@ -113,6 +113,191 @@ class WSGIStartupTestCase(unittest.TestCase):
             """)
         self.assertEqual(conf.max_conflict_retries, 15)
 
+    def test_conflict_retry_default(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertIsNone(conf.conflict_retry)
+
+    def test_conflict_retry(self):
+        from ZPublisher.conflicts import RetryPolicy
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            <conflict-retry>
+              backoff-base 0.05
+              max-delay 1.5
+              jitter off
+              budget 100
+              budget-period 2m
+            </conflict-retry>
+            """)
+        policy = conf.conflict_retry
+        self.assertIsInstance(policy, RetryPolicy)
+        self.assertEqual(policy.base_delay, 0.05)
+        self.assertEqual(policy.factor, 2.0)
+        self.assertEqual(policy.max_delay, 1.5)
+        self.assertFalse(policy.jitter)
+        self.assertEqual(policy.budget, 100)
+        self.assertEqual(policy.budget_period, 120)
+
+    def test_form_memory_limit(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.form_memory_limit, 1 << 16)
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            form-memory-limit 1MB
+            """)
+        self.assertEqual(conf.form_memory_limit, 1 << 20)
+
+    def test_gzip(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.gzip_level, 6)
+        self.assertEqual(conf.gzip_min_size, 0)
+        self.assertEqual(conf.gzip_mime_types, [])
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            gzip-level 1
+            gzip-min-size 1KB
+            gzip-mime-type text/*
+            gzip-mime-type application/json
+            """)
+        self.assertEqual(conf.gzip_level, 1)
+        self.assertEqual(conf.gzip_min_size, 1024)
+        self.assertEqual(conf.gzip_mime_types, ['text/*', 'application/json'])
+
+    def test_lazy_form_processing(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            lazy-form-processing on
+            """)
+        self.assertTrue(conf.lazy_form_processing)
+
+    def test_publisher_timing(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            publisher-timing on
+            publisher-timing-depth 2
+            """)
+        self.assertTrue(conf.publisher_timing)
+        self.assertEqual(conf.publisher_timing_depth, 2)
+
+    def test_response_streaming(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertFalse(conf.response_streaming)
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            response-streaming on
+            """)
+        self.assertTrue(conf.response_streaming)
+
+    def test_read_only_paths(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.read_only_paths, [])
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            read-only-path /static
+            read-only-path /site/images
+            """)
+        self.assertEqual(conf.read_only_paths, ['/static', '/site/images'])
+
+    def test_page_cache(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.page_cache_size, 0)
+        self.assertEqual(conf.page_cache_max_age, 300)
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            page-cache-size 64MB
+            page-cache-max-age 1h
+            """)
+        self.assertEqual(conf.page_cache_size, 64 << 20)
+        self.assertEqual(conf.page_cache_max_age, 3600)
+
+    def test_file_stream_size(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertTrue(conf.wsgi_file_wrapper)
+        self.assertEqual(conf.file_stream_size, 1 << 16)
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            wsgi-file-wrapper off
+            file-stream-size 256KB
+            """)
+        self.assertFalse(conf.wsgi_file_wrapper)
+        self.assertEqual(conf.file_stream_size, 1 << 18)
+
+    def test_file_blob_threshold(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.file_blob_threshold, 0)
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            file-blob-threshold 1MB
+            """)
+        self.assertEqual(conf.file_blob_threshold, 1 << 20)
+
+    def test_file_pdata_size(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.file_pdata_size, 1 << 16)
+        self.assertEqual(conf.file_savepoint_size, 1 << 22)
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            file-pdata-size 1MB
+            file-savepoint-size 32MB
+            """)
+        self.assertEqual(conf.file_pdata_size, 1 << 20)
+        self.assertEqual(conf.file_savepoint_size, 32 << 20)
+
+    def test_copy_memory_limit(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.copy_memory_limit, 1 << 22)
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            copy-memory-limit 64MB
+            """)
+        self.assertEqual(conf.copy_memory_limit, 64 << 20)
+
+    def test_traversal_cache_size(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.traversal_cache_size, 1000)
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            traversal-cache-size 0
+            """)
+        self.assertEqual(conf.traversal_cache_size, 0)
+
+    def test_trusted_proxy(self):
+        conf, handler = self.load_config_text(u"""\
+            instancehome <<INSTANCE_HOME>>
+            trusted-proxy 127.0.0.1
+            trusted-proxy 10.0.1.0/16
+            trusted-proxy fd00::/64
+            """)
+        self.assertEqual(conf.trusted_proxies,
+                         ['127.0.0.1', '10.0.0.0/16', 'fd00::/64'])
+        self.assertRaises(ZConfig.DataConversionError,
+                          self.load_config_text, u"""\
+            instancehome <<INSTANCE_HOME>>
+            trusted-proxy 10.0.0.0/33
+            """)
+
     def test_default_zpublisher_encoding(self):
         conf, dummy = self.load_config_text(u"""\
             instancehome <<INSTANCE_HOME>>